@@ -0,0 +1,130 @@
+import csv
+import io
+import logging
+from contextlib import contextmanager
+
+import mann_path  # noqa: F401 (puts mann/ on sys.path for metrics)
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# NULL marker for COPY, so None and '' stay distinguishable
+COPY_NULL = '\\N'
+
+
+def tuples_to_csv(tuples):
+    """Serialise value tuples into an in-memory CSV buffer for COPY."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows([COPY_NULL if value is None else value for value in values] for values in tuples)
+    buffer.seek(0)
+    return buffer
+
+
+def rows_to_csv(rows, columns):
+    """Serialise dict rows into an in-memory CSV buffer for COPY."""
+    return tuples_to_csv([row.get(column) for column in columns] for row in rows)
+
+
+def on_conflict_clause(table, conflict_columns, update_columns=(), fill_columns=()):
+    """
+    ON CONFLICT clause for an upsert into `table`. `update_columns` are
+    overwritten by the new row; `fill_columns` only take the new value where
+    the stored one is NULL. Neither means DO NOTHING.
+    """
+    assignments = [f'{column} = EXCLUDED.{column}' for column in update_columns]
+    assignments += [f'{column} = COALESCE({table}.{column}, EXCLUDED.{column})' for column in fill_columns]
+    conflict_list = ', '.join(conflict_columns)
+    if not assignments:
+        return f'ON CONFLICT ({conflict_list}) DO NOTHING'
+    return f"ON CONFLICT ({conflict_list}) DO UPDATE SET {', '.join(assignments)}"
+
+
+class BulkWriter:
+    """
+    Loads batches of rows with COPY instead of one INSERT per row.
+
+    Rows are streamed with COPY FROM STDIN into a temp staging table shaped
+    like the target, then merged with a single INSERT ... SELECT ... ON
+    CONFLICT, so a table costs two statements per batch regardless of size.
+    The caller owns the transaction (see `batch`).
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    @contextmanager
+    def batch(self):
+        """Context manager: one transaction, committed on success, rolled back on error."""
+        try:
+            yield self.conn
+        except BaseException:
+            self.conn.rollback()
+            raise
+        with metrics.timer('db_commit_seconds'):
+            self.conn.commit()
+
+    def _copy_buffer(self, table, columns, buffer, cursor=None):
+        column_list = ', '.join(columns)
+        statement = f"COPY {table} ({column_list}) FROM STDIN WITH (FORMAT csv, NULL '{COPY_NULL}')"
+        if cursor is not None:
+            cursor.copy_expert(statement, buffer)
+        else:
+            with self.conn.cursor() as cur:
+                cur.copy_expert(statement, buffer)
+
+    def _timed_copy(self, table, columns, buffer, count, cursor=None):
+        with metrics.timer('db_insert_seconds', table=table):
+            self._copy_buffer(table, columns, buffer, cursor)
+        metrics.inc('db_rows_total', count, table=table)
+        return count
+
+    def copy(self, table, columns, rows, cursor=None):
+        """COPY dict rows straight into `table`; returns the row count."""
+        if not rows:
+            return 0
+        return self._timed_copy(table, columns, rows_to_csv(rows, columns), len(rows), cursor)
+
+    def copy_columns(self, table, columns, cursor=None):
+        """
+        COPY a columnar batch ({column: [values]}, equal lengths) into `table`.
+
+        Avoids building a dict per row for the high-volume arrays.
+        """
+        names = list(columns)
+        count = len(columns[names[0]]) if names else 0
+        if not count:
+            return 0
+        return self._timed_copy(table, names, tuples_to_csv(zip(*columns.values())), count, cursor)
+
+    def merge(self, table, columns, rows, conflict_columns, update_columns=(), fill_columns=()):
+        """
+        Upsert rows into `table` via a staging table.
+
+        `update_columns` and `fill_columns` mirror the DO UPDATE SET list of
+        the row-by-row inserts (see on_conflict_clause); neither means DO
+        NOTHING. Rows sharing a conflict key are collapsed first (last one
+        wins), as ON CONFLICT can't touch a row twice in one statement.
+        """
+        if not rows:
+            return 0
+        staging = f'staging_{table.lower()}'
+        column_list = ', '.join(columns)
+
+        # Last occurrence of each key wins, same as sequential upserts
+        deduped = {}
+        for row in rows:
+            deduped[tuple(row.get(column) for column in conflict_columns)] = row
+        rows = list(deduped.values())
+
+        on_conflict = on_conflict_clause(table, conflict_columns, update_columns, fill_columns)
+
+        with metrics.timer('db_insert_seconds', table=table), self.conn.cursor() as cur:
+            cur.execute(f'DROP TABLE IF EXISTS {staging}')
+            cur.execute(f'CREATE TEMP TABLE {staging} (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DROP')
+            self._copy_buffer(staging, columns, rows_to_csv(rows, columns), cur)
+            cur.execute(f'INSERT INTO {table} ({column_list}) SELECT {column_list} FROM {staging} {on_conflict}')
+            merged = cur.rowcount
+        metrics.inc('db_rows_total', merged, table=table)
+        logger.debug(f"Bulk merged {merged} of {len(rows)} rows into {table}")
+        return merged
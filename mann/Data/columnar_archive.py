@@ -0,0 +1,346 @@
+"""
+Columnar (Parquet) archive of the scraped Data/ tree.
+
+Each details array becomes its own dataset, partitioned by event and map:
+
+  archive/playerStats/eventId=2390/mapId=11/part-0-0.parquet
+  archive/events/...        archive/locations/...     archive/economies/...
+
+plus small `series` and `matches` datasets (partitioned by event) built from
+the _extra.json headers, so a match can be joined to its series, map and patch.
+Columns are typed (string ratings become floats, enums become dictionary /
+categorical columns) and id columns are dictionary-encoded in the files.
+
+    python columnar_archive.py ./Data ./archive
+
+    from columnar_archive import read_table
+    kills = read_table('./archive', 'events', columns=['matchId', 'playerId', 'impact'],
+                       filters=[('eventId', '=', 2390), ('eventType', '=', 'kill')])
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+from collections import defaultdict
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from normalise import to_float
+
+logger = logging.getLogger(__name__)
+
+ENUM = pa.dictionary(pa.int32(), pa.string())
+
+# Columns shared by every details table; eventId and mapId are the partition keys
+KEY_FIELDS = [
+    ('eventId', pa.int64()),
+    ('seriesId', pa.int64()),
+    ('mapId', pa.int64()),
+    ('matchId', pa.int64()),
+]
+
+# (column, type) of each details array, named as in _details.json.
+# Ratings and win probabilities arrive as strings and are stored as floats.
+DETAILS_SCHEMAS = {
+    'playerStats': [
+        ('playerId', pa.int64()),
+        ('score', pa.int32()),
+        ('roundsPlayed', pa.int16()),
+        ('kills', pa.int16()),
+        ('deaths', pa.int16()),
+        ('assists', pa.int16()),
+        ('playtimeMillis', pa.int64()),
+        ('impact', pa.float64()),
+        ('rating', pa.float64()),
+        ('attackingRating', pa.float64()),
+        ('defendingRating', pa.float64()),
+    ],
+    'events': [
+        ('roundId', pa.int64()),
+        ('roundNumber', pa.int16()),
+        ('roundTimeMillis', pa.int32()),
+        ('killId', pa.int64()),
+        ('tradedByKillId', pa.int64()),
+        ('tradedForKillId', pa.int64()),
+        ('bombId', pa.string()),
+        ('resId', pa.string()),
+        ('playerId', pa.int64()),
+        ('assists', pa.string()),
+        ('referencePlayerId', pa.int64()),
+        ('eventType', ENUM),
+        ('damageType', ENUM),
+        ('weaponId', pa.string()),
+        ('ability', ENUM),
+        ('impact', pa.float64()),
+        ('attackingWinProbabilityBefore', pa.float64()),
+        ('attackingWinProbabilityAfter', pa.float64()),
+        ('attackingTeamNumber', pa.int8()),
+    ],
+    'locations': [
+        ('roundNumber', pa.int16()),
+        ('playerId', pa.int64()),
+        ('roundTimeMillis', pa.int32()),
+        ('locationX', pa.float32()),
+        ('locationY', pa.float32()),
+        ('viewRadians', pa.float32()),
+    ],
+    'economies': [
+        ('roundId', pa.int64()),
+        ('roundNumber', pa.int16()),
+        ('playerId', pa.int64()),
+        ('agentId', pa.int32()),
+        ('score', pa.int32()),
+        ('weaponId', pa.string()),
+        ('armorId', pa.string()),
+        ('remainingCreds', pa.int32()),
+        ('spentCreds', pa.int32()),
+        ('loadoutValue', pa.int32()),
+        ('survived', pa.bool_()),
+        ('kast', pa.bool_()),
+    ],
+}
+
+SERIES_SCHEMA = [
+    ('eventId', pa.int64()),
+    ('seriesId', pa.int64()),
+    ('childEventId', pa.int64()),
+    ('eventName', pa.string()),
+    ('eventChildLabel', pa.string()),
+    ('eventRegionId', pa.int32()),
+    ('stage', ENUM),
+    ('bracket', ENUM),
+    ('bestOf', pa.int8()),
+    ('startDate', pa.timestamp('ms', tz='UTC')),
+    ('team1Id', pa.int64()),
+    ('team2Id', pa.int64()),
+    ('team1Name', pa.string()),
+    ('team2Name', pa.string()),
+    ('team1Score', pa.int8()),
+    ('team2Score', pa.int8()),
+    ('winCondition', ENUM),
+    ('vodUrl', pa.string()),
+]
+
+MATCHES_SCHEMA = [
+    ('eventId', pa.int64()),
+    ('seriesId', pa.int64()),
+    ('matchId', pa.int64()),
+    ('seriesMatchNumber', pa.int8()),
+    ('mapId', pa.int64()),
+    ('mapName', ENUM),
+    ('patchId', pa.int32()),
+    ('startDate', pa.timestamp('ms', tz='UTC')),
+    ('lengthMillis', pa.int64()),
+    ('attackingFirstTeamNumber', pa.int8()),
+    ('winningTeamNumber', pa.int8()),
+    ('winCondition', ENUM),
+    ('team1Score', pa.int16()),
+    ('team2Score', pa.int16()),
+]
+
+# Dataset -> partition keys
+PARTITIONS = {
+    'series': ['eventId'],
+    'matches': ['eventId'],
+    **{table: ['eventId', 'mapId'] for table in DETAILS_SCHEMAS},
+}
+
+
+def build_table(records, fields, constants=None):
+    """
+    Arrow table from a list of JSON records.
+
+    Values are collected per column, then cast in bulk to the column's type.
+    `constants` are added as columns repeated for every record.
+    """
+    constants = constants or {}
+    columns = []
+    for name, arrow_type in fields:
+        if name in constants:
+            columns.append(pa.array([constants[name]] * len(records), arrow_type))
+            continue
+        values = [record.get(name) for record in records]
+        if pa.types.is_string(arrow_type):
+            # Nested values (event assists) are kept as JSON text, numeric ids as their digits
+            values = [value if value is None or isinstance(value, str) else json.dumps(value) for value in values]
+        if pa.types.is_dictionary(arrow_type):
+            # Mixed str/number input can't go through pa.array in one go
+            values = [None if value is None else str(value) for value in values]
+        if pa.types.is_floating(arrow_type):
+            columns.append(to_float(values).cast(arrow_type))
+        elif pa.types.is_timestamp(arrow_type):
+            column = pa.array(values, pa.string())
+            column = pc.strptime(pc.utf8_replace_slice(column, 19, 1000, ''), '%Y-%m-%dT%H:%M:%S', 's',
+                                 error_is_null=True)
+            columns.append(column.cast(arrow_type))
+        elif pa.types.is_dictionary(arrow_type):
+            columns.append(pa.array(values, pa.string()).dictionary_encode().cast(arrow_type))
+        else:
+            columns.append(pa.array(values, arrow_type))
+    return pa.Table.from_arrays(columns, schema=pa.schema(fields))
+
+
+def series_tables(extra):
+    """(series, matches) tables for one _extra.json, plus {matchId: mapId}."""
+    event_id = extra.get('parentEventId', extra.get('eventId'))
+    team1, team2 = extra.get('team1') or {}, extra.get('team2') or {}
+    header = dict(extra, eventId=event_id, seriesId=extra.get('id'), childEventId=extra.get('eventId'),
+                  team1Name=team1.get('name'), team2Name=team2.get('name'))
+    if extra.get('parentEventName'):
+        header['eventName'] = extra['parentEventName']
+    series = build_table([header], SERIES_SCHEMA)
+
+    matches = extra.get('matches', [])
+    match_rows = [dict(match, eventId=event_id, seriesId=extra.get('id'), matchId=match.get('id'),
+                       mapName=(match.get('map') or {}).get('name'))
+                  for match in matches]
+    return series, build_table(match_rows, MATCHES_SCHEMA), {match.get('id'): match.get('mapId') for match in matches}
+
+
+def details_tables(details, keys):
+    """{array: table} for one _details.json; `keys` holds eventId/seriesId/mapId/matchId."""
+    return {table: build_table(details.get(table) or [], KEY_FIELDS + fields, keys)
+            for table, fields in DETAILS_SCHEMAS.items()}
+
+
+def _dictionary_columns(table):
+    """Id columns get Parquet dictionary pages, measurements stay plain."""
+    return [name for name in table.column_names
+            if name.endswith('Id') or name.endswith('Number') or pa.types.is_dictionary(table.schema.field(name).type)]
+
+
+class ArchiveWriter:
+    """
+    Buffers Arrow tables per dataset and writes them as partitioned Parquet.
+
+    A buffer is flushed once it holds `flush_rows` rows, so files stay large
+    and memory stays bounded regardless of the size of the archive.
+    """
+
+    def __init__(self, out_root, flush_rows=1_000_000):
+        self.out_root = out_root
+        self.flush_rows = flush_rows
+        self.buffers = defaultdict(list)
+        self.buffered = defaultdict(int)
+        self.parts = defaultdict(int)
+        self.rows = defaultdict(int)
+
+    def add(self, dataset, table):
+        if not table.num_rows:
+            return
+        self.buffers[dataset].append(table)
+        self.buffered[dataset] += table.num_rows
+        if self.buffered[dataset] >= self.flush_rows:
+            self.flush(dataset)
+
+    def flush(self, dataset):
+        if not self.buffers[dataset]:
+            return
+        table = pa.concat_tables(self.buffers[dataset])
+        self.buffers[dataset] = []
+        self.buffered[dataset] = 0
+
+        partition_keys = PARTITIONS[dataset]
+        file_columns = [name for name in table.column_names if name not in partition_keys]
+        options = ds.ParquetFileFormat().make_write_options(
+            compression='zstd', use_dictionary=_dictionary_columns(table.select(file_columns)))
+        ds.write_dataset(
+            table, os.path.join(self.out_root, dataset), format='parquet',
+            partitioning=ds.partitioning(table.select(partition_keys).schema, flavor='hive'),
+            basename_template=f'part-{self.parts[dataset]}-{{i}}.parquet',
+            existing_data_behavior='overwrite_or_ignore', file_options=options)
+        self.parts[dataset] += 1
+        self.rows[dataset] += table.num_rows
+
+    def close(self):
+        for dataset in list(self.buffers):
+            self.flush(dataset)
+        return dict(self.rows)
+
+
+def series_folders(data_root):
+    """{folder: (extra file, [details files])} for every series folder under data_root."""
+    folders = {}
+    for root, dirs, files in os.walk(data_root):
+        extra = [file for file in files if file.endswith('_extra.json')]
+        details = sorted(file for file in files if file.endswith('_details.json'))
+        if extra:
+            folders[root] = (os.path.join(root, extra[0]), [os.path.join(root, file) for file in details])
+    return folders
+
+
+def export_archive(data_root, out_root, overwrite=False, flush_rows=1_000_000):
+    """
+    Convert every series under data_root into the Parquet archive at out_root.
+
+    The archive is rebuilt from scratch; pass overwrite=True to replace an
+    existing one. Returns {dataset: rows written}.
+    """
+    if os.path.exists(out_root):
+        if not overwrite:
+            raise FileExistsError(f"{out_root} already exists, pass overwrite=True to rebuild it")
+        shutil.rmtree(out_root)
+
+    writer = ArchiveWriter(out_root, flush_rows)
+    folders = series_folders(data_root)
+    for folder, (extra_file, details_files) in folders.items():
+        try:
+            with open(extra_file, 'r', encoding='utf-8') as f:
+                extra = json.load(f)
+            series, matches, map_ids = series_tables(extra)
+        except Exception as e:
+            logger.error(f"Skipping series {folder}: {e}")
+            continue
+        writer.add('series', series)
+        writer.add('matches', matches)
+        event_id, series_id = extra.get('parentEventId', extra.get('eventId')), extra.get('id')
+        extra = None
+
+        for details_file in details_files:
+            try:
+                with open(details_file, 'r', encoding='utf-8') as f:
+                    details = json.load(f)
+                match_id = details.get('id', details.get('matchId'))
+                keys = {'eventId': event_id, 'seriesId': series_id, 'matchId': match_id, 'mapId': map_ids.get(match_id)}
+                for dataset, table in details_tables(details, keys).items():
+                    writer.add(dataset, table)
+            except Exception as e:
+                logger.error(f"Skipping details file {details_file}: {e}")
+
+    rows = writer.close()
+    logger.info(f"Exported {len(folders)} series to {out_root}: "
+                + ', '.join(f'{count} {dataset}' for dataset, count in rows.items()))
+    return rows
+
+
+def read_table(archive_root, dataset, columns=None, filters=None):
+    """
+    Read one archive dataset into a pandas DataFrame.
+
+    Only `columns` are read from the files, and `filters` (pyarrow / pandas
+    style, e.g. [('eventId', '=', 2390), ('playerId', 'in', [1, 2])]) are
+    pushed down: partition filters skip whole directories and the rest use
+    Parquet row-group statistics.
+    """
+    partitioning = ds.partitioning(pa.schema([(key, pa.int64()) for key in PARTITIONS[dataset]]), flavor='hive')
+    table = pq.read_table(os.path.join(archive_root, dataset), columns=columns, filters=filters,
+                          partitioning=partitioning)
+    return table.to_pandas()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description='Export the scraped JSON archive to partitioned Parquet')
+    parser.add_argument('data_root', nargs='?', default='./Data')
+    parser.add_argument('out_root', nargs='?', default='./archive')
+    parser.add_argument('--overwrite', action='store_true', help='replace an existing archive')
+    args = parser.parse_args()
+    export_archive(args.data_root, args.out_root, overwrite=args.overwrite)
+
+
+if __name__ == '__main__':
+    main()
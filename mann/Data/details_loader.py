@@ -0,0 +1,140 @@
+import json
+import logging
+
+from bulk_loader import BulkWriter
+from normalise import FLOAT_FIELDS, to_float
+
+logger = logging.getLogger(__name__)
+
+# (table column, key in the _details.json record) for each array
+PLAYER_STATS_COLUMNS = [
+    ('playerID', 'playerId'),
+    ('score', 'score'),
+    ('roundsPlayed', 'roundsPlayed'),
+    ('kills', 'kills'),
+    ('deaths', 'deaths'),
+    ('assists', 'assists'),
+    ('playtimeMillis', 'playtimeMillis'),
+    ('impact', 'impact'),
+    ('rating', 'rating'),
+    ('attackingRating', 'attackingRating'),
+    ('defendingRating', 'defendingRating'),
+]
+
+EVENT_COLUMNS = [
+    ('roundID', 'roundId'),
+    ('roundNumber', 'roundNumber'),
+    ('roundTimeMillis', 'roundTimeMillis'),
+    ('killID', 'killId'),
+    ('tradedByKillID', 'tradedByKillId'),
+    ('tradedForKillID', 'tradedForKillId'),
+    ('bombID', 'bombId'),
+    ('resID', 'resId'),
+    ('playerID', 'playerId'),
+    ('assists', 'assists'),
+    ('referencePlayerID', 'referencePlayerId'),
+    ('eventType', 'eventType'),
+    ('damageType', 'damageType'),
+    ('weaponID', 'weaponId'),
+    ('ability', 'ability'),
+    ('impact', 'impact'),
+    ('attackingWinProbabilityBefore', 'attackingWinProbabilityBefore'),
+    ('attackingWinProbabilityAfter', 'attackingWinProbabilityAfter'),
+    ('attackingTeamNumber', 'attackingTeamNumber'),
+]
+
+LOCATION_COLUMNS = [
+    ('roundNumber', 'roundNumber'),
+    ('playerID', 'playerId'),
+    ('roundTimeMillis', 'roundTimeMillis'),
+    ('locationX', 'locationX'),
+    ('locationY', 'locationY'),
+    ('viewRadians', 'viewRadians'),
+]
+
+ECONOMY_COLUMNS = [
+    ('roundID', 'roundId'),
+    ('roundNumber', 'roundNumber'),
+    ('playerID', 'playerId'),
+    ('agentID', 'agentId'),
+    ('score', 'score'),
+    ('weaponID', 'weaponId'),
+    ('armorID', 'armorId'),
+    ('remainingCreds', 'remainingCreds'),
+    ('spentCreds', 'spentCreds'),
+    ('loadoutValue', 'loadoutValue'),
+    ('survived', 'survived'),
+    ('kast', 'kast'),
+]
+
+# (table, details array, column spec)
+DETAILS_TABLES = [
+    ('matchMapPlayerStatsOnMaps', 'playerStats', PLAYER_STATS_COLUMNS),
+    ('matchMapEventsOnMaps', 'events', EVENT_COLUMNS),
+    ('matchMapLocationsOnMaps', 'locations', LOCATION_COLUMNS),
+    ('matchMapEconomiesOnMaps', 'economies', ECONOMY_COLUMNS),
+]
+
+
+def to_columns(records, spec, match_id, float_keys=()):
+    """
+    Turn a list of records into {column: [values]}, one pass per column.
+
+    `float_keys` are string-typed numbers, converted with normalise.to_float.
+    """
+    columns = {'matchID': [match_id] * len(records)}
+    for column, key in spec:
+        values = [record.get(key) for record in records]
+        if key in float_keys:
+            values = to_float(values).to_pylist()
+        elif any(isinstance(value, (list, dict)) for value in values):
+            # Event assists are a list, stored as JSON text
+            values = [value if not isinstance(value, (list, dict)) else json.dumps(value) for value in values]
+        columns[column] = values
+    return columns
+
+
+def match_id_of(details):
+    return details.get('id', details.get('matchId'))
+
+
+def details_columns(details):
+    """Columnar batches {table: {column: [values]}} for one _details.json."""
+    match_id = match_id_of(details)
+    return {table: to_columns(details.get(key) or [], spec, match_id, FLOAT_FIELDS.get(key, ()))
+            for table, key, spec in DETAILS_TABLES}
+
+
+def has_details_arrays(details):
+    return any(key in details for _, key, _ in DETAILS_TABLES)
+
+
+def replace_details_columns(conn, match_id, batches):
+    """
+    Delete a match's rows and COPY pre-built columnar batches in their place.
+
+    Runs in the caller's transaction. Returns {table: rows loaded}.
+    """
+    writer = BulkWriter(conn)
+    counts = {}
+    with conn.cursor() as cur:
+        for table, columns in batches.items():
+            cur.execute(f'DELETE FROM {table} WHERE matchID = %s', (match_id,))
+            counts[table] = writer.copy_columns(table, columns, cursor=cur)
+    return counts
+
+
+def load_match_details(conn, details):
+    """
+    Load the player stats, events, locations and economies of one _details.json.
+
+    The match's existing rows are deleted and the arrays are COPYed back in
+    one transaction, so reloading a match is atomic and never duplicates rows.
+    Returns {table: rows loaded}.
+    """
+    match_id = match_id_of(details)
+    with BulkWriter(conn).batch():
+        counts = replace_details_columns(conn, match_id, details_columns(details))
+    logger.info(f"Loaded details for match {match_id}: "
+                + ', '.join(f'{count} {table}' for table, count in counts.items()))
+    return counts
@@ -0,0 +1,177 @@
+"""
+Team-round buy classification and conversion rates from the economies arrays.
+
+Each team-round's player economies (loadoutValue, spentCreds,
+remainingCreds) are summed in one query per refresh, then every team-round
+of those matches is classified at once with NumPy:
+
+  pistol  round 1 and the first round of the second half
+  eco     loadout under ECO_MAX
+  full    loadout of FULL_MIN or more
+  force   anything in between that left under FORCE_REMAINING_MAX in the bank
+  half    anything in between that saved more than that
+
+Rows go to teamRoundBuys with the opponent's buy and the round result, so
+conversion (round win) rates per team and per map are a GROUP BY:
+
+    economy = Economy(conn)
+    economy.refresh()                                   # new matches only
+    economy.conversion_rates('team', ids=[1625])
+    economy.conversion_rates('map', against=True)       # buy type vs opponent buy type
+"""
+import logging
+
+import numpy as np
+import pandas as pd
+
+from bulk_loader import BulkWriter
+
+logger = logging.getLogger(__name__)
+
+# Team totals (five players) in credits
+ECO_MAX = 5000
+FULL_MIN = 20000
+FORCE_REMAINING_MAX = 5000
+PISTOL_ROUNDS = (1, 13)
+
+BUY_TYPES = np.array(['pistol', 'eco', 'force', 'half', 'full'])
+
+ECONOMY_DDL = """
+CREATE TABLE IF NOT EXISTS teamRoundBuys (
+    matchID INTEGER NOT NULL,
+    roundID INTEGER NOT NULL,
+    roundNumber INTEGER,
+    teamNumber INTEGER NOT NULL,
+    teamID INTEGER,
+    mapID INTEGER,
+    players INTEGER,
+    loadoutValue INTEGER,
+    spentCreds INTEGER,
+    remainingCreds INTEGER,
+    buyType VARCHAR NOT NULL,
+    opponentBuyType VARCHAR,
+    won BOOLEAN,
+    PRIMARY KEY (roundID, teamNumber)
+);
+CREATE INDEX IF NOT EXISTS teamRoundBuys_match ON teamRoundBuys (matchID);
+"""
+
+TEAM_ROUNDS_QUERY = """
+SELECT e.matchID, e.roundID, MAX(e.roundNumber), mp.teamNumber, MAX(mp.teamID), MAX(m.mapID),
+       COUNT(*), SUM(COALESCE(e.loadoutValue, 0)), SUM(COALESCE(e.spentCreds, 0)),
+       SUM(COALESCE(e.remainingCreds, 0)), MAX(r.winnerTeam)
+FROM matchMapEconomiesOnMaps e
+JOIN matchPlayers mp ON mp.matchID = e.matchID AND mp.playerID = e.playerID
+JOIN Matches m ON m.matchID = e.matchID
+LEFT JOIN matchMapRounds r ON r.roundID = e.roundID
+WHERE e.matchID = ANY(%(matches)s) AND e.roundID IS NOT NULL
+GROUP BY e.matchID, e.roundID, mp.teamNumber
+"""
+
+TEAM_ROUND_COLUMNS = ['matchID', 'roundID', 'roundNumber', 'teamNumber', 'teamID', 'mapID',
+                      'players', 'loadoutValue', 'spentCreds', 'remainingCreds', 'winner']
+
+# Matches with economies that were never classified (both probes are index lookups)
+NEW_MATCHES_QUERY = """
+SELECT m.matchID FROM Matches m
+WHERE NOT EXISTS (SELECT 1 FROM teamRoundBuys b WHERE b.matchID = m.matchID)
+  AND EXISTS (SELECT 1 FROM matchMapEconomiesOnMaps e WHERE e.matchID = m.matchID)
+"""
+
+# conversion_rates grouping -> id column
+GROUPINGS = {'team': 'teamID', 'map': 'mapID'}
+
+
+def classify_buys(round_numbers, loadout, remaining):
+    """Buy type of each team-round from its round number and team totals (arrays)."""
+    round_numbers = np.asarray(round_numbers)
+    loadout = np.asarray(loadout)
+    remaining = np.asarray(remaining)
+    choice = np.select(
+        [np.isin(round_numbers, PISTOL_ROUNDS), loadout < ECO_MAX, loadout >= FULL_MIN,
+         remaining < FORCE_REMAINING_MAX],
+        [0, 1, 4, 2], default=3)
+    return BUY_TYPES[choice]
+
+
+def team_round_buys(rows):
+    """DataFrame of classified team-rounds from TEAM_ROUNDS_QUERY rows."""
+    frame = pd.DataFrame(rows, columns=TEAM_ROUND_COLUMNS)
+    if frame.empty:
+        return frame.drop(columns='winner').assign(buyType=[], opponentBuyType=[], won=[])
+    frame = frame.sort_values(['roundID', 'teamNumber'], ignore_index=True)
+    frame['buyType'] = classify_buys(frame['roundNumber'].fillna(0).to_numpy(),
+                                     frame['loadoutValue'].to_numpy(), frame['remainingCreds'].to_numpy())
+
+    # Opponent of each row: same round, the other team number
+    keys = frame['roundID'].to_numpy(np.int64) * 4 + frame['teamNumber'].to_numpy(np.int64)
+    opponent_keys = frame['roundID'].to_numpy(np.int64) * 4 + (3 - frame['teamNumber'].to_numpy(np.int64))
+    position = np.minimum(np.searchsorted(keys, opponent_keys), len(keys) - 1)
+    found = keys[position] == opponent_keys
+    frame['opponentBuyType'] = np.where(found, frame['buyType'].to_numpy()[position], None)
+
+    winner = frame.pop('winner')
+    frame['won'] = (winner == frame['teamNumber']).where(winner.notna(), None)
+    return frame
+
+
+class Economy:
+    """teamRoundBuys, refreshed per match, and conversion-rate queries over it."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        with conn:
+            with conn.cursor() as cur:
+                cur.execute(ECONOMY_DDL)
+
+    def refresh(self, match_ids=()):
+        """
+        Classify every match not yet in teamRoundBuys, plus `match_ids`
+        (matches that were reloaded). Runs in one transaction; returns the
+        number of team-rounds written.
+        """
+        writer = BulkWriter(self.conn)
+        with writer.batch():
+            with self.conn.cursor() as cur:
+                cur.execute(NEW_MATCHES_QUERY)
+                matches = sorted({row[0] for row in cur.fetchall()} | {int(match_id) for match_id in match_ids})
+                if not matches:
+                    return 0
+                params = {'matches': matches}
+                cur.execute(TEAM_ROUNDS_QUERY, params)
+                buys = team_round_buys(cur.fetchall())
+                cur.execute('DELETE FROM teamRoundBuys WHERE matchID = ANY(%(matches)s)', params)
+                columns = {column: [None if pd.isna(value) else value for value in buys[column].tolist()]
+                           for column in buys.columns}
+                written = writer.copy_columns('teamRoundBuys', columns, cursor=cur)
+        logger.info(f"Classified {written} team-round buys across {len(matches)} matches")
+        return written
+
+    def conversion_rates(self, by='team', ids=None, event_id=None, against=False):
+        """
+        Rounds, wins and win rate per buy type for each team or map as a
+        DataFrame. With against=True the opponent's buy type is a key too
+        (e.g. eco vs full). `ids` and `event_id` filter.
+        """
+        id_column = GROUPINGS[by]
+        conditions, params = ['b.won IS NOT NULL'], {}
+        if ids is not None:
+            conditions.append(f'b.{id_column} = ANY(%(ids)s)')
+            params['ids'] = [int(entity_id) for entity_id in ids]
+        if event_id is not None:
+            conditions.append('m.eventID = %(event_id)s')
+            params['event_id'] = event_id
+
+        keys = [id_column, 'buyType'] + (['opponentBuyType'] if against else [])
+        key_list = ', '.join(f'b.{key}' for key in keys)
+        sql = f"""
+        SELECT {key_list}, COUNT(*) AS rounds, COUNT(*) FILTER (WHERE b.won) AS wins
+        FROM teamRoundBuys b JOIN Matches m ON m.matchID = b.matchID
+        WHERE {' AND '.join(conditions)}
+        GROUP BY {key_list} ORDER BY {key_list}
+        """
+        with self.conn.cursor() as cur:
+            cur.execute(sql, params)
+            frame = pd.DataFrame(cur.fetchall(), columns=keys + ['rounds', 'wins'])
+        frame['winRate'] = frame['wins'] / frame['rounds']
+        return frame
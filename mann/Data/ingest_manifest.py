@@ -0,0 +1,115 @@
+import hashlib
+import logging
+import os
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_DDL = """
+CREATE TABLE IF NOT EXISTS ingestManifest (
+    path TEXT PRIMARY KEY,
+    seriesDir TEXT NOT NULL,
+    size BIGINT NOT NULL,
+    mtimeNs BIGINT NOT NULL,
+    contentHash TEXT NOT NULL,
+    loadedAt TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+CREATE INDEX IF NOT EXISTS idx_ingestmanifest_seriesdir ON ingestManifest (seriesDir);
+"""
+
+FileState = namedtuple('FileState', ['path', 'size', 'mtime_ns', 'content_hash'])
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """sha256 of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def series_dir(path):
+    """A series is the folder holding its _extra.json and the _details.json of its matches."""
+    return os.path.dirname(os.path.abspath(path))
+
+
+class IngestManifest:
+    """
+    Record of which data files are already in the database.
+
+    Each loaded file is stored with its size, mtime and content hash. A file
+    whose size and mtime are unchanged is skipped without being read; one
+    whose stat changed is hashed, and only counts as changed if the hash
+    differs too (a re-saved but identical file just gets its stat updated).
+    Files are grouped by series folder, so a change to any file of a series
+    reloads the whole series.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        with conn:
+            with conn.cursor() as cur:
+                cur.execute(MANIFEST_DDL)
+                cur.execute('SELECT path, size, mtimeNs, contentHash FROM ingestManifest')
+                self.entries = {row[0]: FileState(*row) for row in cur.fetchall()}
+
+    def state(self, path, with_hash=True):
+        """Current FileState of a file on disk."""
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        return FileState(path, stat.st_size, stat.st_mtime_ns, file_hash(path) if with_hash else None)
+
+    def is_loaded(self, path):
+        """True if the file is in the manifest with the same content."""
+        current = self.state(path, with_hash=False)
+        known = self.entries.get(current.path)
+        if known is None:
+            return False
+        if (known.size, known.mtime_ns) == (current.size, current.mtime_ns):
+            return True
+        current = current._replace(content_hash=file_hash(current.path))
+        if current.content_hash != known.content_hash:
+            return False
+        # Touched but identical: remember the new stat so the next run skips the hash
+        with self.conn:
+            self.record([current])
+        self.entries[current.path] = current
+        return True
+
+    def pending_series(self, files):
+        """
+        {series folder: [files]} for every series with a new or changed file.
+
+        All files of such a series are returned, not just the changed ones,
+        so the series can be reloaded as a unit.
+        """
+        by_series = {}
+        for path in files:
+            by_series.setdefault(series_dir(path), []).append(path)
+
+        pending = {}
+        for folder, paths in by_series.items():
+            if not all(self.is_loaded(path) for path in paths):
+                pending[folder] = paths
+        logger.info(f"Ingest manifest: {len(pending)} of {len(by_series)} series new or changed")
+        return pending
+
+    def record(self, states, cursor=None):
+        """Upsert manifest rows for loaded files; runs in the caller's transaction."""
+        rows = [(state.path, series_dir(state.path), state.size, state.mtime_ns, state.content_hash)
+                for state in states]
+        query = """
+        INSERT INTO ingestManifest (path, seriesDir, size, mtimeNs, contentHash, loadedAt)
+        VALUES (%s, %s, %s, %s, %s, now())
+        ON CONFLICT (path) DO UPDATE SET
+            size = EXCLUDED.size,
+            mtimeNs = EXCLUDED.mtimeNs,
+            contentHash = EXCLUDED.contentHash,
+            loadedAt = EXCLUDED.loadedAt
+        """
+        if cursor is not None:
+            cursor.executemany(query, rows)
+        else:
+            with self.conn.cursor() as cur:
+                cur.executemany(query, rows)
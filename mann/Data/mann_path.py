@@ -0,0 +1,11 @@
+"""
+Puts mann/ on sys.path, so the Data scripts can import the modules they
+share with the scraper (metrics) when run from this directory.
+"""
+import os
+import sys
+
+MANN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+if MANN_DIR not in sys.path:
+    sys.path.append(MANN_DIR)
@@ -0,0 +1,57 @@
+"""
+Typed conversion of the numeric fields rib.gg sends as strings.
+
+playerStats.impact / rating / attackingRating / defendingRating and the
+events' impact and win probabilities arrive as text ('1.05', '' for "no
+value"). They are converted here once per array, in bulk with pyarrow,
+and both the Postgres loader and the Parquet archive read the result.
+"""
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Strings that mean "no value"; they become null, anything else must parse as a number
+NULL_STRINGS = ['', 'null', 'None', 'NaN', 'nan', 'N/A', '-']
+
+_NUMBER = r'^\s*[-+]?(\d+(\.\d*)?|\.\d+)([eE][-+]?\d+)?\s*$'
+
+# String-typed numeric fields of each details array
+FLOAT_FIELDS = {
+    'playerStats': ('impact', 'rating', 'attackingRating', 'defendingRating'),
+    'events': ('impact', 'attackingWinProbabilityBefore', 'attackingWinProbabilityAfter'),
+}
+
+
+def to_float(values, errors='raise'):
+    """
+    float64 Arrow array from numbers and/or numeric strings.
+
+    None and NULL_STRINGS become null. Any other unparseable value raises
+    ValueError, or becomes null with errors='null'.
+    """
+    # Mixed str/number input can't go through pa.array in one go
+    strings = pa.array([value if value is None or isinstance(value, str) else repr(value) for value in values],
+                       pa.string())
+    strings = pc.if_else(pc.is_in(strings, value_set=pa.array(NULL_STRINGS)), pa.scalar(None, pa.string()), strings)
+
+    valid = pc.match_substring_regex(strings, _NUMBER)
+    invalid = pc.invert(valid)
+    if pc.any(invalid).as_py():
+        if errors != 'null':
+            bad = pc.filter(strings, invalid)[0].as_py()
+            raise ValueError(f"Not a number: {bad!r} ({pc.sum(invalid).as_py()} values)")
+        strings = pc.if_else(valid, strings, pa.scalar(None, pa.string()))
+    return pc.utf8_trim_whitespace(strings).cast(pa.float64())
+
+
+def float_columns(records, fields, errors='raise'):
+    """{field: float64 array} for `fields` of a list of records."""
+    return {field: to_float([record.get(field) for record in records], errors) for field in fields}
+
+
+def normalise_records(records, fields, errors='raise'):
+    """Copies of `records` with `fields` replaced by floats (None for null)."""
+    records = [dict(record) for record in records]
+    for field, column in float_columns(records, fields, errors).items():
+        for record, value in zip(records, column.to_pylist()):
+            record[field] = value
+    return records
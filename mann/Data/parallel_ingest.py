@@ -0,0 +1,266 @@
+"""
+Parallel ingest of a scraped Data/ tree.
+
+A process pool decodes and normalises _extra.json / _details.json files into
+row batches while a small pool of writer connections bulk-loads them.
+Foreign-key order is kept by running two stages:
+
+  1. extra files   -> Tournament, Teams, Player, Matches, matchPlayers,
+                      matchMapRounds
+                      (merged across files, loaded in one transaction)
+  2. details files -> matchMaps, matchMapStats, events, locations, economies
+                      (one transaction per match, spread over the writers)
+
+    python parallel_ingest.py --workers 8 --writers 3 ./Data
+"""
+import argparse
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import psycopg2
+
+import mann_path  # noqa: F401 (puts mann/ on sys.path for metrics)
+import metrics
+from bulk_loader import BulkWriter
+from details_loader import details_columns, has_details_arrays, match_id_of, replace_details_columns
+from populateDB import (BULK_MERGE_SPECS, DERIVED_TABLES, EXTRA_TABLES, MAP_TABLES, METRICS_FILE,
+                        ValorantDataProcessor, merge_batches)
+
+logger = logging.getLogger(__name__)
+
+DB_CONFIG = {
+    'host': 'localhost',
+    'database': 'valorant_test1',
+    'user': 'postgres',
+    'password': 'Password',
+    'port': 5432
+}
+
+# Row mapping only, no connection is opened in the workers
+_rows = ValorantDataProcessor(db_config=None)
+
+
+class StageStats:
+    """Throughput counters for one ingest stage."""
+
+    def __init__(self, name):
+        self.name = name
+        self.files = 0
+        self.bytes = 0
+        self.rows = 0
+        self.started = time.perf_counter()
+        self.elapsed = None
+        self.lock = threading.Lock()
+
+    def add(self, files=0, size=0, rows=0):
+        with self.lock:
+            self.files += files
+            self.bytes += size
+            self.rows += rows
+
+    def finish(self):
+        self.elapsed = time.perf_counter() - self.started
+
+    def report(self):
+        elapsed = self.elapsed or (time.perf_counter() - self.started)
+        elapsed = max(elapsed, 1e-9)
+        return (f"{self.name}: {self.files} files, {self.bytes / 1e6:.1f} MB, {self.rows} rows in {elapsed:.2f}s "
+                f"({self.files / elapsed:.1f} files/s, {self.bytes / 1e6 / elapsed:.1f} MB/s, "
+                f"{self.rows / elapsed:.0f} rows/s)")
+
+
+def parse_extra(path):
+    """Worker: decode one _extra.json into {table: rows}."""
+    with open(path, 'rb') as f:
+        raw = f.read()
+    return path, len(raw), _rows.extra_batches(json.loads(raw))
+
+
+def parse_details(path):
+    """Worker: decode one _details.json into (match_id, {table: rows}, {table: columns})."""
+    with open(path, 'rb') as f:
+        raw = f.read()
+    data = json.loads(raw)
+    columns = details_columns(data) if has_details_arrays(data) else {}
+    return path, len(raw), match_id_of(data), _rows.details_batches(data), columns
+
+
+def _bounded_map(pool, func, items, window):
+    """Like pool.map, but with at most `window` tasks in flight so results don't pile up."""
+    items = iter(items)
+    pending = set()
+    while True:
+        while len(pending) < window:
+            item = next(items, None)
+            if item is None:
+                break
+            pending.add(pool.submit(func, item))
+        if not pending:
+            return
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            try:
+                yield future.result()
+            except Exception as e:
+                logger.error(f"Failed to parse file: {e}")
+
+
+def ingest_extra(pool, extra_files, db_config, workers):
+    parse_stats = StageStats('parse extra')
+    merged = {table: {} for table in EXTRA_TABLES}
+    total_size = 0
+    for path, size, batches in _bounded_map(pool, parse_extra, extra_files, workers * 4):
+        rows = 0
+        for table, table_rows in batches.items():
+            conflict_columns = BULK_MERGE_SPECS[table][0]
+            for row in table_rows:
+                merged[table][tuple(row[column] for column in conflict_columns)] = row
+            rows += len(table_rows)
+        parse_stats.add(files=1, size=size, rows=rows)
+        total_size += size
+    parse_stats.finish()
+
+    write_stats = StageStats('write extra')
+    conn = psycopg2.connect(**db_config)
+    try:
+        writer = BulkWriter(conn)
+        with writer.batch():
+            rows = merge_batches(writer, {table: list(merged[table].values()) for table in EXTRA_TABLES}, EXTRA_TABLES)
+        write_stats.add(rows=rows)
+        write_stats.add(files=len(extra_files), size=total_size)
+    finally:
+        conn.close()
+    write_stats.finish()
+    return [parse_stats, write_stats]
+
+
+def _details_writer(conn, work, write_stats, errors, written):
+    writer = BulkWriter(conn)
+    try:
+        while True:
+            item = work.get()
+            if item is None:
+                return
+            path, size, match_id, batches, columns = item
+            try:
+                with writer.batch():
+                    rows = merge_batches(writer, batches, MAP_TABLES)
+                    if columns:
+                        rows += sum(replace_details_columns(conn, match_id, columns).values())
+                write_stats.add(files=1, size=size, rows=rows)
+                if match_id is not None:
+                    written.append(match_id)
+            except Exception as e:
+                errors.append(path)
+                logger.error(f"Failed to load {path}: {e}")
+    except Exception as e:
+        logger.error(f"Details writer stopped: {e}")
+    finally:
+        conn.close()
+
+
+def _put(work, item, threads):
+    """Queue `item` for the writers; raises instead of blocking for good once every writer has exited."""
+    while True:
+        try:
+            work.put(item, timeout=1)
+            return
+        except queue.Full:
+            if not any(thread.is_alive() for thread in threads):
+                raise RuntimeError('every details writer has exited')
+
+
+def ingest_details(pool, details_files, db_config, workers, writers):
+    parse_stats = StageStats('parse details')
+    write_stats = StageStats('write details')
+    work = queue.Queue(maxsize=writers * 4)
+    errors = []
+    # Matches whose transaction committed; only these are refreshed downstream
+    written = []
+    # Connect up front so a refused connection fails the stage instead of leaving nobody to drain `work`
+    conns = []
+    try:
+        for _ in range(writers):
+            conns.append(psycopg2.connect(**db_config))
+    except psycopg2.Error:
+        for conn in conns:
+            conn.close()
+        raise
+    threads = [threading.Thread(target=_details_writer, args=(conn, work, write_stats, errors, written))
+               for conn in conns]
+    for thread in threads:
+        thread.start()
+    try:
+        for path, size, match_id, batches, columns in _bounded_map(pool, parse_details, details_files, workers * 4):
+            rows = sum(len(table_rows) for table_rows in batches.values())
+            rows += sum(len(next(iter(c.values()), [])) for c in columns.values())
+            parse_stats.add(files=1, size=size, rows=rows)
+            _put(work, (path, size, match_id, batches, columns), threads)
+    finally:
+        try:
+            for _ in threads:
+                _put(work, None, threads)
+        except RuntimeError:
+            pass
+        for thread in threads:
+            thread.join()
+        # Files still queued when the writers stopped were never loaded
+        while not work.empty():
+            item = work.get_nowait()
+            if item is not None:
+                errors.append(item[0])
+    parse_stats.finish()
+    write_stats.finish()
+    if errors:
+        logger.error(f"{len(errors)} details files failed to load")
+    return [parse_stats, write_stats], written
+
+
+def ingest(data_folder, db_config, workers=None, writers=2):
+    """Ingest a Data/ tree with `workers` parser processes and `writers` DB connections."""
+    workers = workers or os.cpu_count() or 1
+    extra_files, details_files = _rows.collect_all_data(data_folder)
+    logger.info(f"Ingesting {len(extra_files)} extra and {len(details_files)} details files "
+                f"with {workers} workers and {writers} writers")
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        stats = ingest_extra(pool, extra_files, db_config, workers)
+        details_stats, match_ids = ingest_details(pool, details_files, db_config, workers, writers)
+        stats += details_stats
+
+    # Every loaded match was replaced, so all of them are rolled up, classified and indexed again.
+    # A failed refresh is logged like populateDB.refresh_derived does; the rows are in either way.
+    conn = psycopg2.connect(**db_config)
+    try:
+        for name, derived in DERIVED_TABLES:
+            try:
+                derived(conn).refresh(match_ids)
+            except Exception as e:
+                logger.error(f"Failed to refresh {name}: {e}")
+    finally:
+        conn.close()
+
+    for stage in stats:
+        logger.info(stage.report())
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Parallel ingest of scraped match data into Postgres')
+    parser.add_argument('data_folder', nargs='?', default='./Data')
+    parser.add_argument('--workers', type=int, default=None, help='parser processes (default: CPU count)')
+    parser.add_argument('--writers', type=int, default=2, help='writer connections')
+    parser.add_argument('--metrics', default=METRICS_FILE, help='Prometheus text file for the load metrics')
+    args = parser.parse_args()
+    ingest(args.data_folder, DB_CONFIG, args.workers, args.writers)
+    # Inserts and commits run in this process's writer threads; parse time is in the stage report
+    metrics.write_prometheus(args.metrics)
+
+
+if __name__ == '__main__':
+    main()
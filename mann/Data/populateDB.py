@@ -6,19 +6,79 @@ from psycopg2.extras import RealDictCursor
 from datetime import datetime
 import logging
 
+import mann_path  # noqa: F401 (puts mann/ on sys.path for metrics)
+import metrics
+from metrics import SampledLog
+from bulk_loader import BulkWriter, on_conflict_clause
+from details_loader import details_columns, has_details_arrays, load_match_details, match_id_of, replace_details_columns
+from economy import Economy
+from ingest_manifest import IngestManifest, series_dir
+from normalise import normalise_records
+from rollups import Rollups
+from swing_index import SwingIndex
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+METRICS_FILE = 'ingest_metrics.prom'
+
+# Conflict key and DO UPDATE SET columns of each insert_* query, shared with bulk mode
+BULK_MERGE_SPECS = {
+    'Tournament': (('eventID',), ('eventName', 'startDate')),
+    'Teams': (('teamID',), ('teamName', 'teamShort')),
+    'Player': (('playerID',), ('ign', 'currentTeamID')),
+    'Matches': (('matchID',), ('t1Score', 't2Score')),
+    'matchPlayers': (('matchID', 'playerID'), ('teamNumber', 'teamID', 'agentID')),
+    'matchMaps': (('mapID',), ('winner', 't1Score', 't2Score')),
+    'matchMapStats': (('mapID', 'playerID'), ('kills', 'deaths', 'assists', 'ribRating')),
+    'matchMapRounds': (('roundID',), ()),
+}
+
+# Columns added after the first release: filled in on conflict only where still
+# NULL, so existing rows are backfilled without changing the update rule above
+BULK_FILL_COLUMNS = {
+    'Matches': ('patchID', 'mapID'),
+}
+
+# Tables fed by _extra.json files, in foreign-key order
+EXTRA_TABLES = ['Tournament', 'Teams', 'Player', 'Matches', 'matchPlayers', 'matchMapRounds']
+
+# Tables fed by _details.json files, in foreign-key order
+MAP_TABLES = ['matchMaps', 'matchMapStats']
+
+# Tables derived from loaded matches, refreshed after each load, in order
+DERIVED_TABLES = (('rollups', Rollups), ('team-round buys', Economy), ('win-probability swings', SwingIndex))
+
+
+def merge_batches(writer, batches, tables):
+    """Bulk merge {table: rows} in the given table order; returns the rows merged"""
+    merged = 0
+    for table in tables:
+        rows = batches.get(table)
+        if rows:
+            conflict_columns, update_columns = BULK_MERGE_SPECS[table]
+            writer.merge(table, list(rows[0].keys()), rows, conflict_columns, update_columns,
+                         BULK_FILL_COLUMNS.get(table, ()))
+            merged += len(rows)
+    return merged
+
 class ValorantDataProcessor:
-    def __init__(self, db_config):
+    def __init__(self, db_config, bulk=False, incremental=False):
         """
         Initialize the data processor with database configuration
         
         db_config should contain: host, database, user, password, port
+        bulk loads tables with COPY + one merge per table instead of per-row inserts
+        incremental skips series already loaded unchanged, per the ingest manifest
         """
         self.db_config = db_config
+        self.bulk = bulk
+        self.incremental = incremental
         self.conn = None
+        self.loaded_matches = set()
+        # One aggregated line per interval instead of one per insert
+        self.row_log = SampledLog(logger, 'Inserted')
         
     def connect_db(self):
         """Establish database connection"""
@@ -31,18 +91,21 @@ class ValorantDataProcessor:
     
     def close_db(self):
         """Close database connection"""
+        self.row_log.flush()
         if self.conn:
             self.conn.close()
             logger.info("Database connection closed")
     
-    def execute_query(self, query, params=None, fetch=False):
+    def execute_query(self, query, params=None, fetch=False, table='other'):
         """Execute SQL query with error handling"""
         try:
             with self.conn.cursor(cursor_factory=RealDictCursor) as cursor:
-                cursor.execute(query, params)
+                with metrics.timer('db_insert_seconds', table=table):
+                    cursor.execute(query, params)
                 if fetch:
                     return cursor.fetchall()
-                self.conn.commit()
+                with metrics.timer('db_commit_seconds'):
+                    self.conn.commit()
                 return cursor.rowcount
         except Exception as e:
             self.conn.rollback()
@@ -62,21 +125,9 @@ class ValorantDataProcessor:
             startDate = EXCLUDED.startDate
         """
         
-        # Map the event data to database fields
-        tournament_data = {
-            'eventID': event_data.get('parentEventId'),
-            'eventType': event_data.get('eventType', 'VCT'),
-            'eventFormat': event_data.get('eventFormat', 'LAN'),
-            'eventTier': self._determine_event_tier(event_data.get('parentEventName', '')),
-            'startDate': self._parse_date(event_data.get('startDate')),
-            'eventName': event_data.get('parentEventName'),
-            'eventSlug': event_data.get('parentEventSlug'),
-            'childEvent': event_data.get('eventChildLabel'),
-            'childEventSlug': event_data.get('eventSlug')
-        }
-        
-        self.execute_query(query, tournament_data)
-        logger.info(f"Inserted tournament: {tournament_data['eventName']}")
+        tournament_data = self._tournament_row(event_data)
+        self.execute_query(query, tournament_data, table='Tournament')
+        self.row_log.add('Tournament')
     
     def insert_teams(self, team_data_list):
         """Insert team data"""
@@ -89,15 +140,9 @@ class ValorantDataProcessor:
         """
         
         for team in team_data_list:
-            team_params = {
-                'teamID': team.get('id'),
-                'teamName': team.get('name'),
-                'teamShort': team.get('shortName'),
-                'region': team.get('region')  # May need to be extracted differently
-            }
-            self.execute_query(query, team_params)
+            self.execute_query(query, self._team_row(team), table='Teams')
         
-        logger.info(f"Inserted {len(team_data_list)} teams")
+        self.row_log.add('Teams', len(team_data_list))
     
     def insert_players(self, player_data_list):
         """Insert player data"""
@@ -110,47 +155,28 @@ class ValorantDataProcessor:
         """
         
         for player in player_data_list:
-            player_params = {
-                'playerID': player.get('id'),
-                'ign': player.get('ign'),
-                'oldIgn': player.get('oldIgn'),
-                'currentTeamID': player.get('currentTeamID')
-            }
-            self.execute_query(query, player_params)
+            self.execute_query(query, self._player_row(player), table='Player')
         
-        logger.info(f"Inserted {len(player_data_list)} players")
+        self.row_log.add('Player', len(player_data_list))
     
     def insert_match(self, match_data, event_id):
         """Insert match data"""
         query = """
         INSERT INTO Matches (matchID, eventID, eventStage, bracket, vlrID, team1ID, team2ID,
-                           eventRegionID, division, t1Score, t2Score, bestOf, patchID)
+                           eventRegionID, division, t1Score, t2Score, bestOf, patchID, mapID)
         VALUES (%(matchID)s, %(eventID)s, %(eventStage)s, %(bracket)s, %(vlrID)s, %(team1ID)s,
                 %(team2ID)s, %(eventRegionID)s, %(division)s, %(t1Score)s, %(t2Score)s,
-                %(bestOf)s, %(patchID)s)
+                %(bestOf)s, %(patchID)s, %(mapID)s)
         ON CONFLICT (matchID) DO UPDATE SET
             t1Score = EXCLUDED.t1Score,
-            t2Score = EXCLUDED.t2Score
+            t2Score = EXCLUDED.t2Score,
+            patchID = COALESCE(Matches.patchID, EXCLUDED.patchID),
+            mapID = COALESCE(Matches.mapID, EXCLUDED.mapID)
         """
         
-        match_params = {
-            'matchID': match_data.get('id'),
-            'eventID': event_id,
-            'eventStage': match_data.get('eventStage'),
-            'bracket': match_data.get('bracket'),
-            'vlrID': match_data.get('vlrid'),
-            'team1ID': match_data.get('team1', {}).get('id'),
-            'team2ID': match_data.get('team2', {}).get('id'),
-            'eventRegionID': match_data.get('eventRegionID'),
-            'division': match_data.get('division'),
-            't1Score': match_data.get('team1Score'),
-            't2Score': match_data.get('team2Score'),
-            'bestOf': match_data.get('bestOf'),
-            'patchID': match_data.get('patchID')
-        }
-        
-        self.execute_query(query, match_params)
-        logger.info(f"Inserted match: {match_params['matchID']}")
+        match_params = self._match_row(match_data, event_id)
+        self.execute_query(query, match_params, table='Matches')
+        self.row_log.add('Matches')
     
     def insert_match_maps(self, maps_data, match_id):
         """Insert match maps data"""
@@ -166,20 +192,9 @@ class ValorantDataProcessor:
         """
         
         for i, map_data in enumerate(maps_data):
-            map_params = {
-                'mapID': map_data.get('id'),
-                'matchID': match_id,
-                'mapNum': i + 1,
-                'lengthInMilli': map_data.get('lengthInMillis'),
-                'attackingFirst': map_data.get('attackingFirst'),
-                'winner': map_data.get('winner'),
-                't1Score': map_data.get('team1Score'),
-                't2Score': map_data.get('team2Score'),
-                'vodURL': map_data.get('vodURL')
-            }
-            self.execute_query(query, map_params)
-        
-        logger.info(f"Inserted {len(maps_data)} maps for match {match_id}")
+            self.execute_query(query, self._map_row(map_data, match_id, i + 1), table='matchMaps')
+        
+        self.row_log.add('matchMaps', len(maps_data))
     
     def insert_map_stats(self, stats_data, map_id):
         """Insert map stats data"""
@@ -196,19 +211,33 @@ class ValorantDataProcessor:
         """
         
         for player_stats in stats_data:
-            stats_params = {
-                'mapID': map_id,
-                'playerID': player_stats.get('playerId'),
-                'kills': player_stats.get('kills'),
-                'deaths': player_stats.get('deaths'),
-                'assists': player_stats.get('assists'),
-                'ribRating': player_stats.get('ribRating'),
-                'ribRatingAttack': player_stats.get('ribRatingAttack'),
-                'ribRatingDefense': player_stats.get('ribRatingDefense')
-            }
-            self.execute_query(query, stats_params)
-        
-        logger.info(f"Inserted stats for {len(stats_data)} players on map {map_id}")
+            self.execute_query(query, self._map_stats_row(player_stats, map_id), table='matchMapStats')
+        
+        self.row_log.add('matchMapStats', len(stats_data))
+    
+    def upsert_rows(self, table, rows):
+        """Insert rows one at a time with the same ON CONFLICT rule as the insert_* queries"""
+        if not rows:
+            return 0
+        columns = list(rows[0].keys())
+        conflict_columns, update_columns = BULK_MERGE_SPECS[table]
+        on_conflict = on_conflict_clause(table, conflict_columns, update_columns, BULK_FILL_COLUMNS.get(table, ()))
+        query = f"""
+        INSERT INTO {table} ({', '.join(columns)})
+        VALUES ({', '.join(f'%({column})s' for column in columns)})
+        {on_conflict}
+        """
+        
+        inserted = 0
+        for row in rows:
+            try:
+                self.execute_query(query, row, table=table)
+                inserted += 1
+            except Exception as e:
+                logger.error(f"Failed to insert into {table} {[row.get(c) for c in conflict_columns]}: {e}")
+        metrics.inc('db_rows_total', inserted, table=table)
+        self.row_log.add(table, inserted)
+        return inserted
     
     def insert_reference_data(self):
         """Insert reference data that has no dependencies"""
@@ -230,7 +259,7 @@ class ValorantDataProcessor:
         
         for region in regions_data:
             try:
-                self.execute_query(region_query, region)
+                self.execute_query(region_query, region, table='Regions')
             except Exception as e:
                 logger.error(f"Failed to insert region {region['name']}: {e}")
         
@@ -258,17 +287,86 @@ class ValorantDataProcessor:
         
         for map_data in maps_data:
             try:
-                self.execute_query(maps_query, map_data)
+                self.execute_query(maps_query, map_data, table='mapsAvailable')
             except Exception as e:
                 logger.error(f"Failed to insert map {map_data['name']}: {e}")
         
         logger.info("Reference data insertion completed")
     
-    def insert_rounds_data(self, rounds_data, match_id, map_id):
-        """Insert rounds data - placeholder for rounds processing"""
-        # This will need to be implemented based on the actual structure of rounds data
-        logger.info(f"Processing {len(rounds_data)} rounds for map {map_id}")
-        # TODO: Implement rounds, kills, events processing
+    def insert_dimensions(self, dimensions):
+        """Insert the dimension rows gathered in pass 1, in foreign-key order (see EXTRA_TABLES)"""
+        if self.bulk:
+            writer = BulkWriter(self.conn)
+            with writer.batch():
+                merge_batches(writer, dimensions, EXTRA_TABLES)
+            return
+        
+        for table in EXTRA_TABLES:
+            self.upsert_rows(table, dimensions[table])
+    
+    def write_match_details(self, writer, data):
+        """Bulk load one _details.json inside the caller's transaction"""
+        merge_batches(writer, self.details_batches(data), MAP_TABLES)
+        if has_details_arrays(data):
+            replace_details_columns(self.conn, match_id_of(data), details_columns(data))
+        self.loaded_matches.add(match_id_of(data))
+    
+    def insert_match_details(self, data):
+        """Load one _details.json: its maps, map stats and events/locations/economies"""
+        if self.bulk:
+            writer = BulkWriter(self.conn)
+            with writer.batch():
+                self.write_match_details(writer, data)
+            return
+        
+        batches = self.details_batches(data)
+        for table in MAP_TABLES:
+            self.upsert_rows(table, batches[table])
+        if has_details_arrays(data):
+            load_match_details(self.conn, data)
+        self.loaded_matches.add(match_id_of(data))
+    
+    def load_series(self, manifest, series_files):
+        """
+        Reload the details files of one changed series and record it in the manifest.
+        
+        In bulk mode the matches and the manifest rows share one transaction,
+        so a series is replaced all-or-nothing; per-row mode commits as it
+        goes and only records the series if every file loaded.
+        Returns True if the series was recorded.
+        """
+        # Stat and hash before reading, so a file rewritten mid-load is picked up next run
+        states = [manifest.state(path) for path in series_files]
+        details_files = [path for path in series_files if path.endswith('_details.json')]
+        
+        if self.bulk:
+            writer = BulkWriter(self.conn)
+            try:
+                with writer.batch():
+                    for file_path in details_files:
+                        with open(file_path, 'r') as f:
+                            data = json.load(f)
+                        self.write_match_details(writer, data)
+                        data = None
+                    manifest.record(states)
+            except Exception as e:
+                logger.error(f"Failed to load series {series_dir(series_files[0])}, rolled back: {e}")
+                return False
+            return True
+        
+        failed = 0
+        for file_path in details_files:
+            try:
+                with open(file_path, 'r') as f:
+                    self.insert_match_details(json.load(f))
+            except Exception as e:
+                failed += 1
+                logger.error(f"Failed to load details file {file_path}: {e}")
+        if failed:
+            return False
+        with self.conn:
+            manifest.record(states)
+        return True
     
     def collect_all_data(self, data_folder_path):
         """Collect all data files for ordered processing"""
@@ -287,149 +385,229 @@ class ValorantDataProcessor:
         return extra_files, details_files
     
     def process_data_folder(self, data_folder_path):
-        """Process all data in the correct hierarchical order"""
+        """
+        Process all data in hierarchical order, streaming one file at a time.
+        
+        Pass 1 reduces each _extra.json to its dimension rows (tournament, teams,
+        players, matches, rounds) and keeps only those, merged by conflict key.
+        Pass 2 then loads each _details.json on its own and drops it before
+        reading the next, so memory is bounded by one match rather than the
+        whole archive.
+        
+        In incremental mode only series with a new or changed file (per the
+        ingest manifest) are processed, and each is reloaded as a unit.
+        """
         logger.info("Starting hierarchical data processing...")
         
         # Collect all files first
         extra_files, details_files = self.collect_all_data(data_folder_path)
         
-        # PHASE 1: Extract and collect all data without inserting
-        logger.info("Phase 1: Collecting all data...")
-        all_tournaments = {}
-        all_teams = {}
-        all_players = {}
-        all_matches = {}
-        all_maps = {}
-        all_agents = {}
-        all_weapons = {}
-        all_abilities = {}
-        
-        # Process extra files for metadata
+        pending = None
+        if self.incremental:
+            manifest = IngestManifest(self.conn)
+            pending = manifest.pending_series(extra_files + details_files)
+            extra_files = [path for path in extra_files if series_dir(path) in pending]
+            details_files = [path for path in details_files if series_dir(path) in pending]
+            if not pending:
+                logger.info("Nothing new to load")
+                return
+        
+        # Step 1: Insert reference data (no dependencies)
+        logger.info("Step 1: Inserting reference data...")
+        self.insert_reference_data()
+        
+        # PASS 1: dimension rows from the extra files
+        logger.info(f"Pass 1: Collecting dimensions from {len(extra_files)} extra files...")
+        dimensions = {table: {} for table in EXTRA_TABLES}
+        failed_series = set()
         for file_path in extra_files:
             try:
-                logger.info(f"Collecting from extra file: {file_path}")
                 with open(file_path, 'r') as f:
-                    data = json.load(f)
-                
-                # Collect tournament data
-                if 'event' in data:
-                    event = data['event']
-                    all_tournaments[event.get('parentEventId')] = event
-                
-                # Collect team data
-                if 'team1' in data:
-                    team = data['team1']
-                    all_teams[team.get('id')] = team
-                if 'team2' in data:
-                    team = data['team2']
-                    all_teams[team.get('id')] = team
-                
-                # Collect match and player data
-                if 'matches' in data:
-                    for match in data['matches']:
-                        all_matches[match.get('id')] = {
-                            'match_data': match,
-                            'event_id': data.get('event', {}).get('parentEventId')
-                        }
-                        
-                        # Collect players from matches
-                        for player_obj in match.get('players', []):
-                            if 'player' in player_obj:
-                                player = player_obj['player']
-                                all_players[player.get('id')] = player
-                
+                    batches = self.extra_batches(json.load(f))
             except Exception as e:
                 logger.error(f"Error collecting from file {file_path}: {e}")
+                failed_series.add(series_dir(file_path))
                 continue
+            for table, rows in batches.items():
+                conflict_columns = BULK_MERGE_SPECS[table][0]
+                for row in rows:
+                    dimensions[table][tuple(row[column] for column in conflict_columns)] = row
         
-        # Process details files for detailed data
+        try:
+            self.insert_dimensions({table: list(rows.values()) for table, rows in dimensions.items()})
+        except Exception as e:
+            logger.error(f"Error inserting dimensions: {e}")
+            raise
+        del dimensions
+        
+        # PASS 2: stream each details file into the database, one match at a time
+        logger.info(f"Pass 2: Loading {len(details_files)} details files...")
+        if pending is not None:
+            # Series whose extra file failed stay out of the manifest and are retried next run
+            loaded = sum(self.load_series(manifest, series_files)
+                         for folder, series_files in pending.items() if folder not in failed_series)
+            logger.info(f"Incremental load completed: {loaded}/{len(pending)} series loaded")
+            self.refresh_derived()
+            return
+        
+        loaded = 0
         for file_path in details_files:
             try:
-                logger.info(f"Collecting from details file: {file_path}")
                 with open(file_path, 'r') as f:
                     data = json.load(f)
-                
-                match_id = data.get('matchId')
-                
-                # Collect maps data
-                if 'maps' in data:
-                    for map_data in data['maps']:
-                        all_maps[map_data.get('id')] = {
-                            'map_data': map_data,
-                            'match_id': match_id
-                        }
-                
-                # Collect agents, weapons, abilities if present
-                # (This depends on your JSON structure - adjust as needed)
-                
+                self.insert_match_details(data)
+                loaded += 1
             except Exception as e:
-                logger.error(f"Error collecting from file {file_path}: {e}")
-                continue
+                logger.error(f"Failed to load details file {file_path}: {e}")
+            finally:
+                data = None
         
-        # PHASE 2: Insert in correct hierarchical order
-        logger.info("Phase 2: Inserting data in hierarchical order...")
-        
-        try:
-            # Step 1: Insert reference data (no dependencies)
-            logger.info("Step 1: Inserting reference data...")
-            self.insert_reference_data()
-            
-            # Step 2: Insert tournaments
-            logger.info("Step 2: Inserting tournaments...")
-            for tournament_id, tournament_data in all_tournaments.items():
-                try:
-                    self.insert_tournament(tournament_data)
-                except Exception as e:
-                    logger.error(f"Failed to insert tournament {tournament_id}: {e}")
-            
-            # Step 3: Insert teams
-            logger.info("Step 3: Inserting teams...")
-            for team_id, team_data in all_teams.items():
-                try:
-                    self.insert_teams([team_data])
-                except Exception as e:
-                    logger.error(f"Failed to insert team {team_id}: {e}")
-            
-            # Step 4: Insert players
-            logger.info("Step 4: Inserting players...")
-            for player_id, player_data in all_players.items():
-                try:
-                    self.insert_players([player_data])
-                except Exception as e:
-                    logger.error(f"Failed to insert player {player_id}: {e}")
-            
-            # Step 5: Insert matches
-            logger.info("Step 5: Inserting matches...")
-            for match_id, match_info in all_matches.items():
-                try:
-                    self.insert_match(match_info['match_data'], match_info['event_id'])
-                except Exception as e:
-                    logger.error(f"Failed to insert match {match_id}: {e}")
-            
-            # Step 6: Insert maps and their dependent data
-            logger.info("Step 6: Inserting maps and dependent data...")
-            for map_id, map_info in all_maps.items():
-                try:
-                    # Insert the map
-                    self.insert_match_maps([map_info['map_data']], map_info['match_id'])
-                    
-                    # Insert map stats
-                    if 'playerStats' in map_info['map_data']:
-                        self.insert_map_stats(map_info['map_data']['playerStats'], map_id)
-                    
-                    # Insert rounds and other detailed data
-                    if 'rounds' in map_info['map_data']:
-                        self.insert_rounds_data(map_info['map_data']['rounds'], 
-                                              map_info['match_id'], map_id)
-                
-                except Exception as e:
-                    logger.error(f"Failed to insert map {map_id}: {e}")
-            
-            logger.info("Hierarchical data processing completed successfully!")
-            
-        except Exception as e:
-            logger.error(f"Error during hierarchical processing: {e}")
-            raise
+        logger.info(f"Hierarchical data processing completed: {loaded}/{len(details_files)} details files loaded")
+        self.refresh_derived()
+    
+    def refresh_derived(self):
+        """Update the rollup, buy and swing tables for new matches and the ones reloaded in this run"""
+        for name, derived in DERIVED_TABLES:
+            try:
+                derived(self.conn).refresh({match_id for match_id in self.loaded_matches if match_id is not None})
+            except Exception as e:
+                logger.error(f"Failed to refresh {name}: {e}")
+        self.loaded_matches = set()
+    
+    def _tournament_row(self, event_data):
+        """Map event data to Tournament columns"""
+        return {
+            'eventID': event_data.get('parentEventId'),
+            'eventType': event_data.get('eventType', 'VCT'),
+            'eventFormat': event_data.get('eventFormat', 'LAN'),
+            'eventTier': self._determine_event_tier(event_data.get('parentEventName', '')),
+            'startDate': self._parse_date(event_data.get('startDate')),
+            'eventName': event_data.get('parentEventName'),
+            'eventSlug': event_data.get('parentEventSlug'),
+            'childEvent': event_data.get('eventChildLabel'),
+            'childEventSlug': event_data.get('eventSlug')
+        }
+    
+    def _team_row(self, team):
+        """Map team data to Teams columns"""
+        return {
+            'teamID': team.get('id'),
+            'teamName': team.get('name'),
+            'teamShort': team.get('shortName'),
+            'region': team.get('region')  # May need to be extracted differently
+        }
+    
+    def _player_row(self, player):
+        """Map player data to Player columns"""
+        return {
+            'playerID': player.get('id'),
+            'ign': player.get('ign'),
+            'oldIgn': player.get('oldIgn'),
+            'currentTeamID': player.get('currentTeamID')
+        }
+    
+    def _match_row(self, match_data, event_id):
+        """Map match data to Matches columns"""
+        return {
+            'matchID': match_data.get('id'),
+            'eventID': event_id,
+            'eventStage': match_data.get('eventStage'),
+            'bracket': match_data.get('bracket'),
+            'vlrID': match_data.get('vlrid'),
+            'team1ID': match_data.get('team1', {}).get('id'),
+            'team2ID': match_data.get('team2', {}).get('id'),
+            'eventRegionID': match_data.get('eventRegionID'),
+            'division': match_data.get('division'),
+            't1Score': match_data.get('team1Score'),
+            't2Score': match_data.get('team2Score'),
+            'bestOf': match_data.get('bestOf'),
+            'patchID': match_data.get('patchId', match_data.get('patchID')),
+            'mapID': match_data.get('mapId')
+        }
+    
+    def _match_player_row(self, player_obj, team_ids):
+        """Map a match's player entry to matchPlayers columns"""
+        return {
+            'matchID': player_obj.get('matchId'),
+            'playerID': player_obj.get('playerId'),
+            'teamNumber': player_obj.get('teamNumber'),
+            'teamID': team_ids.get(player_obj.get('teamNumber')),
+            'agentID': player_obj.get('agentId')
+        }
+    
+    def _map_row(self, map_data, match_id, map_num):
+        """Map map data to matchMaps columns"""
+        return {
+            'mapID': map_data.get('id'),
+            'matchID': match_id,
+            'mapNum': map_num,
+            'lengthInMilli': map_data.get('lengthInMillis'),
+            'attackingFirst': map_data.get('attackingFirst'),
+            'winner': map_data.get('winner'),
+            't1Score': map_data.get('team1Score'),
+            't2Score': map_data.get('team2Score'),
+            'vodURL': map_data.get('vodURL')
+        }
+    
+    def _map_stats_row(self, player_stats, map_id):
+        """Map player stats to matchMapStats columns"""
+        return {
+            'mapID': map_id,
+            'playerID': player_stats.get('playerId'),
+            'kills': player_stats.get('kills'),
+            'deaths': player_stats.get('deaths'),
+            'assists': player_stats.get('assists'),
+            'ribRating': player_stats.get('ribRating'),
+            'ribRatingAttack': player_stats.get('ribRatingAttack'),
+            'ribRatingDefense': player_stats.get('ribRatingDefense')
+        }
+    
+    def _round_row(self, round_data):
+        """Map a series stats round to matchMapRounds columns"""
+        return {
+            'roundID': round_data.get('id'),
+            'matchID': round_data.get('matchId'),
+            'roundNum': round_data.get('number'),
+            'winCondition': round_data.get('winCondition'),
+            'winnerTeam': round_data.get('winningTeamNumber'),
+            'ceremony': round_data.get('ceremony'),
+            't1LoadoutTier': round_data.get('team1LoadoutTier'),
+            't2LoadoutTier': round_data.get('team2LoadoutTier'),
+            'attackingTeam': round_data.get('attackingTeamNumber')
+        }
+    
+    def extra_batches(self, data):
+        """Rows for every table fed by one _extra.json, keyed by table (see EXTRA_TABLES)"""
+        event = data.get('event')
+        event_id = event.get('parentEventId') if event else None
+        matches = data.get('matches', [])
+        players = [player_obj['player']
+                   for match in matches
+                   for player_obj in match.get('players', [])
+                   if 'player' in player_obj]
+        team_ids = {1: data.get('team1Id'), 2: data.get('team2Id')}
+        return {
+            'Tournament': [self._tournament_row(event)] if event else [],
+            'Teams': [self._team_row(data[key]) for key in ('team1', 'team2') if key in data],
+            'Player': [self._player_row(player) for player in players],
+            'Matches': [self._match_row(match, event_id) for match in matches],
+            'matchPlayers': [self._match_player_row(player_obj, team_ids)
+                             for match in matches
+                             for player_obj in match.get('players', [])],
+            'matchMapRounds': [self._round_row(round_data) for round_data in data.get('stats', {}).get('rounds', [])],
+        }
+    
+    def details_batches(self, data):
+        """matchMaps / matchMapStats rows of one _details.json, keyed by table"""
+        match_id = data.get('matchId')
+        maps = data.get('maps', [])
+        map_stats = [self._map_stats_row(player_stats, map_data.get('id'))
+                     for map_data in maps
+                     for player_stats in map_data.get('playerStats', [])]
+        return {
+            'matchMaps': [self._map_row(map_data, match_id, 1) for map_data in maps],
+            'matchMapStats': normalise_records(map_stats, ('ribRating', 'ribRatingAttack', 'ribRatingDefense')),
+        }
     
     def _determine_event_tier(self, event_name):
         """Determine event tier based on event name"""
@@ -463,7 +641,7 @@ def main():
     }
     
     # Initialize processor
-    processor = ValorantDataProcessor(db_config)
+    processor = ValorantDataProcessor(db_config, bulk=True, incremental=True)
     
     try:
         # Connect to database
@@ -480,6 +658,8 @@ def main():
     
     finally:
         processor.close_db()
+        metrics.write_prometheus(METRICS_FILE)
+        logger.info(f"Metrics written to {METRICS_FILE}:\n{metrics.summary()}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,201 @@
+"""
+Per-player / team / agent / map rollups by event and patch.
+
+Every loaded match contributes one row per player to rollupContributions
+(its event, patch, map, team, agent and stat totals). The four rollup tables
+hold running sums of those rows keyed by (eventID, patchID, entity), so a
+refresh only touches the matches that changed: their old contribution is
+subtracted, recomputed from the source tables and added back.
+
+Ratios (K/D, ACS, KAST, first-kill and clutch rates, average rating) are
+derived from the sums at query time:
+
+    rollups = Rollups(conn)
+    rollups.refresh()                                  # new matches only
+    rollups.query('player', event_id=2521)             # one row per player
+    rollups.query('agent', patch_id='6.10', by_event=False)
+"""
+import logging
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Additive columns shared by every rollup
+SUM_COLUMNS = ['maps', 'wins', 'rounds', 'kills', 'deaths', 'assists', 'score',
+               'ratingSum', 'ratingMaps', 'impactSum', 'impactMaps',
+               'kastRounds', 'firstKills', 'firstDeaths', 'clutches', 'clutchOpportunities']
+
+# entity -> (rollup table, id column, per-match maps / wins / rounds).
+# Teams and maps count a match once; players and agents count each appearance.
+ROLLUPS = {
+    'player': ('playerRollups', 'playerID', 'COUNT(*)', 'SUM(won)', 'SUM(roundsPlayed)'),
+    'agent': ('agentRollups', 'agentID', 'COUNT(*)', 'SUM(won)', 'SUM(roundsPlayed)'),
+    'team': ('teamRollups', 'teamID', '1', 'MAX(won)', 'MAX(mapRounds)'),
+    'map': ('mapRollups', 'mapID', '1', '0', 'MAX(mapRounds)'),
+}
+
+_SUM_DDL = ',\n    '.join(f'{column} DOUBLE PRECISION NOT NULL DEFAULT 0' for column in SUM_COLUMNS)
+_CONTRIBUTION_DDL = ',\n    '.join(f'{column} DOUBLE PRECISION NOT NULL' for column in SUM_COLUMNS[3:])
+
+ROLLUP_DDL = f"""
+CREATE TABLE IF NOT EXISTS rollupContributions (
+    matchID INTEGER NOT NULL,
+    playerID INTEGER NOT NULL,
+    eventID INTEGER NOT NULL,
+    patchID VARCHAR NOT NULL,
+    mapID INTEGER NOT NULL,
+    teamID INTEGER NOT NULL,
+    agentID INTEGER NOT NULL,
+    won INTEGER NOT NULL,
+    mapRounds INTEGER NOT NULL,
+    roundsPlayed INTEGER NOT NULL,
+    {_CONTRIBUTION_DDL},
+    PRIMARY KEY (matchID, playerID)
+);
+""" + ''.join(f"""
+CREATE TABLE IF NOT EXISTS {table} (
+    eventID INTEGER NOT NULL,
+    patchID VARCHAR NOT NULL,
+    {id_column} INTEGER NOT NULL,
+    {_SUM_DDL},
+    PRIMARY KEY (eventID, patchID, {id_column})
+);
+""" for table, id_column, *_ in ROLLUPS.values())
+
+# One contribution row per (match, player); unknown event/patch/map/team/agent become 0 / ''
+CONTRIBUTIONS_QUERY = """
+INSERT INTO rollupContributions
+SELECT s.matchID, s.playerID,
+       COALESCE(m.eventID, 0), COALESCE(m.patchID, ''), COALESCE(m.mapID, 0),
+       COALESCE(mp.teamID, 0), COALESCE(mp.agentID, eco.agentID, 0),
+       CASE WHEN (mp.teamNumber = 1 AND m.t1Score > m.t2Score)
+              OR (mp.teamNumber = 2 AND m.t2Score > m.t1Score) THEN 1 ELSE 0 END,
+       COALESCE(m.t1Score, 0) + COALESCE(m.t2Score, 0),
+       COALESCE(s.roundsPlayed, 0),
+       COALESCE(s.kills, 0), COALESCE(s.deaths, 0), COALESCE(s.assists, 0), COALESCE(s.score, 0),
+       COALESCE(s.rating, 0), (s.rating IS NOT NULL)::int,
+       COALESCE(s.impact, 0), (s.impact IS NOT NULL)::int,
+       COALESCE(eco.kastRounds, r.kastRounds, 0),
+       COALESCE(r.firstKills, 0), COALESCE(r.firstDeaths, 0),
+       COALESCE(r.clutches, 0), COALESCE(r.clutchOpportunities, 0)
+FROM (SELECT DISTINCT ON (matchID, playerID) *
+      FROM matchMapPlayerStatsOnMaps WHERE matchID = ANY(%(matches)s)) s
+JOIN Matches m ON m.matchID = s.matchID
+LEFT JOIN matchPlayers mp ON mp.matchID = s.matchID AND mp.playerID = s.playerID
+LEFT JOIN (SELECT matchID, playerID, COUNT(*) FILTER (WHERE kast) AS kastRounds, MAX(agentID) AS agentID
+           FROM matchMapEconomiesOnMaps WHERE matchID = ANY(%(matches)s)
+           GROUP BY matchID, playerID) eco ON eco.matchID = s.matchID AND eco.playerID = s.playerID
+LEFT JOIN (SELECT matchID, playerID, SUM(kastRounds) AS kastRounds,
+                  SUM(firstKills) AS firstKills, SUM(firstDeaths) AS firstDeaths,
+                  SUM(clutches) AS clutches, SUM(clutchOpportunities) AS clutchOpportunities
+           FROM matchMapPlayerStatsOnRounds WHERE matchID = ANY(%(matches)s)
+           GROUP BY matchID, playerID) r ON r.matchID = s.matchID AND r.playerID = s.playerID
+"""
+
+# Matches with player stats that were never rolled up (both probes are index lookups)
+NEW_MATCHES_QUERY = """
+SELECT m.matchID FROM Matches m
+WHERE NOT EXISTS (SELECT 1 FROM rollupContributions c WHERE c.matchID = m.matchID)
+  AND EXISTS (SELECT 1 FROM matchMapPlayerStatsOnMaps s WHERE s.matchID = m.matchID)
+"""
+
+
+def _apply_query(table, id_column, maps, wins, rounds, sign):
+    """Add (sign=1) or subtract (sign=-1) the stored contributions of %(matches)s."""
+    per_match = ', '.join(f'SUM({column}) AS {column}' for column in SUM_COLUMNS[3:])
+    totals = ', '.join(f'{sign} * SUM({column})' for column in SUM_COLUMNS)
+    updates = ', '.join(f'{column} = {table}.{column} + EXCLUDED.{column}' for column in SUM_COLUMNS)
+    return f"""
+    INSERT INTO {table} (eventID, patchID, {id_column}, {', '.join(SUM_COLUMNS)})
+    SELECT eventID, patchID, {id_column}, {totals}
+    FROM (SELECT matchID, eventID, patchID, {id_column},
+                 {maps} AS maps, {wins} AS wins, {rounds} AS rounds, {per_match}
+          FROM rollupContributions WHERE matchID = ANY(%(matches)s)
+          GROUP BY matchID, eventID, patchID, {id_column}) per_match
+    GROUP BY eventID, patchID, {id_column}
+    ON CONFLICT (eventID, patchID, {id_column}) DO UPDATE SET {updates}
+    """
+
+
+def derive_ratios(frame):
+    """Add the usual rate columns to a frame of rollup sums."""
+    def ratio(numerator, denominator):
+        return frame[numerator] / frame[denominator].where(frame[denominator] != 0)
+
+    frame['kd'] = ratio('kills', 'deaths')
+    frame['acs'] = ratio('score', 'rounds')
+    frame['kast'] = ratio('kastRounds', 'rounds')
+    frame['firstKillRate'] = ratio('firstKills', 'rounds')
+    frame['clutchRate'] = ratio('clutches', 'clutchOpportunities')
+    frame['rating'] = ratio('ratingSum', 'ratingMaps')
+    frame['impact'] = ratio('impactSum', 'impactMaps')
+    frame['winRate'] = ratio('wins', 'maps')
+    return frame
+
+
+class Rollups:
+    """Incrementally maintained rollup tables and a small query API over them."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        with conn:
+            with conn.cursor() as cur:
+                cur.execute(ROLLUP_DDL)
+
+    def refresh(self, match_ids=()):
+        """
+        Roll up every match not yet in the rollups, plus `match_ids` (matches
+        that were reloaded and may have changed). Runs in one transaction;
+        returns the number of matches applied.
+        """
+        with self.conn:
+            with self.conn.cursor() as cur:
+                cur.execute(NEW_MATCHES_QUERY)
+                matches = sorted({row[0] for row in cur.fetchall()} | {int(match_id) for match_id in match_ids})
+                if not matches:
+                    return 0
+                params = {'matches': matches}
+
+                # Take the old contribution of reloaded matches back out ...
+                for table, id_column, maps, wins, rounds in ROLLUPS.values():
+                    cur.execute(_apply_query(table, id_column, maps, wins, rounds, -1), params)
+                cur.execute('DELETE FROM rollupContributions WHERE matchID = ANY(%(matches)s)', params)
+
+                # ... and add the current one
+                cur.execute(CONTRIBUTIONS_QUERY, params)
+                for table, id_column, maps, wins, rounds in ROLLUPS.values():
+                    cur.execute(_apply_query(table, id_column, maps, wins, rounds, 1), params)
+                    cur.execute(f'DELETE FROM {table} WHERE maps <= 0')
+        logger.info(f"Rolled up {len(matches)} matches")
+        return len(matches)
+
+    def query(self, entity, ids=None, event_id=None, patch_id=None, by_event=True):
+        """
+        Rollup rows for 'player', 'team', 'agent' or 'map' as a DataFrame with
+        derived ratios. `ids`, `event_id` and `patch_id` filter; with
+        by_event=False the rows are summed across events and patches.
+        """
+        table, id_column = ROLLUPS[entity][:2]
+        conditions, params = [], {}
+        if ids is not None:
+            conditions.append(f'{id_column} = ANY(%(ids)s)')
+            params['ids'] = [int(entity_id) for entity_id in ids]
+        if event_id is not None:
+            conditions.append('eventID = %(event_id)s')
+            params['event_id'] = event_id
+        if patch_id is not None:
+            conditions.append('patchID = %(patch_id)s')
+            params['patch_id'] = str(patch_id)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+
+        keys = ['eventID', 'patchID', id_column] if by_event else [id_column]
+        sums = ', '.join(f'SUM({column}) AS {column}' for column in SUM_COLUMNS)
+        sql = f"SELECT {', '.join(keys)}, {sums} FROM {table} {where} GROUP BY {', '.join(keys)} ORDER BY {', '.join(keys)}"
+        with self.conn.cursor() as cur:
+            cur.execute(sql, params)
+            # Postgres folds the unquoted identifiers to lower case
+            names = {name.lower(): name for name in keys + SUM_COLUMNS}
+            columns = [names.get(description.name, description.name) for description in cur.description]
+            frame = pd.DataFrame(cur.fetchall(), columns=columns)
+        return derive_ratios(frame)
@@ -0,0 +1,310 @@
+"""
+Round timelines rebuilt from kills and events, for a whole season at once.
+
+All kills of the season are held as flat NumPy columns sorted by (round,
+time). Alive counts, XvY situations, trades and post-plant states are then
+computed with cumulative sums, searchsorted and bincount over those columns
+instead of a Python loop per round.
+
+Inputs come from the Data tree: kills and rounds from each series'
+_extra.json stats, plants/defuses from the _details.json events. Results
+go to tables shaped like matchMapXvYs:
+
+  derivedXvYs       matchID, teamID, teamNumber, side, situation, counts, wins, losses
+  derivedTrades     every kill with the kill that traded it (TRADE_WINDOW_MS)
+  derivedPostPlants alive counts at the plant and the round result
+
+    python round_timeline.py ./Data
+"""
+import argparse
+import json
+import logging
+import time
+
+import numpy as np
+import pandas as pd
+import psycopg2
+
+from bulk_loader import BulkWriter
+from columnar_archive import series_folders
+
+logger = logging.getLogger(__name__)
+
+DB_CONFIG = {
+    'host': 'localhost',
+    'database': 'valorant_test1',
+    'user': 'postgres',
+    'password': 'Password',
+    'port': 5432
+}
+
+TEAM_SIZE = 5
+# Matches rib.gg's own tradedByKillId and xvys on real series: a kill is traded
+# when the killer dies within 3s, and a state shorter than 3s isn't a situation
+TRADE_WINDOW_MS = 3000
+STATE_MIN_MS = 3000
+PLANT_EVENT = 'plant'
+
+TIMELINE_DDL = """
+CREATE TABLE IF NOT EXISTS derivedXvYs (
+    matchID INTEGER,
+    teamID INTEGER,
+    teamNumber INTEGER,
+    side VARCHAR,
+    situation VARCHAR,
+    team1Count INTEGER,
+    team2Count INTEGER,
+    delta INTEGER,
+    wins INTEGER,
+    losses INTEGER
+);
+CREATE INDEX IF NOT EXISTS derivedXvYs_match ON derivedXvYs (matchID);
+CREATE TABLE IF NOT EXISTS derivedTrades (
+    matchID INTEGER,
+    roundID INTEGER,
+    killID BIGINT,
+    killerID INTEGER,
+    victimID INTEGER,
+    roundTimeMillis INTEGER,
+    tradedByKillID BIGINT,
+    tradeTimeMillis INTEGER
+);
+CREATE INDEX IF NOT EXISTS derivedTrades_match ON derivedTrades (matchID);
+CREATE TABLE IF NOT EXISTS derivedPostPlants (
+    matchID INTEGER,
+    roundID INTEGER,
+    plantTimeMillis INTEGER,
+    attackersAlive INTEGER,
+    defendersAlive INTEGER,
+    attackersWon BOOLEAN
+);
+CREATE INDEX IF NOT EXISTS derivedPostPlants_match ON derivedPostPlants (matchID);
+"""
+
+
+class Season:
+    """Flat, typed columns for the rounds, kills and plants of many series."""
+
+    def __init__(self):
+        self._rounds, self._kills, self._plants = [], [], []
+
+    def add_series(self, extra):
+        stats = extra.get('stats') or {}
+        team_ids = {1: extra.get('team1Id'), 2: extra.get('team2Id')}
+        for round_data in stats.get('rounds') or []:
+            self._rounds.append((round_data.get('id'), round_data.get('matchId'),
+                                 round_data.get('winningTeamNumber') or 0,
+                                 round_data.get('attackingTeamNumber') or 0,
+                                 team_ids[1] or 0, team_ids[2] or 0))
+        for kill in stats.get('kills') or []:
+            self._kills.append((kill.get('roundId'), kill.get('id'), kill.get('roundTimeMillis') or 0,
+                                kill.get('killerId') or 0, kill.get('victimId') or 0,
+                                kill.get('victimTeamNumber') or 0))
+
+    def add_details(self, details):
+        for event in details.get('events') or []:
+            if event.get('eventType') == PLANT_EVENT:
+                self._plants.append((event.get('roundId'), event.get('roundTimeMillis') or 0))
+
+    def arrays(self):
+        """(rounds, kills, plants) as dicts of NumPy columns; kills sorted by (round index, time)."""
+        rounds = np.array(self._rounds, dtype=np.int64).reshape(-1, 6)
+        rounds = {name: rounds[:, i] for i, name in enumerate(
+            ['roundId', 'matchId', 'winner', 'attacking', 'team1Id', 'team2Id'])}
+        order = np.argsort(rounds['roundId'])
+        rounds = {name: column[order] for name, column in rounds.items()}
+
+        kills = np.array(self._kills, dtype=np.int64).reshape(-1, 6)
+        kills = {name: kills[:, i] for i, name in enumerate(
+            ['roundId', 'killId', 'time', 'killer', 'victim', 'victimTeam'])}
+        kills['round'] = _round_index(rounds['roundId'], kills['roundId'])
+        known = kills['round'] >= 0
+        kills = {name: column[known] for name, column in kills.items()}
+        order = np.lexsort((kills['killId'], kills['time'], kills['round']))
+        kills = {name: column[order] for name, column in kills.items()}
+
+        plants = np.array(self._plants, dtype=np.int64).reshape(-1, 2)
+        plants = {'round': _round_index(rounds['roundId'], plants[:, 0]), 'time': plants[:, 1]}
+        return rounds, kills, plants
+
+
+def _lookup(sorted_keys, keys):
+    """(position, found) of each key in a sorted array."""
+    position = np.searchsorted(sorted_keys, keys)
+    if not len(sorted_keys):
+        return position, np.zeros(len(keys), bool)
+    position = np.minimum(position, len(sorted_keys) - 1)
+    return position, sorted_keys[position] == keys
+
+
+def _round_index(sorted_round_ids, round_ids):
+    """Position of each round id in the sorted round table, -1 if unknown."""
+    position, found = _lookup(sorted_round_ids, round_ids)
+    return np.where(found, position, -1)
+
+
+def alive_counts(kills):
+    """Team 1 / team 2 players alive after each kill (kills sorted by round, time)."""
+    first = np.r_[True, kills['round'][1:] != kills['round'][:-1]]
+    start = np.maximum.accumulate(np.where(first, np.arange(len(first)), 0))
+    alive = {}
+    for team in (1, 2):
+        deaths = np.r_[0, np.cumsum(kills['victimTeam'] == team)]
+        alive[team] = TEAM_SIZE - (deaths[1:] - deaths[start])
+    return alive[1], alive[2]
+
+
+def xvy_situations(rounds, kills, min_ms=STATE_MIN_MS):
+    """
+    matchMapXvYs-style rows: for each match, team, side and XvY situation
+    held for at least `min_ms` after a kill (anything with a dead team
+    excluded), the rounds the team went on to win and lose.
+    """
+    alive1, alive2 = alive_counts(kills)
+    last = np.r_[kills['round'][1:] != kills['round'][:-1], True]
+    held = np.r_[np.diff(kills['time']), 0] >= min_ms
+    live = (alive1 > 0) & (alive2 > 0) & (last | held)
+    # A state is counted once per round
+    state = kills['round'] * 100 + alive1 * 10 + alive2
+    state, first = np.unique(state[live], return_index=True)
+    round_index = kills['round'][live][first]
+    counts = {1: alive1[live][first], 2: alive2[live][first]}
+
+    frames = []
+    for team, other in ((1, 2), (2, 1)):
+        frames.append(pd.DataFrame({
+            'matchID': rounds['matchId'][round_index],
+            'teamID': rounds[f'team{team}Id'][round_index],
+            'teamNumber': team,
+            'side': np.where(rounds['attacking'][round_index] == team, 'atk', 'def'),
+            'team1Count': counts[team],
+            'team2Count': counts[other],
+            'won': rounds['winner'][round_index] == team,
+        }))
+    states = pd.concat(frames, ignore_index=True)
+    states['situation'] = states['team1Count'].astype(str) + 'v' + states['team2Count'].astype(str)
+    states['delta'] = states['team1Count'] - states['team2Count']
+    states['wins'] = states['won'].astype(int)
+    states['losses'] = 1 - states['wins']
+    keys = ['matchID', 'teamID', 'teamNumber', 'side', 'situation', 'team1Count', 'team2Count', 'delta']
+    return states.groupby(keys, as_index=False)[['wins', 'losses']].sum()
+
+
+def trades(rounds, kills, window=TRADE_WINDOW_MS):
+    """
+    Each kill with the kill that traded it: the killer's own death in the
+    same round within `window` ms. Returns a DataFrame.
+    """
+    # (round, victim) -> the kill where that player died
+    death_key = kills['round'] * (1 << 32) + kills['victim']
+    order = np.argsort(death_key, kind='stable')
+    position, found = _lookup(death_key[order], kills['round'] * (1 << 32) + kills['killer'])
+    death = order[position] if len(order) else position
+    delay = kills['time'][death] - kills['time'] if len(order) else np.zeros(0, np.int64)
+    traded = found & (delay >= 0) & (delay <= window)
+
+    return pd.DataFrame({
+        'matchID': rounds['matchId'][kills['round']],
+        'roundID': kills['roundId'],
+        'killID': kills['killId'],
+        'killerID': kills['killer'],
+        'victimID': kills['victim'],
+        'roundTimeMillis': kills['time'],
+        'tradedByKillID': pd.Series(kills['killId'][death] if len(order) else [], dtype='Int64').where(traded),
+        'tradeTimeMillis': pd.Series(delay, dtype='Int64').where(traded),
+    })
+
+
+def post_plants(rounds, kills, plants):
+    """Alive attackers/defenders at each plant and whether the attackers won."""
+    alive1, alive2 = alive_counts(kills)
+    plant_round, plant_time = plants['round'], plants['time']
+    keep = plant_round >= 0
+    plant_round, plant_time = plant_round[keep], plant_time[keep]
+
+    # Last kill at or before the plant in the same round; nobody has died without one
+    kill_position = np.searchsorted(kills['round'] * (1 << 32) + kills['time'],
+                                    plant_round * (1 << 32) + plant_time, side='right') - 1
+    safe = np.maximum(kill_position, 0)
+    has_kill = (kill_position >= 0) & (kills['round'][safe] == plant_round) if len(alive1) else kill_position >= 0
+    before1 = np.where(has_kill, alive1[safe] if len(alive1) else 0, TEAM_SIZE)
+    before2 = np.where(has_kill, alive2[safe] if len(alive2) else 0, TEAM_SIZE)
+
+    attacking = rounds['attacking'][plant_round]
+    return pd.DataFrame({
+        'matchID': rounds['matchId'][plant_round],
+        'roundID': rounds['roundId'][plant_round],
+        'plantTimeMillis': plant_time,
+        'attackersAlive': np.where(attacking == 1, before1, before2),
+        'defendersAlive': np.where(attacking == 1, before2, before1),
+        'attackersWon': rounds['winner'][plant_round] == attacking,
+    })
+
+
+def load_season(data_root):
+    """Read kills, rounds and plants for every series under data_root."""
+    season = Season()
+    for folder, (extra_file, details_files) in series_folders(data_root).items():
+        try:
+            with open(extra_file, 'r', encoding='utf-8') as f:
+                season.add_series(json.load(f))
+            for details_file in details_files:
+                with open(details_file, 'r', encoding='utf-8') as f:
+                    season.add_details(json.load(f))
+        except Exception as e:
+            logger.error(f"Skipping series {folder}: {e}")
+    return season
+
+
+def build_timelines(season):
+    """{table: DataFrame} of derived XvYs, trades and post-plant states."""
+    rounds, kills, plants = season.arrays()
+    return {
+        'derivedXvYs': xvy_situations(rounds, kills),
+        'derivedTrades': trades(rounds, kills),
+        'derivedPostPlants': post_plants(rounds, kills, plants),
+    }
+
+
+def write_timelines(conn, tables):
+    """
+    Replace the derived rows of every match present in `tables`, in one
+    transaction. A match is cleared from all three tables, so one that no
+    longer has a plant loses its old post-plant rows too.
+    """
+    match_ids = sorted({int(match_id) for frame in tables.values() for match_id in frame['matchID'].unique()})
+    writer = BulkWriter(conn)
+    with writer.batch():
+        with conn.cursor() as cur:
+            cur.execute(TIMELINE_DDL)
+            for table, frame in tables.items():
+                cur.execute(f'DELETE FROM {table} WHERE matchID = ANY(%s)', (match_ids,))
+                columns = {column: [None if pd.isna(value) else value for value in frame[column].tolist()]
+                           for column in frame.columns}
+                writer.copy_columns(table, columns, cursor=cur)
+    return {table: len(frame) for table, frame in tables.items()}
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description='Rebuild round timelines (XvY, trades, post-plant) for a season')
+    parser.add_argument('data_root', nargs='?', default='./Data')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    season = load_season(args.data_root)
+    loaded = time.perf_counter()
+    tables = build_timelines(season)
+    built = time.perf_counter()
+    logger.info(f"Read season in {loaded - started:.2f}s, built timelines in {built - loaded:.3f}s")
+
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        counts = write_timelines(conn, tables)
+    finally:
+        conn.close()
+    logger.info('Wrote ' + ', '.join(f'{count} {table}' for table, count in counts.items()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,299 @@
+"""
+Spatial index over player locations and kill positions, one per map.
+
+Samples are bucketed into a fixed grid (CELL_SIZE map units) and into
+BUCKET_MS slices of round time, and stored sorted by (cellY, cellX,
+bucket). A rectangle query binary-searches one key range per grid row and
+only checks exact coordinates inside those ranges, so it touches the rows
+near the zone instead of every sample of the season.
+
+    python spatial_index.py ./Data ./spatial_index      # only indexes new matches
+
+    from spatial_index import SpatialIndex
+    index = SpatialIndex('./spatial_index')
+    hits = index.rect(11, -2000, 3000, -500, 4500, t0=0, t1=20000)
+    heat = index.heatmap(11, kind=KILL)
+"""
+import argparse
+import json
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+
+from columnar_archive import series_folders
+
+logger = logging.getLogger(__name__)
+
+CELL_SIZE = 250
+ORIGIN = -15000
+GRID = 120             # cells per axis, covers ORIGIN .. ORIGIN + GRID * CELL_SIZE
+BUCKET_MS = 5000
+BUCKETS = 64           # round time up to 320s; later samples share the last bucket
+
+# Sample kinds
+LOCATION = 0
+KILL = 1
+
+COLUMNS = {
+    'x': np.float32,
+    'y': np.float32,
+    'roundTimeMillis': np.int32,
+    'matchId': np.int64,
+    'roundNumber': np.int16,
+    'playerId': np.int64,      # the sampled player, or the victim of a kill
+    'otherId': np.int64,       # the killer of a kill, -1 for locations
+    'kind': np.int8,
+}
+
+CATALOGUE = 'catalogue.json'
+
+
+def cell_of(x, y):
+    cx = np.clip(((np.asarray(x) - ORIGIN) // CELL_SIZE).astype(np.int64), 0, GRID - 1)
+    cy = np.clip(((np.asarray(y) - ORIGIN) // CELL_SIZE).astype(np.int64), 0, GRID - 1)
+    return cx, cy
+
+
+def bucket_of(t):
+    return np.clip(np.asarray(t, dtype=np.int64) // BUCKET_MS, 0, BUCKETS - 1)
+
+
+def grid_key(cx, cy, bucket):
+    return (cy * GRID + cx) * BUCKETS + bucket
+
+
+class MapIndex:
+    """Sorted sample columns of one map plus their grid keys."""
+
+    def __init__(self, columns=None):
+        columns = columns or {name: np.empty(0, dtype) for name, dtype in COLUMNS.items()}
+        self.columns = {name: np.asarray(columns[name], dtype) for name, dtype in COLUMNS.items()}
+        self.pending = []
+        self.keys = self._keys(self.columns)
+
+    @staticmethod
+    def _keys(columns):
+        cx, cy = cell_of(columns['x'], columns['y'])
+        return grid_key(cx, cy, bucket_of(columns['roundTimeMillis']))
+
+    def __len__(self):
+        return len(self.keys) + sum(len(batch['x']) for batch in self.pending)
+
+    def add(self, columns):
+        """Queue a batch of samples ({column: array}); it is merged in on the next query or save."""
+        if len(columns['x']):
+            self.pending.append({name: np.asarray(columns[name], dtype) for name, dtype in COLUMNS.items()})
+
+    def _merge(self):
+        if not self.pending:
+            return
+        merged = {name: np.concatenate([self.columns[name]] + [batch[name] for batch in self.pending])
+                  for name in COLUMNS}
+        self.pending = []
+        keys = self._keys(merged)
+        order = np.argsort(keys, kind='stable')
+        self.columns = {name: values[order] for name, values in merged.items()}
+        self.keys = keys[order]
+
+    def _candidates(self, x0, y0, x1, y1, t0, t1):
+        """Row positions whose grid cell and time bucket can intersect the query box."""
+        self._merge()
+        (cx0, cx1), (cy0, cy1) = cell_of([min(x0, x1), max(x0, x1)], [min(y0, y1), max(y0, y1)])
+        b0, b1 = bucket_of([t0, t1])
+        rows = np.arange(cy0, cy1 + 1)
+        lo = np.searchsorted(self.keys, grid_key(cx0, rows, b0), 'left')
+        hi = np.searchsorted(self.keys, grid_key(cx1, rows, b1), 'right')
+        if not (hi > lo).any():
+            return np.empty(0, np.int64)
+        return np.concatenate([np.arange(start, stop) for start, stop in zip(lo, hi) if stop > start])
+
+    def rect(self, x0, y0, x1, y1, t0=0, t1=None, kind=None):
+        """Samples inside the rectangle, with roundTimeMillis in [t0, t1]."""
+        t1 = np.iinfo(np.int32).max if t1 is None else t1
+        rows = self._candidates(x0, y0, x1, y1, t0, t1)
+        x, y = self.columns['x'][rows], self.columns['y'][rows]
+        t = self.columns['roundTimeMillis'][rows]
+        mask = ((x >= min(x0, x1)) & (x <= max(x0, x1)) & (y >= min(y0, y1)) & (y <= max(y0, y1))
+                & (t >= t0) & (t <= t1))
+        if kind is not None:
+            mask &= self.columns['kind'][rows] == kind
+        return rows[mask]
+
+    def radius(self, x, y, r, t0=0, t1=None, kind=None):
+        rows = self.rect(x - r, y - r, x + r, y + r, t0, t1, kind)
+        dx = self.columns['x'][rows] - x
+        dy = self.columns['y'][rows] - y
+        return rows[dx * dx + dy * dy <= r * r]
+
+    def heatmap(self, t0=0, t1=None, kind=None):
+        """GRID x GRID sample counts, indexed [cellY, cellX]."""
+        self._merge()
+        mask = self.columns['roundTimeMillis'] >= t0
+        if t1 is not None:
+            mask &= self.columns['roundTimeMillis'] <= t1
+        if kind is not None:
+            mask &= self.columns['kind'] == kind
+        cells = self.keys[mask] // BUCKETS
+        return np.bincount(cells, minlength=GRID * GRID).reshape(GRID, GRID)
+
+    def frame(self, rows):
+        return pd.DataFrame({name: values[rows] for name, values in self.columns.items()})
+
+    def save(self, path):
+        self._merge()
+        np.savez(path, **self.columns)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls({name: data[name] for name in COLUMNS})
+
+
+def location_columns(details, match_id):
+    locations = details.get('locations') or []
+    return {
+        'x': [sample.get('locationX') for sample in locations],
+        'y': [sample.get('locationY') for sample in locations],
+        'roundTimeMillis': [sample.get('roundTimeMillis') or 0 for sample in locations],
+        'matchId': [match_id] * len(locations),
+        'roundNumber': [sample.get('roundNumber') or 0 for sample in locations],
+        'playerId': [sample.get('playerId') or -1 for sample in locations],
+        'otherId': [-1] * len(locations),
+        'kind': [LOCATION] * len(locations),
+    }
+
+
+def kill_columns(kills, round_numbers):
+    kills = [kill for kill in kills if kill.get('victimLocationX') is not None]
+    return {
+        'x': [kill['victimLocationX'] for kill in kills],
+        'y': [kill.get('victimLocationY') for kill in kills],
+        'roundTimeMillis': [kill.get('roundTimeMillis') or 0 for kill in kills],
+        'matchId': [kill.get('matchId') for kill in kills],
+        'roundNumber': [round_numbers.get(kill.get('roundId'), 0) for kill in kills],
+        'playerId': [kill.get('victimId') or -1 for kill in kills],
+        'otherId': [kill.get('killerId') or -1 for kill in kills],
+        'kind': [KILL] * len(kills),
+    }
+
+
+class SpatialIndex:
+    """
+    Per-map indexes stored as map_<id>.npz under index_dir.
+
+    catalogue.json records which matches have had their locations and kills
+    indexed, so re-running index_folder() after a scrape only indexes new
+    matches; their details files are the only ones read.
+    """
+
+    def __init__(self, index_dir):
+        self.index_dir = index_dir
+        os.makedirs(index_dir, exist_ok=True)
+        self.maps = {}
+        self.dirty = set()
+        catalogue_path = os.path.join(index_dir, CATALOGUE)
+        catalogue = {}
+        if os.path.exists(catalogue_path):
+            with open(catalogue_path, 'r') as f:
+                catalogue = json.load(f)
+        self.location_matches = set(catalogue.get('locations', []))
+        self.kill_matches = set(catalogue.get('kills', []))
+
+    def map_index(self, map_id):
+        map_id = int(map_id)
+        if map_id not in self.maps:
+            path = os.path.join(self.index_dir, f'map_{map_id}.npz')
+            self.maps[map_id] = MapIndex.load(path) if os.path.exists(path) else MapIndex()
+        return self.maps[map_id]
+
+    def _add(self, map_id, columns):
+        if map_id is None or not len(columns['x']):
+            return 0
+        self.map_index(map_id).add(columns)
+        self.dirty.add(int(map_id))
+        return len(columns['x'])
+
+    def add_series(self, extra):
+        """Index the kill positions of one _extra.json; returns {matchId: mapId} for its details."""
+        map_ids = {match.get('id'): match.get('mapId') for match in extra.get('matches', [])}
+        stats = extra.get('stats') or {}
+        round_numbers = {round_data.get('id'): round_data.get('number') for round_data in stats.get('rounds', [])}
+        kills_by_match = {}
+        for kill in stats.get('kills') or []:
+            kills_by_match.setdefault(kill.get('matchId'), []).append(kill)
+        for match_id, kills in kills_by_match.items():
+            if match_id in self.kill_matches:
+                continue
+            self._add(map_ids.get(match_id), kill_columns(kills, round_numbers))
+            self.kill_matches.add(match_id)
+        return map_ids
+
+    def add_details(self, details, map_id):
+        """Index the location samples of one _details.json."""
+        match_id = details.get('id', details.get('matchId'))
+        if match_id in self.location_matches:
+            return 0
+        added = self._add(map_id, location_columns(details, match_id))
+        self.location_matches.add(match_id)
+        return added
+
+    def index_folder(self, data_root):
+        """Index every series under data_root not already in the catalogue."""
+        added = 0
+        for folder, (extra_file, details_files) in series_folders(data_root).items():
+            try:
+                with open(extra_file, 'r', encoding='utf-8') as f:
+                    map_ids = self.add_series(json.load(f))
+            except Exception as e:
+                logger.error(f"Skipping series {folder}: {e}")
+                continue
+            for details_file in details_files:
+                try:
+                    # Details files are named <matchId>_details.json, so indexed ones aren't read again
+                    match_id = int(os.path.basename(details_file).split('_')[0])
+                    if match_id in self.location_matches:
+                        continue
+                    with open(details_file, 'r', encoding='utf-8') as f:
+                        added += self.add_details(json.load(f), map_ids.get(match_id))
+                except Exception as e:
+                    logger.error(f"Skipping details file {details_file}: {e}")
+        maps = len(self.dirty)
+        self.save()
+        logger.info(f"Indexed {added} new location samples across {maps} maps")
+        return added
+
+    def save(self):
+        for map_id in self.dirty:
+            self.maps[map_id].save(os.path.join(self.index_dir, f'map_{map_id}.npz'))
+        self.dirty = set()
+        with open(os.path.join(self.index_dir, CATALOGUE), 'w') as f:
+            json.dump({'locations': sorted(self.location_matches), 'kills': sorted(self.kill_matches)}, f)
+
+    def rect(self, map_id, x0, y0, x1, y1, t0=0, t1=None, kind=None):
+        """DataFrame of samples on a map inside a rectangle and round-time window."""
+        index = self.map_index(map_id)
+        return index.frame(index.rect(x0, y0, x1, y1, t0, t1, kind))
+
+    def radius(self, map_id, x, y, r, t0=0, t1=None, kind=None):
+        """DataFrame of samples on a map within r units of (x, y)."""
+        index = self.map_index(map_id)
+        return index.frame(index.radius(x, y, r, t0, t1, kind))
+
+    def heatmap(self, map_id, t0=0, t1=None, kind=None):
+        """GRID x GRID counts for a map, indexed [cellY, cellX]; cell (0, 0) starts at ORIGIN."""
+        return self.map_index(map_id).heatmap(t0, t1, kind)
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description='Build or update the per-map spatial index')
+    parser.add_argument('data_root', nargs='?', default='./Data')
+    parser.add_argument('index_dir', nargs='?', default='./spatial_index')
+    args = parser.parse_args()
+    SpatialIndex(args.index_dir).index_folder(args.data_root)
+
+
+if __name__ == '__main__':
+    main()
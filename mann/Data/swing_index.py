@@ -0,0 +1,125 @@
+"""
+Win-probability swings of every event, attributed to the acting player.
+
+Each matchMapEventsOnMaps row has the attackers' win probability before
+and after the event. The swing is that change from the point of view of
+the player's own team (positive when the play helped them), so a defender's
+defuse and an attacker's entry kill rank on the same scale.
+
+Swings are stored in winProbabilitySwings with btree indexes on
+(playerID / mapID / eventID [, eventStage], swing), so a top-N query walks
+one index range instead of scanning events:
+
+    swings = SwingIndex(conn)
+    swings.refresh()                                         # new matches only
+    swings.top(50, event_id=2521, stage='Playoffs')
+    swings.top(10, player_id=9, worst=True)
+"""
+import logging
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+SWING_DDL = """
+CREATE TABLE IF NOT EXISTS winProbabilitySwings (
+    matchID INTEGER NOT NULL,
+    roundID INTEGER,
+    roundNumber INTEGER,
+    roundTimeMillis INTEGER,
+    eventType VARCHAR,
+    playerID INTEGER NOT NULL,
+    teamNumber INTEGER,
+    teamID INTEGER,
+    mapID INTEGER,
+    eventID INTEGER,
+    eventStage VARCHAR,
+    probabilityBefore DOUBLE PRECISION NOT NULL,
+    probabilityAfter DOUBLE PRECISION NOT NULL,
+    swing DOUBLE PRECISION NOT NULL
+);
+CREATE INDEX IF NOT EXISTS winProbabilitySwings_match ON winProbabilitySwings (matchID);
+CREATE INDEX IF NOT EXISTS winProbabilitySwings_swing ON winProbabilitySwings (swing);
+CREATE INDEX IF NOT EXISTS winProbabilitySwings_player ON winProbabilitySwings (playerID, swing);
+CREATE INDEX IF NOT EXISTS winProbabilitySwings_map ON winProbabilitySwings (mapID, swing);
+CREATE INDEX IF NOT EXISTS winProbabilitySwings_event ON winProbabilitySwings (eventID, swing);
+CREATE INDEX IF NOT EXISTS winProbabilitySwings_stage ON winProbabilitySwings (eventID, eventStage, swing);
+"""
+
+# Probabilities are the attackers'; the player's team sees them flipped when defending.
+# Events without a player, a known team or both probabilities have nothing to attribute.
+SWINGS_QUERY = """
+INSERT INTO winProbabilitySwings
+SELECT e.matchID, e.roundID, e.roundNumber, e.roundTimeMillis, e.eventType, e.playerID,
+       mp.teamNumber, mp.teamID, m.mapID, m.eventID, m.eventStage,
+       own.before, own.after, own.after - own.before
+FROM matchMapEventsOnMaps e
+JOIN matchPlayers mp ON mp.matchID = e.matchID AND mp.playerID = e.playerID
+JOIN Matches m ON m.matchID = e.matchID
+CROSS JOIN LATERAL (
+    SELECT CASE WHEN mp.teamNumber = e.attackingTeamNumber THEN e.attackingWinProbabilityBefore
+                ELSE 1 - e.attackingWinProbabilityBefore END AS before,
+           CASE WHEN mp.teamNumber = e.attackingTeamNumber THEN e.attackingWinProbabilityAfter
+                ELSE 1 - e.attackingWinProbabilityAfter END AS after
+) own
+WHERE e.matchID = ANY(%(matches)s)
+  AND e.attackingWinProbabilityBefore IS NOT NULL AND e.attackingWinProbabilityAfter IS NOT NULL
+  AND e.attackingTeamNumber IS NOT NULL
+"""
+
+# Matches with events that were never indexed (both probes are index lookups)
+NEW_MATCHES_QUERY = """
+SELECT m.matchID FROM Matches m
+WHERE NOT EXISTS (SELECT 1 FROM winProbabilitySwings s WHERE s.matchID = m.matchID)
+  AND EXISTS (SELECT 1 FROM matchMapEventsOnMaps e WHERE e.matchID = m.matchID)
+"""
+
+TOP_COLUMNS = ['matchID', 'roundNumber', 'roundTimeMillis', 'eventType', 'playerID', 'teamID',
+               'mapID', 'eventID', 'eventStage', 'probabilityBefore', 'probabilityAfter', 'swing']
+
+
+class SwingIndex:
+    """winProbabilitySwings, refreshed per match, and top-N queries over its indexes."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        with conn:
+            with conn.cursor() as cur:
+                cur.execute(SWING_DDL)
+
+    def refresh(self, match_ids=()):
+        """
+        Index every match not yet in winProbabilitySwings, plus `match_ids`
+        (matches that were reloaded). Runs in one transaction; returns the
+        number of swings written.
+        """
+        with self.conn:
+            with self.conn.cursor() as cur:
+                cur.execute(NEW_MATCHES_QUERY)
+                matches = sorted({row[0] for row in cur.fetchall()} | {int(match_id) for match_id in match_ids})
+                if not matches:
+                    return 0
+                params = {'matches': matches}
+                cur.execute('DELETE FROM winProbabilitySwings WHERE matchID = ANY(%(matches)s)', params)
+                cur.execute(SWINGS_QUERY, params)
+                written = cur.rowcount
+        logger.info(f"Indexed {written} win-probability swings across {len(matches)} matches")
+        return written
+
+    def top(self, n=50, player_id=None, map_id=None, event_id=None, stage=None, event_type=None, worst=False):
+        """
+        The `n` biggest swings (worst=True: the most costly plays) as a
+        DataFrame, optionally for one player, map, event and stage.
+        """
+        conditions, params = [], {'n': int(n)}
+        for column, value in (('playerID', player_id), ('mapID', map_id), ('eventID', event_id),
+                              ('eventStage', stage), ('eventType', event_type)):
+            if value is not None:
+                conditions.append(f'{column} = %({column})s')
+                params[column] = value
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        order = 'ASC' if worst else 'DESC'
+        sql = f"SELECT {', '.join(TOP_COLUMNS)} FROM winProbabilitySwings {where} ORDER BY swing {order} LIMIT %(n)s"
+        with self.conn.cursor() as cur:
+            cur.execute(sql, params)
+            return pd.DataFrame(cur.fetchall(), columns=TOP_COLUMNS)
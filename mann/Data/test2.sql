@@ -30,7 +30,8 @@ CREATE TABLE IF NOT EXISTS Matches (
     t1Score INTEGER,
     t2Score INTEGER,
     bestOf INTEGER,
-    patchID VARCHAR
+    patchID VARCHAR,
+    mapID INTEGER --mapId
 );
 
 -- 3. Teams Table
@@ -192,6 +193,7 @@ CREATE TABLE IF NOT EXISTS matchMapPlayerStatsOnMaps (
 
 -- 14. Events
 CREATE TABLE IF NOT EXISTS matchMapEventsOnMaps (
+    matchID INTEGER REFERENCES Matches(matchID), --details id, used to reload a match atomically
     roundID INTEGER REFERENCES matchMapRounds(roundID),
     roundNumber INTEGER,
     roundTimeMillis INTEGER,
@@ -215,6 +217,7 @@ CREATE TABLE IF NOT EXISTS matchMapEventsOnMaps (
 
 -- 15. Locations
 CREATE TABLE IF NOT EXISTS matchMapLocationsOnMaps (
+    matchID INTEGER REFERENCES Matches(matchID),
     roundNumber INTEGER,
     playerID INTEGER REFERENCES Player(playerID),
     roundTimeMillis INTEGER,
@@ -225,6 +228,7 @@ CREATE TABLE IF NOT EXISTS matchMapLocationsOnMaps (
 
 -- 16. Economy Stats
 CREATE TABLE IF NOT EXISTS matchMapEconomiesOnMaps (
+    matchID INTEGER REFERENCES Matches(matchID),
     roundID INTEGER REFERENCES matchMapRounds(roundID),
     roundNumber INTEGER,
     playerID INTEGER REFERENCES Player(playerID),
@@ -239,6 +243,17 @@ CREATE TABLE IF NOT EXISTS matchMapEconomiesOnMaps (
     kast BOOLEAN
 );
 
+-- Details arrays are reloaded per match, so index them by matchID
+-- (ADD COLUMN covers databases created before matchID was added)
+ALTER TABLE matchMapEventsOnMaps ADD COLUMN IF NOT EXISTS matchID INTEGER REFERENCES Matches(matchID);
+ALTER TABLE matchMapLocationsOnMaps ADD COLUMN IF NOT EXISTS matchID INTEGER REFERENCES Matches(matchID);
+ALTER TABLE matchMapEconomiesOnMaps ADD COLUMN IF NOT EXISTS matchID INTEGER REFERENCES Matches(matchID);
+CREATE INDEX IF NOT EXISTS matchMapPlayerStatsOnRounds_match ON matchMapPlayerStatsOnRounds (matchID);
+CREATE INDEX IF NOT EXISTS matchMapPlayerStatsOnMaps_match ON matchMapPlayerStatsOnMaps (matchID);
+CREATE INDEX IF NOT EXISTS matchMapEventsOnMaps_match ON matchMapEventsOnMaps (matchID);
+CREATE INDEX IF NOT EXISTS matchMapLocationsOnMaps_match ON matchMapLocationsOnMaps (matchID);
+CREATE INDEX IF NOT EXISTS matchMapEconomiesOnMaps_match ON matchMapEconomiesOnMaps (matchID);
+
 -- 17. Agents
 CREATE TABLE IF NOT EXISTS Agents (
     agentID INTEGER PRIMARY KEY,
@@ -282,3 +297,16 @@ CREATE TABLE IF NOT EXISTS Patches (
     releaseDate Timestamptz,
     description TEXT
 );
+
+-- 23. Match Players (team and agent of each player in a match)
+CREATE TABLE IF NOT EXISTS matchPlayers (
+    matchID INTEGER REFERENCES Matches(matchID),
+    playerID INTEGER REFERENCES Player(playerID),
+    teamNumber INTEGER,
+    teamID INTEGER, --series team1Id / team2Id by teamNumber
+    agentID INTEGER,
+    PRIMARY KEY (matchID, playerID)
+);
+
+-- Columns added after the first release
+ALTER TABLE Matches ADD COLUMN IF NOT EXISTS mapID INTEGER;
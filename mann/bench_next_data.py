@@ -0,0 +1,91 @@
+"""
+Benchmark the streaming __NEXT_DATA__ extractor against the original
+response.text / str.find / json.loads implementation.
+
+    python bench_next_data.py [page.html ...]
+
+With no arguments a rib.gg-shaped page is built around the captured
+`stats_raw_json copy.json` payload; pass saved HTML pages to bench those instead.
+"""
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+from json_projection import SERIES_PATHS
+from next_data import extract_next_data
+
+FIXTURE_PAYLOAD = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'stats_raw_json copy.json')
+CHUNK_SIZE = 65536
+ROUNDS = 5
+
+
+def extract_json_data_text(response_text):
+    # Implementation previously used by script6.py / scrape.py
+    start_index = response_text.find('<script id="__NEXT_DATA__" type="application/json">')
+    start_index += len('<script id="__NEXT_DATA__" type="application/json">')
+    end_index = response_text.find('</script>', start_index)
+    json_string = response_text[start_index:end_index].strip()
+    return json.loads(json_string)
+
+
+def build_fixture_page(page_props=None):
+    """A rib.gg-shaped series page around `page_props` (default: the bundled fixture payload)."""
+    if page_props is None:
+        with open(FIXTURE_PAYLOAD, 'r', encoding='utf-8') as f:
+            page_props = json.load(f)
+    next_data = json.dumps({'props': {'pageProps': page_props}, 'page': '/series/[seriesId]'})
+    # Pad the page with markup roughly the size of the rendered rib.gg body
+    body = '<div class="row"><span>filler</span></div>\n' * 20000
+    return (
+        '<!DOCTYPE html><html><head><title>rib.gg</title>'
+        + '<script src="/_next/static/chunks/main.js"></script>' * 40
+        + '</head><body>' + body
+        + '<script id="__NEXT_DATA__" type="application/json">' + next_data + '</script>'
+        + '</body></html>'
+    ).encode('utf-8')
+
+
+def chunked(page):
+    for start in range(0, len(page), CHUNK_SIZE):
+        yield page[start:start + CHUNK_SIZE]
+
+
+def measure(func):
+    timings = []
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return min(timings), peak
+
+
+def bench(name, page):
+    size_mb = len(page) / 1e6
+    print(f"{name}: {size_mb:.2f} MB page")
+    results = {
+        'text + str.find': measure(lambda: extract_json_data_text(page.decode('utf-8'))),
+        'streaming bytes': measure(lambda: extract_next_data(chunked(page))),
+        'projected series': measure(lambda: extract_next_data(chunked(page), SERIES_PATHS)),
+    }
+    for label, (seconds, peak) in results.items():
+        print(f"  {label:<16} {seconds * 1000:8.1f} ms  {size_mb / seconds:7.1f} MB/s  "
+              f"peak {peak / 1e6:6.1f} MB")
+
+
+def main(paths):
+    if paths:
+        for path in paths:
+            with open(path, 'rb') as f:
+                bench(os.path.basename(path), f.read())
+    else:
+        bench('stats_raw_json copy.json fixture', build_fixture_page())
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,557 @@
+"""
+Benchmark the scrape -> parse -> load pipeline end to end on recorded fixtures.
+
+Recorded series pages and match details are served by a local stub HTTP
+server and replayed through the code the crawler uses (fetch_client,
+next_data.extract_json_data, script6's update_* entity tables), written out
+as a Data/ tree and loaded into a throwaway Postgres with
+ValorantDataProcessor. Every stage reports its throughput and peak RSS:
+
+  fetch     pages/s and MB/s downloaded from the stub server
+  parse     pages/s and MB/s of __NEXT_DATA__ / details JSON parsed
+  entities  rows/s through the update_* entity tables
+  write     MB/s of _extra.json / _details.json written
+  load      rows/s loaded into Postgres
+
+    python bench_pipeline.py                                 # one series, stats_raw_json copy.json
+    python bench_pipeline.py --scale season --out season.json
+    python bench_pipeline.py --scale season --baseline season.json
+    python bench_pipeline.py --fixtures ./recorded           # <seriesId>.html + <matchId>_details.json
+
+--scale replays every fixture series that many times under fresh ids
+(SCALES has season-sized presets). Details that weren't recorded are
+synthesised from the series' kills and rounds. Without --dsn the database is
+a cluster created with initdb/pg_ctl (from PATH or --pg-bin) and removed
+afterwards; if neither is available the load stage is skipped.
+"""
+import argparse
+import contextlib
+import copy
+import glob
+import http.server
+import importlib
+import io
+import json
+import os
+import platform
+import random
+import re
+import resource
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import psycopg2
+
+import fetch_client
+from bench_next_data import FIXTURE_PAYLOAD, build_fixture_page
+from json_projection import SERIES_PATHS
+from next_data import extract_json_data, extract_next_data
+
+MANN_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(MANN_DIR, 'Data')
+SCHEMA_FILE = os.path.join(DATA_DIR, 'test2.sql')
+
+# Series per run for the named scales (a VCT season is a few hundred series)
+SCALES = {'series': 1, 'event': 20, 'season': 250, 'multi-season': 1000}
+
+# Copy k of a fixture series gets every id shifted by k * ID_STRIDE
+ID_STRIDE = 10_000_000
+SHIFTED_KEYS = ('matchId', 'seriesId', 'roundId', 'killId', 'tradedByKillId', 'tradedForKillId')
+
+LOCATION_INTERVAL_MS = 2000
+RSS_INTERVAL = 0.01
+STAGES = ('fetch', 'parse', 'entities', 'write', 'load')
+
+
+# --- Fixtures -----------------------------------------------------------------
+
+def load_fixtures(fixtures_dir=None):
+    """(pageProps payloads, {matchId: details bytes}) from a recording dir or the bundled payload."""
+    if fixtures_dir is None:
+        with open(FIXTURE_PAYLOAD, 'r', encoding='utf-8') as f:
+            return [json.load(f)], {}
+    payloads = []
+    for path in sorted(glob.glob(os.path.join(fixtures_dir, '*.html'))):
+        with open(path, 'rb') as f:
+            payloads.append(extract_next_data([f.read()])['props']['pageProps'])
+    details = {}
+    for path in glob.glob(os.path.join(fixtures_dir, '*_details.json')):
+        with open(path, 'rb') as f:
+            details[int(os.path.basename(path).split('_')[0])] = f.read()
+    return payloads, details
+
+
+def _shift(node, offset):
+    if isinstance(node, dict):
+        for key, value in node.items():
+            if key in SHIFTED_KEYS and isinstance(value, int):
+                node[key] = value + offset
+            else:
+                _shift(value, offset)
+    elif isinstance(node, list):
+        for item in node:
+            _shift(item, offset)
+
+
+def scaled_payload(payload, copy_number):
+    """`payload` with its series, match, round and kill ids moved into slot `copy_number`."""
+    payload = copy.deepcopy(payload)
+    series = payload['series']
+    # Recordings from before team objects were embedded only carry the ids
+    for number in (1, 2):
+        team_id = series[f'team{number}Id']
+        series.setdefault(f'team{number}', {'id': team_id, 'name': f'Team {team_id}',
+                                            'shortName': f'T{team_id}', 'vctRegion': None})
+    if copy_number:
+        offset = copy_number * ID_STRIDE
+        _shift(series, offset)
+        series['id'] += offset
+        stats = series.get('stats') or {}
+        for node in series['matches'] + stats.get('rounds', []) + stats.get('kills', []):
+            node['id'] += offset
+        for match in series['matches']:
+            for round_data in match.get('rounds') or []:
+                round_data['id'] += offset
+    return payload
+
+
+def synthetic_details(series, match, rng):
+    """A details payload for `match` built from the series' rounds and kills."""
+    stats = series.get('stats') or {}
+    rounds = [r for r in stats.get('rounds', []) if r['matchId'] == match['id']]
+    kills = [k for k in stats.get('kills', []) if k['matchId'] == match['id']]
+    player_ids = [player['playerId'] for player in match.get('players', [])]
+    round_length = {}
+    for kill in kills:
+        round_length[kill['roundId']] = max(round_length.get(kill['roundId'], 0), kill['roundTimeMillis'])
+    numbers = {r['id']: r['number'] for r in rounds}
+
+    events = []
+    for kill in kills:
+        before = rng.random()
+        events.append({
+            'roundId': kill['roundId'], 'roundNumber': numbers.get(kill['roundId']),
+            'roundTimeMillis': kill['roundTimeMillis'], 'killId': kill['id'],
+            'tradedByKillId': kill.get('tradedByKillId'), 'tradedForKillId': kill.get('tradedForKillId'),
+            'bombId': None, 'resId': None, 'playerId': kill['killerId'], 'assists': kill.get('assistants') or [],
+            'referencePlayerId': kill['victimId'], 'eventType': 'kill', 'damageType': kill.get('damageType'),
+            'weaponId': kill.get('weaponId'), 'ability': None, 'impact': f'{rng.uniform(-0.3, 0.3):.4f}',
+            'attackingWinProbabilityBefore': f'{before:.4f}',
+            'attackingWinProbabilityAfter': f'{min(1.0, max(0.0, before + rng.uniform(-0.3, 0.3))):.4f}',
+            'attackingTeamNumber': next((r['attackingTeamNumber'] for r in rounds if r['id'] == kill['roundId']), None),
+        })
+
+    # A spike plant in most rounds, so round_timeline's post-plant states have input
+    for round_data in rounds:
+        length = round_length.get(round_data['id'], 60000)
+        if not player_ids or rng.random() >= 0.6:
+            continue
+        before = rng.random()
+        events.append({
+            'roundId': round_data['id'], 'roundNumber': round_data['number'],
+            'roundTimeMillis': rng.randint(length // 3, length), 'killId': None,
+            'tradedByKillId': None, 'tradedForKillId': None,
+            'bombId': f'{rng.getrandbits(32):08x}', 'resId': None, 'playerId': rng.choice(player_ids), 'assists': [],
+            'referencePlayerId': None, 'eventType': 'plant', 'damageType': None,
+            'weaponId': None, 'ability': None, 'impact': f'{rng.uniform(0, 0.3):.4f}',
+            'attackingWinProbabilityBefore': f'{before:.4f}',
+            'attackingWinProbabilityAfter': f'{min(1.0, before + rng.uniform(0, 0.3)):.4f}',
+            'attackingTeamNumber': round_data.get('attackingTeamNumber'),
+        })
+
+    locations, economies = [], []
+    for round_data in rounds:
+        length = round_length.get(round_data['id'], 60000)
+        for player_id in player_ids:
+            for t in range(0, length, LOCATION_INTERVAL_MS):
+                locations.append({'roundNumber': round_data['number'], 'playerId': player_id, 'roundTimeMillis': t,
+                                  'locationX': rng.uniform(-8000, 8000), 'locationY': rng.uniform(-8000, 8000),
+                                  'viewRadians': rng.uniform(0, 6.28)})
+            spent = rng.randint(0, 5000)
+            economies.append({'roundId': round_data['id'], 'roundNumber': round_data['number'],
+                              'playerId': player_id, 'agentId': None, 'score': rng.randint(0, 600),
+                              'weaponId': rng.randint(1, 18), 'armorId': rng.choice([None, 1, 2]),
+                              'remainingCreds': rng.randint(0, 9000), 'spentCreds': spent,
+                              'loadoutValue': spent + rng.randint(0, 1500), 'survived': rng.random() < 0.4,
+                              'kast': rng.random() < 0.7})
+    return {'id': match['id'], 'playerStats': match.get('stats') or [], 'events': events,
+            'locations': locations, 'economies': economies}
+
+
+def build_site(payloads, recorded_details, scale, site_dir):
+    """
+    Write the pages the stub server replays; returns [(seriesId, [matchIds])].
+
+    Pages go to disk rather than memory so season-sized runs stay bounded.
+    """
+    os.makedirs(site_dir, exist_ok=True)
+    rng = random.Random(0)
+    catalogue = []
+    for copy_number in range(scale):
+        for payload in payloads:
+            payload = scaled_payload(payload, copy_number)
+            series = payload['series']
+            with open(os.path.join(site_dir, f"series_{series['id']}.html"), 'wb') as f:
+                f.write(build_fixture_page(payload))
+            match_ids = []
+            for match in series['matches']:
+                original_id = match['id'] - copy_number * ID_STRIDE
+                details = recorded_details.get(original_id)
+                if details is not None and copy_number:
+                    details = json.loads(details)
+                    _shift(details, copy_number * ID_STRIDE)
+                    details['id'] = match['id']
+                    details = json.dumps(details).encode('utf-8')
+                elif details is None:
+                    details = json.dumps(synthetic_details(series, match, rng)).encode('utf-8')
+                with open(os.path.join(site_dir, f"details_{match['id']}.json"), 'wb') as f:
+                    f.write(details)
+                match_ids.append(match['id'])
+            catalogue.append((series['id'], match_ids))
+    return catalogue
+
+
+# --- Stub server --------------------------------------------------------------
+
+class StubHandler(http.server.BaseHTTPRequestHandler):
+    """Serves /series/<id> and /v1/matches/<id>/details from the site dir, with keep-alive."""
+
+    protocol_version = 'HTTP/1.1'
+    routes = [
+        (re.compile(r'^/series/(\d+)$'), 'series_{}.html', 'text/html'),
+        (re.compile(r'^/v1/matches/(\d+)/details$'), 'details_{}.json', 'application/json'),
+    ]
+
+    def do_GET(self):
+        for pattern, filename, content_type in self.routes:
+            match = pattern.match(self.path)
+            if match:
+                path = os.path.join(self.server.site_dir, filename.format(match.group(1)))
+                if os.path.exists(path):
+                    with open(path, 'rb') as f:
+                        body = f.read()
+                    self.send_response(200)
+                    self.send_header('Content-Type', content_type)
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                    return
+        self.send_response(404)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+@contextlib.contextmanager
+def stub_server(site_dir):
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    server.site_dir = site_dir
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f'http://127.0.0.1:{server.server_address[1]}'
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+# --- Ephemeral Postgres -------------------------------------------------------
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+@contextlib.contextmanager
+def ephemeral_postgres(pg_bin=None):
+    """A throwaway cluster on a unix socket; yields a psycopg2 config for its `bench` database."""
+    pg_bin = pg_bin or os.path.dirname(shutil.which('initdb') or '')
+    if not pg_bin or not os.path.exists(os.path.join(pg_bin, 'initdb')):
+        raise FileNotFoundError('initdb not found (put it on PATH or pass --pg-bin)')
+    root = tempfile.mkdtemp(prefix='bench_pg_')
+    data = os.path.join(root, 'data')
+    port = _free_port()
+    try:
+        subprocess.run([os.path.join(pg_bin, 'initdb'), '-D', data, '-U', 'postgres', '--auth=trust', '-E', 'UTF8'],
+                       check=True, capture_output=True)
+        subprocess.run([os.path.join(pg_bin, 'pg_ctl'), '-D', data, '-l', os.path.join(root, 'postgres.log'), '-w',
+                        '-o', f"-p {port} -k {root} -c listen_addresses=''", 'start'],
+                       check=True, capture_output=True)
+        try:
+            config = {'host': root, 'port': port, 'user': 'postgres', 'database': 'postgres'}
+            conn = psycopg2.connect(**config)
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                cur.execute('CREATE DATABASE bench')
+            conn.close()
+            yield dict(config, database='bench')
+        finally:
+            subprocess.run([os.path.join(pg_bin, 'pg_ctl'), '-D', data, '-m', 'fast', '-w', 'stop'],
+                           capture_output=True)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def count_rows(db_config):
+    conn = psycopg2.connect(**db_config)
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT tablename FROM pg_tables WHERE schemaname = 'public'")
+            tables = [row[0] for row in cur.fetchall()]
+            total = 0
+            for table in tables:
+                cur.execute(f'SELECT COUNT(*) FROM "{table}"')
+                total += cur.fetchone()[0]
+        return total
+    finally:
+        conn.close()
+
+
+# --- Measurement --------------------------------------------------------------
+
+def current_rss():
+    """Resident set size in bytes (lifetime peak where /proc isn't available)."""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class StageStats:
+    def __init__(self, name):
+        self.name = name
+        self.seconds = 0.0
+        self.pages = 0
+        self.bytes = 0
+        self.rows = 0
+        self.peak_rss = 0
+
+    def as_dict(self):
+        rate = (lambda amount: amount / self.seconds) if self.seconds else (lambda amount: 0.0)
+        return {
+            'seconds': round(self.seconds, 4),
+            'pages': self.pages,
+            'mb': round(self.bytes / 1e6, 3),
+            'rows': self.rows,
+            'pages_per_s': round(rate(self.pages), 2),
+            'mb_per_s': round(rate(self.bytes / 1e6), 2),
+            'rows_per_s': round(rate(self.rows), 1),
+            'peak_rss_mb': round(self.peak_rss / 1e6, 1),
+        }
+
+
+class Profiler:
+    """
+    Accumulates time per stage. A sampler thread tracks RSS against whichever
+    stage is running, so stages interleaved per series still get their own peak.
+    """
+
+    def __init__(self):
+        self.stages = {name: StageStats(name) for name in STAGES}
+        self.current = None
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self):
+        while not self._stop.wait(RSS_INTERVAL):
+            stage = self.current
+            if stage is not None:
+                stage.peak_rss = max(stage.peak_rss, current_rss())
+
+    def start(self):
+        self._sampler.start()
+
+    def stop(self):
+        self._stop.set()
+        self._sampler.join()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        stage = self.stages[name]
+        self.current = stage
+        stage.peak_rss = max(stage.peak_rss, current_rss())
+        started = time.perf_counter()
+        try:
+            yield stage
+        finally:
+            stage.seconds += time.perf_counter() - started
+            stage.peak_rss = max(stage.peak_rss, current_rss())
+            self.current = None
+
+
+# --- Pipeline -----------------------------------------------------------------
+
+def replay_scrape(profiler, base_url, catalogue, data_root, scraper):
+    """fetch -> parse -> entities -> write for every series, the way scrapeSeries does it."""
+    for series_id, match_ids in catalogue:
+        with profiler.stage('fetch') as stage:
+            page = fetch_client.get(f'{base_url}/series/{series_id}')
+            page.raise_for_status()
+            details_responses = []
+            for match_id in match_ids:
+                response = fetch_client.get(f'{base_url}/v1/matches/{match_id}/details')
+                response.raise_for_status()
+                details_responses.append((match_id, response))
+            stage.pages += 1 + len(match_ids)
+            stage.bytes += len(page.content) + sum(len(response.content) for _, response in details_responses)
+
+        with profiler.stage('parse') as stage:
+            stats_data = extract_json_data(page, SERIES_PATHS)
+            details = [(match_id, response.json()) for match_id, response in details_responses]
+            stage.pages += 1 + len(details)
+            stage.bytes += len(page.content) + sum(len(response.content) for _, response in details_responses)
+
+        series = stats_data['props']['pageProps']['series']
+        with profiler.stage('entities') as stage, contextlib.redirect_stdout(io.StringIO()):
+            scraper.update_ign_and_id(stats_data)
+            scraper.update_team(stats_data)
+            scraper.update_abilities(stats_data)
+            stage.rows += (sum(len(match['players']) for match in series['matches']) + 2
+                           + len(stats_data['props']['pageProps']['content']['abilities']))
+
+        with profiler.stage('write') as stage:
+            folder = os.path.join(data_root, scraper.sanitize_filename(series.get('eventChildLabel') or 'event'),
+                                  'bench', str(series_id))
+            os.makedirs(folder, exist_ok=True)
+            extra_file = os.path.join(folder, f'{series_id}_extra.json')
+            with open(extra_file, 'w') as json_file:
+                json.dump(series, json_file)
+            stage.bytes += os.path.getsize(extra_file)
+            for match_id, match_details in details:
+                details_file = os.path.join(folder, f'{match_id}_details.json')
+                with open(details_file, 'w') as json_file:
+                    json.dump(match_details, json_file)
+                stage.bytes += os.path.getsize(details_file)
+            stage.pages += 1 + len(details)
+
+    with profiler.stage('entities'), contextlib.redirect_stdout(io.StringIO()):
+        scraper.flush_entity_tables()
+
+
+def replay_load(profiler, data_root, db_config, bulk=True):
+    sys.path.insert(0, DATA_DIR)
+    from populateDB import ValorantDataProcessor
+
+    conn = psycopg2.connect(**db_config)
+    with conn:
+        with conn.cursor() as cur:
+            with open(SCHEMA_FILE, 'r') as f:
+                cur.execute(f.read())
+    conn.close()
+    rows_before = count_rows(db_config)
+
+    with profiler.stage('load') as stage:
+        processor = ValorantDataProcessor(db_config, bulk=bulk)
+        processor.connect_db()
+        try:
+            processor.process_data_folder(data_root)
+        finally:
+            processor.close_db()
+    stage.rows = count_rows(db_config) - rows_before
+    stage.pages = len(glob.glob(os.path.join(data_root, '**', '*.json'), recursive=True))
+
+
+def compare(results, baseline):
+    """Print each rate next to the baseline's, with the relative change."""
+    print(f"\nAgainst baseline from {baseline.get('started', '?')} (scale {baseline.get('scale')}):")
+    for name, stage in results['stages'].items():
+        before = baseline.get('stages', {}).get(name)
+        if not before:
+            continue
+        for metric in ('pages_per_s', 'mb_per_s', 'rows_per_s'):
+            if stage[metric] and before.get(metric):
+                change = (stage[metric] - before[metric]) / before[metric] * 100
+                print(f"  {name:<9} {metric:<12} {before[metric]:>10} -> {stage[metric]:>10}  {change:+6.1f}%")
+        if before.get('peak_rss_mb'):
+            change = (stage['peak_rss_mb'] - before['peak_rss_mb']) / before['peak_rss_mb'] * 100
+            print(f"  {name:<9} {'peak_rss_mb':<12} {before['peak_rss_mb']:>10} -> {stage['peak_rss_mb']:>10}  {change:+6.1f}%")
+
+
+def report(results):
+    print(f"\n{results['series']} series / {results['matches']} matches (scale {results['scale']})")
+    for name, stage in results['stages'].items():
+        if stage['seconds']:
+            print(f"  {name:<9} {stage['seconds']:8.2f}s  {stage['pages_per_s']:8.1f} pages/s  "
+                  f"{stage['mb_per_s']:8.1f} MB/s  {stage['rows_per_s']:10.1f} rows/s  "
+                  f"peak {stage['peak_rss_mb']:7.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark fetch -> parse -> load on recorded fixtures')
+    parser.add_argument('--fixtures', help='dir of recorded <seriesId>.html pages and <matchId>_details.json')
+    parser.add_argument('--scale', default='series', help=f"series copies, or one of {', '.join(SCALES)}")
+    parser.add_argument('--out', help='write results as JSON')
+    parser.add_argument('--baseline', help='JSON results of an earlier run to compare against')
+    parser.add_argument('--dsn', help='load into this (empty) database instead of a throwaway cluster')
+    parser.add_argument('--pg-bin', help='directory with initdb / pg_ctl')
+    parser.add_argument('--row-inserts', action='store_true', help='load with per-row inserts instead of COPY')
+    parser.add_argument('--skip-load', action='store_true')
+    parser.add_argument('--keep', action='store_true', help='keep the work dir (pages, Data tree, entity CSVs)')
+    args = parser.parse_args()
+
+    scale = SCALES[args.scale] if args.scale in SCALES else int(args.scale)
+    payloads, recorded_details = load_fixtures(args.fixtures)
+    work_dir = tempfile.mkdtemp(prefix='bench_pipeline_')
+    data_root = os.path.join(work_dir, 'Data')
+    print(f"Building {scale * len(payloads)} series in {work_dir}")
+    catalogue = build_site(payloads, recorded_details, scale, os.path.join(work_dir, 'site'))
+
+    # script6 opens its registry and entity CSVs in the working directory on import,
+    # so it has to be found by path rather than through the cwd
+    sys.path.insert(0, MANN_DIR)
+    cwd = os.getcwd()
+    os.chdir(work_dir)
+    profiler = Profiler()
+    profiler.start()
+    try:
+        scraper = importlib.import_module('script6')
+        with stub_server(os.path.join(work_dir, 'site')) as base_url:
+            replay_scrape(profiler, base_url, catalogue, data_root, scraper)
+        fetch_client.close_sessions()
+
+        if not args.skip_load:
+            if args.dsn:
+                replay_load(profiler, data_root, psycopg2.extensions.parse_dsn(args.dsn), not args.row_inserts)
+            else:
+                try:
+                    with ephemeral_postgres(args.pg_bin) as db_config:
+                        replay_load(profiler, data_root, db_config, not args.row_inserts)
+                except (FileNotFoundError, subprocess.CalledProcessError) as e:
+                    print(f"Skipping load stage, no throwaway Postgres: {e}")
+    finally:
+        profiler.stop()
+        os.chdir(cwd)
+        if not args.keep:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    results = {
+        'started': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'scale': scale,
+        'series': len(catalogue),
+        'matches': sum(len(match_ids) for _, match_ids in catalogue),
+        'stages': {name: stage.as_dict() for name, stage in profiler.stages.items()},
+    }
+    report(results)
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            compare(results, json.load(f))
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,466 @@
+"""
+Spread a backfill crawl over several worker processes or machines.
+
+The coordinator walks the event pages once, puts every series still to
+scrape into a lease table and hands out batches over HTTP. Each worker
+claims a batch, heartbeats while it scrapes, and writes into its own
+directory (Data/ tree, scrape_state.db registry, entity CSVs, response
+cache), so workers on different boxes never share files. A merge step folds
+the worker directories back into the main tree.
+
+    python distributed_crawl.py coordinator --port 8765            # in mann/, walks tourney_urls.txt
+    python distributed_crawl.py worker --coordinator http://host:8765 --name box1
+    python distributed_crawl.py merge workers/*                     # into the current tree
+    python distributed_crawl.py local --workers 4                   # all of the above on this machine
+
+Leases that are not heartbeated expire and the series goes back to the
+queue; a series that keeps failing is dead-lettered after MAX_ATTEMPTS.
+"""
+import argparse
+import asyncio
+import csv
+import http.server
+import importlib
+import json
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+
+import requests
+
+MANN_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, MANN_DIR)
+
+from series_registry import REGISTRY_DB  # noqa: E402
+from work_queue import MAX_ATTEMPTS, RETRY_BASE, RETRY_MAX, PRIORITIES, LIVE_BOOST, SERIES  # noqa: E402
+
+COORDINATOR_DB = 'coordinator.db'
+WORKERS_DIR = 'workers'
+DEFAULT_PORT = 8765
+LEASE_SECONDS = 300
+BATCH_SIZE = 5
+POLL_SECONDS = 5
+# How long a finished coordinator keeps answering so idle workers hear it is done
+LINGER_SECONDS = 2 * POLL_SECONDS
+
+
+def load_scraper(directory):
+    """
+    Import script6 with `directory` as the working directory: it opens its
+    registry, event graph and entity CSVs in the cwd on import.
+    """
+    os.makedirs(directory, exist_ok=True)
+    os.chdir(directory)
+    return importlib.import_module('script6')
+
+
+class LeaseTable:
+    """
+    Series to scrape, each pending, leased to one worker until `lease_until`,
+    done or dead. Claims, heartbeats and results are single SQLite writes, and
+    expired leases are returned to the queue on every claim.
+    """
+
+    def __init__(self, db_path=COORDINATOR_DB, lease_seconds=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS):
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS leases (
+                series_id TEXT PRIMARY KEY,
+                folder TEXT NOT NULL,
+                priority INTEGER NOT NULL DEFAULT 0,
+                status TEXT NOT NULL DEFAULT 'pending',
+                worker TEXT,
+                lease_until REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                not_before REAL NOT NULL DEFAULT 0,
+                last_error TEXT,
+                updated_at REAL
+            );
+            CREATE INDEX IF NOT EXISTS leases_ready ON leases (status, priority DESC);
+        ''')
+
+    def add(self, series_id, folder, priority=PRIORITIES[SERIES]):
+        """
+        Queue a series. Dead ones get a fresh set of attempts; done ones stay
+        done, their output is waiting in a worker directory to be merged.
+        """
+        with self.lock:
+            self.conn.execute('''
+                INSERT INTO leases (series_id, folder, priority, updated_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT (series_id) DO UPDATE SET
+                    folder = excluded.folder, priority = excluded.priority, updated_at = excluded.updated_at,
+                    status = CASE WHEN status = 'dead' THEN 'pending' ELSE status END,
+                    attempts = CASE WHEN status = 'dead' THEN 0 ELSE attempts END
+            ''', (str(series_id), folder, priority, time.time()))
+
+    def _expire(self, now):
+        self.conn.execute('''
+            UPDATE leases SET status = CASE WHEN attempts >= ? THEN 'dead' ELSE 'pending' END,
+                              worker = NULL, last_error = 'lease expired', updated_at = ?
+            WHERE status = 'leased' AND lease_until < ?
+        ''', (self.max_attempts, now, now))
+
+    def claim(self, worker, n):
+        """Lease up to `n` ready series to `worker`. Returns [(series_id, folder)]."""
+        now = time.time()
+        with self.lock:
+            self._expire(now)
+            rows = self.conn.execute('''
+                UPDATE leases SET status = 'leased', worker = :worker, lease_until = :until,
+                                  attempts = attempts + 1, updated_at = :now
+                WHERE series_id IN (
+                    SELECT series_id FROM leases WHERE status = 'pending' AND not_before <= :now
+                    ORDER BY priority DESC, rowid LIMIT :n)
+                RETURNING series_id, folder
+            ''', {'worker': worker, 'until': now + self.lease_seconds, 'now': now, 'n': int(n)}).fetchall()
+        return rows
+
+    def heartbeat(self, worker, series_ids):
+        """Extend `worker`'s leases on `series_ids`. Returns the ids it no longer holds."""
+        now = time.time()
+        with self.lock:
+            held = {row[0] for row in self.conn.execute(f'''
+                UPDATE leases SET lease_until = ?, updated_at = ?
+                WHERE worker = ? AND status = 'leased' AND series_id IN ({','.join('?' * len(series_ids))})
+                RETURNING series_id
+            ''', (now + self.lease_seconds, now, worker, *map(str, series_ids)))} if series_ids else set()
+        return [series_id for series_id in map(str, series_ids) if series_id not in held]
+
+    def complete(self, worker, series_id):
+        # Accepted even from a worker whose lease expired: the output exists either way
+        with self.lock:
+            self.conn.execute('''
+                UPDATE leases SET status = 'done', worker = ?, last_error = NULL, updated_at = ?
+                WHERE series_id = ?
+            ''', (worker, time.time(), str(series_id)))
+
+    def fail(self, worker, series_id, error):
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT attempts FROM leases WHERE series_id = ? AND worker = ? AND status = 'leased'",
+                (str(series_id), worker)).fetchone()
+            if row is None:
+                return None
+            attempts = row[0]
+            status = 'dead' if attempts >= self.max_attempts else 'pending'
+            not_before = now + min(RETRY_MAX, RETRY_BASE * 2 ** (attempts - 1)) if status == 'pending' else 0
+            self.conn.execute('''
+                UPDATE leases SET status = ?, worker = NULL, not_before = ?, last_error = ?, updated_at = ?
+                WHERE series_id = ?
+            ''', (status, not_before, str(error)[:1000], now, str(series_id)))
+        return status
+
+    def remaining(self):
+        """Series not yet done or dead."""
+        with self.lock:
+            return self.conn.execute(
+                "SELECT COUNT(*) FROM leases WHERE status IN ('pending', 'leased')").fetchone()[0]
+
+    def status(self):
+        with self.lock:
+            counts = dict(self.conn.execute('SELECT status, COUNT(*) FROM leases GROUP BY status').fetchall())
+            workers = dict(self.conn.execute(
+                "SELECT worker, COUNT(*) FROM leases WHERE status = 'done' GROUP BY worker").fetchall())
+            dead = self.conn.execute(
+                "SELECT series_id, attempts, last_error FROM leases WHERE status = 'dead'").fetchall()
+        return {'counts': counts, 'done_by_worker': workers,
+                'dead': [{'series_id': s, 'attempts': a, 'error': e} for s, a, e in dead]}
+
+
+class CoordinatorHandler(http.server.BaseHTTPRequestHandler):
+    """JSON API over the lease table: POST /claim, /heartbeat, /complete, /fail and GET /status."""
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, body, status=200):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == '/status':
+            self._reply(self.server.leases.status())
+        else:
+            self._reply({'error': 'not found'}, 404)
+
+    def do_POST(self):
+        leases = self.server.leases
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        worker = body.get('worker', self.client_address[0])
+        if self.path == '/claim':
+            tasks = [{'series_id': s, 'folder': f} for s, f in leases.claim(worker, body.get('n', BATCH_SIZE))]
+            self._reply({'tasks': tasks, 'remaining': leases.remaining(), 'lease_seconds': leases.lease_seconds})
+        elif self.path == '/heartbeat':
+            self._reply({'lost': leases.heartbeat(worker, body.get('series_ids', []))})
+        elif self.path == '/complete':
+            leases.complete(worker, body['series_id'])
+            self._reply({'ok': True})
+        elif self.path == '/fail':
+            self._reply({'status': leases.fail(worker, body['series_id'], body.get('error'))})
+        else:
+            self._reply({'error': 'not found'}, 404)
+
+
+def start_coordinator(leases, host, port):
+    server = http.server.ThreadingHTTPServer((host, port), CoordinatorHandler)
+    server.leases = leases
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+async def discover(scraper, tourney_urls, leases):
+    """Walk every incomplete event page and queue its unscraped series. Returns how many were queued."""
+    engine = scraper.FetchEngine()
+    queued = 0
+    for tourney_url in tourney_urls:
+        if scraper.graph.is_complete(tourney_url):
+            print(f"Event {tourney_url} is complete. Skipping...")
+            continue
+        try:
+            live, jobs = await scraper.discoverTourney(engine, tourney_url)
+        except Exception as e:
+            print(f'Failed trying to scrape tournament data: {e}\n')
+            continue
+        priority = PRIORITIES[SERIES] + (LIVE_BOOST if live else 0)
+        for series_id, bracket_folder in jobs:
+            # Workers recreate the folder under their own output directory
+            leases.add(series_id, os.path.relpath(bracket_folder), priority)
+            queued += 1
+    return queued
+
+
+def refresh_events(scraper, tourney_urls):
+    """Re-check event completion now that merged worker output is in the registry."""
+    for tourney_url in tourney_urls:
+        if scraper.graph.refresh_completion(tourney_url, scraper.registry):
+            print(f"Event {tourney_url} complete; later runs will skip it")
+
+
+def wait_until_drained(leases, linger=LINGER_SECONDS):
+    while leases.remaining():
+        time.sleep(1)
+    time.sleep(linger)
+
+
+def resolve_paths(args):
+    # Relative to where the command was run, not the scrape tree it changes into
+    args.urls = os.path.abspath(args.urls)
+    args.db = os.path.abspath(args.db)
+
+
+def run_coordinator(args):
+    resolve_paths(args)
+    scraper = load_scraper(args.dir)
+    leases = LeaseTable(args.db, args.lease)
+    with open(args.urls, 'r') as file:
+        tourney_urls = [url for url in file.read().splitlines() if url.strip()]
+    queued = asyncio.run(discover(scraper, tourney_urls, leases))
+    print(f"Queued {queued} series; {leases.remaining()} waiting for workers")
+
+    server = start_coordinator(leases, args.host, args.port)
+    print(f"Coordinator listening on http://{args.host}:{server.server_address[1]}")
+    try:
+        wait_until_drained(leases)
+    finally:
+        server.shutdown()
+    print(json.dumps(leases.status(), indent=2))
+
+
+class CoordinatorClient:
+    def __init__(self, url, worker, retries=5):
+        self.url = url.rstrip('/')
+        self.worker = worker
+        self.retries = retries
+        self.session = requests.Session()
+
+    def post(self, path, **body):
+        for attempt in range(self.retries):
+            try:
+                response = self.session.post(f'{self.url}{path}', json={'worker': self.worker, **body}, timeout=30)
+                response.raise_for_status()
+                return response.json()
+            except requests.RequestException as e:
+                if attempt == self.retries - 1:
+                    raise
+                print(f"Coordinator unreachable ({e}), retrying...")
+                time.sleep(2 ** attempt)
+
+
+async def heartbeat(client, series_ids, interval):
+    while True:
+        await asyncio.sleep(interval)
+        lost = (await asyncio.to_thread(client.post, '/heartbeat', series_ids=series_ids))['lost']
+        if lost:
+            print(f"Lost the lease on {lost}; another worker may scrape them too")
+
+
+async def crawl_leases(scraper, client, batch, poll):
+    # One engine for the worker's lifetime so the learned per-host limits carry across batches
+    engine = scraper.FetchEngine()
+    while True:
+        reply = await asyncio.to_thread(client.post, '/claim', n=batch)
+        tasks = reply['tasks']
+        if not tasks:
+            if not reply['remaining']:
+                break
+            # Everything left is leased elsewhere or waiting on a retry
+            await asyncio.sleep(poll)
+            continue
+
+        series_ids = []
+        for task in tasks:
+            # Already scraped by this worker on an earlier lease whose result never reached the coordinator
+            if task['series_id'] in scraper.registry:
+                await asyncio.to_thread(client.post, '/complete', series_id=task['series_id'])
+            else:
+                series_ids.append(task['series_id'])
+        tasks = [task for task in tasks if task['series_id'] in series_ids]
+        beating = asyncio.create_task(heartbeat(client, series_ids, reply['lease_seconds'] / 3))
+        jobs = []
+        for task in tasks:
+            bracket_folder = os.path.abspath(task['folder'])
+            os.makedirs(bracket_folder, exist_ok=True)
+            jobs.append((engine, task['series_id'], bracket_folder))
+        try:
+            await engine.run_pipeline(jobs, scraper.scrapeSeries)
+        finally:
+            beating.cancel()
+            scraper.flush_entity_tables()
+
+        for series_id in series_ids:
+            if series_id in scraper.registry:
+                await asyncio.to_thread(client.post, '/complete', series_id=series_id)
+            else:
+                header_done, done, total = scraper.registry.status(series_id)
+                if not header_done:
+                    error = 'series header failed'
+                elif done == total:
+                    error = 'series still being played'
+                else:
+                    error = f'{done}/{total} match details saved'
+                await asyncio.to_thread(client.post, '/fail', series_id=series_id, error=error)
+    engine.print_report()
+
+
+def run_worker(args):
+    out_dir = os.path.abspath(args.out or os.path.join(WORKERS_DIR, args.name))
+    scraper = load_scraper(out_dir)
+    client = CoordinatorClient(args.coordinator, args.name)
+    print(f"Worker {args.name} writing to {out_dir}")
+    asyncio.run(crawl_leases(scraper, client, args.batch, args.poll))
+    scraper.registry.export_ids(scraper.scraped_series_ids_file)
+    scraper.metrics.write_prometheus(scraper.metrics_file)
+
+
+def merge_workers(scraper, worker_dirs):
+    """Fold worker output directories into the tree `scraper` was loaded in."""
+    tables = (scraper.ign_table, scraper.team_table, scraper.abilities_table)
+    for worker_dir in worker_dirs:
+        worker_dir = os.path.abspath(worker_dir)
+        data_dir = os.path.join(worker_dir, 'Data')
+        if os.path.isdir(data_dir):
+            shutil.copytree(data_dir, 'Data', dirs_exist_ok=True)
+        registry_file = os.path.join(worker_dir, REGISTRY_DB)
+        added = scraper.registry.merge_from(registry_file) if os.path.exists(registry_file) else 0
+        for table in tables:
+            csv_file = os.path.join(worker_dir, table.csv_file)
+            if os.path.exists(csv_file):
+                with open(csv_file, 'r', newline='', encoding='utf-8') as file:
+                    table.upsert(csv.DictReader(file))
+        print(f"Merged {worker_dir}: {added} series completed")
+    scraper.flush_entity_tables()
+    scraper.registry.export_ids(scraper.scraped_series_ids_file)
+
+
+def run_merge(args):
+    worker_dirs = [os.path.abspath(path) for path in args.worker_dirs]
+    args.urls = os.path.abspath(args.urls)
+    scraper = load_scraper(args.dir)
+    merge_workers(scraper, worker_dirs)
+    if os.path.exists(args.urls):
+        with open(args.urls, 'r') as file:
+            refresh_events(scraper, [url for url in file.read().splitlines() if url.strip()])
+
+
+def run_local(args):
+    """Coordinator plus `--workers` worker processes on this machine, then the merge."""
+    resolve_paths(args)
+    scraper = load_scraper(args.dir)
+    leases = LeaseTable(args.db, args.lease)
+    with open(args.urls, 'r') as file:
+        tourney_urls = [url for url in file.read().splitlines() if url.strip()]
+    queued = asyncio.run(discover(scraper, tourney_urls, leases))
+    print(f"Queued {queued} series; {leases.remaining()} waiting for workers")
+
+    server = start_coordinator(leases, '127.0.0.1', args.port)
+    url = f'http://127.0.0.1:{server.server_address[1]}'
+    worker_dirs = [os.path.abspath(os.path.join(WORKERS_DIR, f'local{i}')) for i in range(args.workers)]
+    processes = [subprocess.Popen([sys.executable, os.path.abspath(__file__), 'worker', '--coordinator', url,
+                                   '--name', f'local{i}', '--out', worker_dir, '--batch', str(args.batch)])
+                 for i, worker_dir in enumerate(worker_dirs)]
+    try:
+        for process in processes:
+            process.wait()
+    finally:
+        server.shutdown()
+    print(json.dumps(leases.status(), indent=2))
+    merge_workers(scraper, worker_dirs)
+    refresh_events(scraper, tourney_urls)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Distributed crawl: coordinator, workers and merge')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    def add_coordinator_options(command):
+        command.add_argument('--dir', default='.', help='main scrape tree (registry, event graph, Data/)')
+        command.add_argument('--urls', default='tourney_urls.txt')
+        command.add_argument('--db', default=COORDINATOR_DB, help='lease table')
+        command.add_argument('--lease', type=float, default=LEASE_SECONDS, help='lease length in seconds')
+
+    coordinator = commands.add_parser('coordinator', help='queue the unscraped series and lease them out')
+    add_coordinator_options(coordinator)
+    coordinator.add_argument('--host', default='0.0.0.0')
+    coordinator.add_argument('--port', type=int, default=DEFAULT_PORT)
+    coordinator.set_defaults(run=run_coordinator)
+
+    worker = commands.add_parser('worker', help='claim and scrape series until the coordinator is drained')
+    worker.add_argument('--coordinator', required=True, help='e.g. http://10.0.0.5:8765')
+    worker.add_argument('--name', default=f'{os.uname().nodename}-{os.getpid()}')
+    worker.add_argument('--out', help=f'output directory (default {WORKERS_DIR}/<name>)')
+    worker.add_argument('--batch', type=int, default=BATCH_SIZE, help='series claimed at a time')
+    worker.add_argument('--poll', type=float, default=POLL_SECONDS)
+    worker.set_defaults(run=run_worker)
+
+    merge = commands.add_parser('merge', help='fold worker directories into the main tree')
+    merge.add_argument('worker_dirs', nargs='+')
+    merge.add_argument('--dir', default='.', help='main scrape tree')
+    merge.add_argument('--urls', default='tourney_urls.txt', help='events whose completion to re-check')
+    merge.set_defaults(run=run_merge)
+
+    local = commands.add_parser('local', help='coordinator, worker processes and merge on this machine')
+    add_coordinator_options(local)
+    local.add_argument('--workers', type=int, default=3)
+    local.add_argument('--port', type=int, default=0, help='0 picks a free port')
+    local.add_argument('--batch', type=int, default=BATCH_SIZE)
+    local.set_defaults(run=run_local)
+
+    args = parser.parse_args()
+    args.run(args)
+
+
+if __name__ == '__main__':
+    main()
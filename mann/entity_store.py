@@ -0,0 +1,80 @@
+import csv
+import os
+
+import metrics
+
+
+def _normalise(value):
+    """
+    Key form of a cell, matching how pandas compared values after read_csv:
+    2321, 2321.0 and '2321.0' are the same id and True equals 'True'.
+    """
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return str(value)
+    if isinstance(value, (int, float)):
+        return str(int(value)) if float(value).is_integer() else str(value)
+    value = str(value)
+    try:
+        number = float(value)
+    except ValueError:
+        return value
+    return str(int(number)) if number.is_integer() else value
+
+
+class EntityTable:
+    """
+    Append-only CSV entity table with an in-memory key index.
+
+    The existing file is read once for its keys. upsert() queues only rows
+    whose key hasn't been seen, and flush() appends them, so updating costs
+    O(new rows) instead of re-reading and rewriting the whole CSV. Keys are
+    the same columns the old drop_duplicates(subset=...) calls used.
+    """
+
+    def __init__(self, csv_file, columns, key_columns=None):
+        self.csv_file = csv_file
+        self.columns = list(columns)
+        self.key_columns = list(key_columns or columns)
+        self.keys = set()
+        self.pending = []
+        self._load_keys()
+
+    def _load_keys(self):
+        if not os.path.exists(self.csv_file) or os.path.getsize(self.csv_file) == 0:
+            return
+        with open(self.csv_file, 'r', newline='', encoding='utf-8') as file:
+            reader = csv.DictReader(file)
+            # Append in the column order the file already uses
+            self.columns = reader.fieldnames or self.columns
+            for row in reader:
+                self.keys.add(tuple(_normalise(row.get(column)) for column in self.key_columns))
+
+    def upsert(self, rows):
+        added = 0
+        with metrics.timer('csv_update_seconds', table=self.csv_file, op='upsert'):
+            for row in rows:
+                key = tuple(_normalise(row.get(column)) for column in self.key_columns)
+                if key in self.keys:
+                    continue
+                self.keys.add(key)
+                self.pending.append(row)
+                added += 1
+        metrics.inc('csv_rows_total', added, table=self.csv_file)
+        return added
+
+    def flush(self):
+        if not self.pending:
+            return 0
+        write_header = not os.path.exists(self.csv_file) or os.path.getsize(self.csv_file) == 0
+        with metrics.timer('csv_update_seconds', table=self.csv_file, op='flush'), \
+                open(self.csv_file, 'a', newline='', encoding='utf-8') as file:
+            writer = csv.writer(file)
+            if write_header:
+                writer.writerow(self.columns)
+            for row in self.pending:
+                writer.writerow(['' if row.get(column) is None else row.get(column) for column in self.columns])
+        written = len(self.pending)
+        self.pending = []
+        return written
@@ -0,0 +1,126 @@
+import sqlite3
+import time
+from datetime import datetime
+
+from series_registry import REGISTRY_DB
+
+
+def _ended(end_date, live, now=None):
+    """True once an event is no longer live and its endDate (ISO, UTC) has passed."""
+    if live or not end_date:
+        return False
+    try:
+        ends = datetime.fromisoformat(end_date.replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        return False
+    return ends < (now or time.time())
+
+
+class EventGraph:
+    """
+    Persisted event -> child event -> series graph discovered from event pages.
+
+    Lives next to the SeriesRegistry tables in the same SQLite file. An event
+    is marked completed once it and every child event have ended and every
+    series in their brackets has been scraped with a finished header
+    (SeriesRegistry.is_finished); completed events are skipped
+    without fetching the page again. Live events are re-walked and diffed, so
+    the crawl knows which series were newly scheduled since the last run.
+    """
+
+    def __init__(self, db_path=REGISTRY_DB):
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS events (
+                event_url TEXT PRIMARY KEY,
+                end_date TEXT,
+                live INTEGER NOT NULL DEFAULT 0,
+                completed INTEGER NOT NULL DEFAULT 0,
+                fetched_at REAL
+            );
+            CREATE TABLE IF NOT EXISTS child_events (
+                child_id TEXT PRIMARY KEY,
+                event_url TEXT NOT NULL,
+                title TEXT,
+                bracket_type TEXT,
+                end_date TEXT,
+                live INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS child_events_event ON child_events (event_url);
+            CREATE TABLE IF NOT EXISTS event_series (
+                series_id TEXT PRIMARY KEY,
+                child_id TEXT NOT NULL,
+                first_seen REAL
+            );
+            CREATE INDEX IF NOT EXISTS event_series_child ON event_series (child_id);
+        ''')
+        self.conn.commit()
+
+    def is_complete(self, event_url):
+        row = self.conn.execute('SELECT completed FROM events WHERE event_url = ?', (event_url,)).fetchone()
+        return bool(row and row[0])
+
+    def is_live(self, event_url):
+        """Whether the event was live when its page was last walked."""
+        row = self.conn.execute('SELECT live FROM events WHERE event_url = ?', (event_url,)).fetchone()
+        return bool(row and row[0])
+
+    def update(self, event_url, event, children):
+        """
+        Record a freshly walked event page. `children` holds (child event,
+        title, bracket_type, series_ids) per child event. Returns the series
+        ids that were not in the graph before.
+        """
+        now = time.time()
+        series_ids = [str(series_id) for *_, ids in children for series_id in ids if series_id is not None]
+        known = set()
+        for start in range(0, len(series_ids), 500):
+            chunk = series_ids[start:start + 500]
+            known.update(row[0] for row in self.conn.execute(
+                f"SELECT series_id FROM event_series WHERE series_id IN ({','.join('?' * len(chunk))})", chunk))
+
+        with self.conn:
+            self.conn.execute('''
+                INSERT INTO events (event_url, end_date, live, fetched_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT (event_url) DO UPDATE SET
+                    end_date = excluded.end_date, live = excluded.live, fetched_at = excluded.fetched_at
+            ''', (event_url, event.get('endDate'), int(bool(event.get('live'))), now))
+            for child, title, bracket_type, ids in children:
+                child_id = str(child.get('id', title))
+                self.conn.execute('''
+                    INSERT INTO child_events (child_id, event_url, title, bracket_type, end_date, live)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (child_id) DO UPDATE SET
+                        title = excluded.title, bracket_type = excluded.bracket_type,
+                        end_date = excluded.end_date, live = excluded.live
+                ''', (child_id, event_url, title, bracket_type, child.get('endDate'), int(bool(child.get('live')))))
+                self.conn.executemany(
+                    'INSERT OR IGNORE INTO event_series (series_id, child_id, first_seen) VALUES (?, ?, ?)',
+                    [(str(series_id), child_id, now) for series_id in ids if series_id is not None])
+        return [series_id for series_id in dict.fromkeys(series_ids) if series_id not in known]
+
+    def refresh_completion(self, event_url, registry):
+        """Mark the event completed if it has ended and every series is finished in `registry`. Returns the flag."""
+        row = self.conn.execute('SELECT end_date, live FROM events WHERE event_url = ?', (event_url,)).fetchone()
+        if row is None:
+            return False
+        children = self.conn.execute(
+            'SELECT child_id, end_date, live FROM child_events WHERE event_url = ?', (event_url,)).fetchall()
+        series = self.conn.execute('''
+            SELECT s.series_id FROM event_series s JOIN child_events c ON c.child_id = s.child_id
+            WHERE c.event_url = ?
+        ''', (event_url,))
+        completed = (_ended(*row) and all(_ended(end_date, live) for _, end_date, live in children)
+                     and all(registry.is_finished(series_id) for (series_id,) in series.fetchall()))
+        with self.conn:
+            self.conn.execute('UPDATE events SET completed = ? WHERE event_url = ?', (int(completed), event_url))
+        return completed
+
+    def reopen(self, event_url):
+        """Clear the completed flag so the next crawl walks the event page again."""
+        with self.conn:
+            self.conn.execute('UPDATE events SET completed = 0 WHERE event_url = ?', (event_url,))
+
+    def close(self):
+        self.conn.close()
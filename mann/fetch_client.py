@@ -0,0 +1,86 @@
+import threading
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+
+# Keep-alive connections kept open per host. Sized to cover the fetch engine's
+# per-host concurrency ceiling so concurrent calls don't fall back to throwaway connections.
+POOL_SIZE = 16
+DEFAULT_TIMEOUT = 60
+
+_sessions = {}
+_lock = threading.Lock()
+
+
+def session_for(url):
+    """Return the shared keep-alive session for the host of `url`."""
+    host = urlparse(url).netloc
+    with _lock:
+        session = _sessions.get(host)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _sessions[host] = session
+        return session
+
+
+def get(url, **kwargs):
+    kwargs.setdefault('timeout', DEFAULT_TIMEOUT)
+    host = urlparse(url).netloc
+    try:
+        with metrics.timer('fetch_seconds', host=host):
+            response = session_for(url).get(url, **kwargs)
+    except requests.RequestException:
+        metrics.inc('fetch_requests_total', host=host, status='error')
+        raise
+    metrics.inc('fetch_requests_total', host=host, status=response.status_code)
+    if not kwargs.get('stream'):
+        metrics.inc('fetch_bytes_total', len(response.content), host=host)
+    return response
+
+
+def pool_stats():
+    """
+    Connection reuse per host.
+
+    `connections` is how many TCP/TLS handshakes urllib3 actually made,
+    `requests` how many requests went over them; the difference is the number
+    of handshakes saved by keep-alive.
+    """
+    stats = {}
+    with _lock:
+        sessions = list(_sessions.items())
+    for host, session in sessions:
+        adapter = session.get_adapter(f'https://{host}')
+        pools = adapter.poolmanager.pools
+        connections = requests_made = 0
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            connections += pool.num_connections
+            requests_made += pool.num_requests
+        stats[host] = {
+            'requests': requests_made,
+            'connections': connections,
+            'reused': requests_made - connections,
+        }
+    return stats
+
+
+def print_pool_stats():
+    for host, stats in pool_stats().items():
+        print(f"{host}: {stats['requests']} requests over {stats['connections']} connections "
+              f"({stats['reused']} reused)")
+
+
+def close_sessions():
+    with _lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
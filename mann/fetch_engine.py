@@ -0,0 +1,245 @@
+import asyncio
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+
+import requests
+
+import metrics
+
+# Hosts the crawl talks to. rib.gg pages go through zenrows_get (so this is
+# really ZenRows' budget), match details go straight to the backend.
+RIB_HOST = 'rib.gg'
+DETAILS_HOST = 'be-prod.rib.gg'
+
+# Hard ceiling on the request rate per host, (requests per second, burst).
+# Within it the adaptive controller below decides how many calls are in flight.
+HOST_LIMITS = {
+    RIB_HOST: (2.0, 4),
+    DETAILS_HOST: (5.0, 8),
+}
+DEFAULT_LIMIT = (0.5, 1)
+
+# (initial, maximum) calls in flight per host, and the latency in seconds
+# under which a success counts as "healthy" and lets the limit grow
+HOST_CONCURRENCY = {
+    RIB_HOST: (2, 8),
+    DETAILS_HOST: (3, 16),
+}
+DEFAULT_CONCURRENCY = (1, 4)
+TARGET_LATENCY = {
+    RIB_HOST: 8.0,
+    DETAILS_HOST: 1.5,
+}
+DEFAULT_TARGET_LATENCY = 5.0
+
+# Responses that mean "slow down" rather than "this request is wrong"
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+RETRIES = 4
+BACKOFF_BASE = 2.0
+BACKOFF_MAX = 120.0
+
+
+class TokenBucket:
+    """Token bucket that spaces out acquisitions to `rate` per second."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        async with self.lock:
+            self._refill()
+            while self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= 1
+
+
+def retry_after_seconds(response):
+    """Seconds asked for by a Retry-After header (delta or HTTP date), or None."""
+    value = response.headers.get('Retry-After') if response is not None else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def is_throttle(error):
+    """True for failures that say the host is overloaded: 429/5xx, timeouts, dropped connections."""
+    if isinstance(error, requests.HTTPError):
+        return error.response is not None and error.response.status_code in RETRY_STATUSES
+    return isinstance(error, (requests.ConnectionError, requests.Timeout))
+
+
+class AdaptiveConcurrency:
+    """
+    AIMD limit on the calls in flight to one host.
+
+    Every success faster than `target_latency` adds 1/limit, so the limit
+    grows by about one per round trip while the host keeps up. A throttle
+    (429, 5xx, timeout) multiplies it by `decrease`, at most once per
+    (smoothed) round trip so a burst of failures from the same window only
+    counts once, and a Retry-After holds every new call until it has passed.
+    """
+
+    def __init__(self, initial, maximum, target_latency, minimum=1, decrease=0.5):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_latency = target_latency
+        self.decrease = decrease
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.last_decrease = 0.0
+        self.latency = None
+        self.peak = self.limit
+        self.counts = {'ok': 0, 'slow': 0, 'throttled': 0, 'error': 0}
+        self.condition = None
+
+    async def acquire(self):
+        if self.condition is None:
+            self.condition = asyncio.Condition()
+        async with self.condition:
+            while True:
+                delay = self.paused_until - time.monotonic()
+                if delay > 0:
+                    try:
+                        await asyncio.wait_for(self.condition.wait(), delay)
+                    except asyncio.TimeoutError:
+                        pass
+                elif self.in_flight < int(self.limit):
+                    break
+                else:
+                    await self.condition.wait()
+            self.in_flight += 1
+
+    async def release(self, latency, outcome='ok', retry_after=None):
+        """Free a slot and adjust the limit; `outcome` is 'ok', 'throttled' or 'error'."""
+        async with self.condition:
+            self.in_flight -= 1
+            now = time.monotonic()
+            self.latency = latency if self.latency is None else 0.8 * self.latency + 0.2 * latency
+            if outcome == 'throttled':
+                if now - self.last_decrease >= self.latency:
+                    self.limit = max(self.minimum, self.limit * self.decrease)
+                    self.last_decrease = now
+                if retry_after:
+                    self.paused_until = max(self.paused_until, now + retry_after)
+            elif outcome == 'ok' and latency <= self.target_latency:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+                self.peak = max(self.peak, self.limit)
+            elif outcome == 'ok':
+                outcome = 'slow'
+            self.counts[outcome] += 1
+            self.condition.notify_all()
+
+
+class FetchEngine:
+    """
+    Runs blocking fetch functions concurrently from asyncio.
+
+    Each host gets its own AdaptiveConcurrency controller, so ZenRows and
+    the details backend are tuned independently, and optionally a token
+    bucket as a hard ceiling on its request rate. Throttled calls are
+    retried with exponential backoff (or the host's Retry-After) outside
+    the slot; other errors are raised to the caller straight away.
+    `max_concurrency` is the default number of run_pipeline workers.
+    """
+
+    def __init__(self, host_limits=None, max_concurrency=6, host_concurrency=None, retries=RETRIES):
+        self.host_limits = HOST_LIMITS if host_limits is None else host_limits
+        self.host_concurrency = HOST_CONCURRENCY if host_concurrency is None else host_concurrency
+        self.max_concurrency = max_concurrency
+        self.retries = retries
+        self.buckets = {}
+        self.controllers = {}
+        # asyncio.to_thread's default pool is sized by CPU count and would cap
+        # the controllers long before their maximum
+        workers = sum(maximum for _, maximum in self.host_concurrency.values()) + DEFAULT_CONCURRENCY[1]
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='fetch')
+
+    def bucket(self, host):
+        if host not in self.buckets:
+            rate, burst = self.host_limits.get(host, DEFAULT_LIMIT)
+            self.buckets[host] = TokenBucket(rate, burst)
+        return self.buckets[host]
+
+    def controller(self, host):
+        if host not in self.controllers:
+            initial, maximum = self.host_concurrency.get(host, DEFAULT_CONCURRENCY)
+            target = TARGET_LATENCY.get(host, DEFAULT_TARGET_LATENCY)
+            self.controllers[host] = AdaptiveConcurrency(initial, maximum, target)
+        return self.controllers[host]
+
+    async def run(self, host, func, *args):
+        controller = self.controller(host)
+        for attempt in range(self.retries + 1):
+            await self.bucket(host).acquire()
+            await controller.acquire()
+            started = time.monotonic()
+            outcome, retry_after = 'error', None
+            try:
+                result = await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+                outcome = 'ok'
+            except Exception as e:
+                error = e
+                if is_throttle(e):
+                    outcome = 'throttled'
+                    retry_after = retry_after_seconds(getattr(e, 'response', None))
+                if outcome != 'throttled' or attempt == self.retries:
+                    raise
+            finally:
+                # Also runs when the caller is cancelled mid-call, so the slot is never leaked
+                await controller.release(time.monotonic() - started, outcome, retry_after)
+            if outcome == 'ok':
+                return result
+            metrics.inc('fetch_throttled_total', host=host)
+            delay = retry_after or random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+            print(f"{host} throttled ({error}); concurrency now {int(controller.limit)}, "
+                  f"retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    def report(self):
+        """Final limit, peak limit and outcome counts of every host's controller."""
+        return {host: {'limit': round(c.limit, 2), 'peak': round(c.peak, 2), **c.counts}
+                for host, c in self.controllers.items()}
+
+    def print_report(self):
+        for host, stats in self.report().items():
+            print(f"{host}: concurrency {stats['limit']} (peak {stats['peak']}), {stats['ok']} ok, "
+                  f"{stats['slow']} slow, {stats['throttled']} throttled, {stats['error']} failed")
+
+    async def run_pipeline(self, jobs, handler, workers=None):
+        """Drain `jobs` (tuples of handler args) with a fixed pool of worker tasks."""
+        queue = asyncio.Queue()
+        for job in jobs:
+            queue.put_nowait(job)
+
+        async def worker():
+            while True:
+                try:
+                    job = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                try:
+                    await handler(*job)
+                except Exception as e:
+                    print(f"Pipeline job {job} failed: {e}")
+
+        await asyncio.gather(*(worker() for _ in range(workers or self.max_concurrency)))
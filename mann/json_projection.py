@@ -0,0 +1,98 @@
+import json
+import re
+
+# Paths the scrapers actually read out of a page's __NEXT_DATA__
+SERIES_PATHS = [
+    ('props', 'pageProps', 'series'),
+    ('props', 'pageProps', 'content', 'abilities'),
+]
+EVENT_PATHS = [
+    ('props', 'pageProps', 'event', 'childEvents'),
+    ('props', 'pageProps', 'event', 'endDate'),
+    ('props', 'pageProps', 'event', 'live'),
+]
+
+_decoder = json.JSONDecoder()
+_WS = re.compile(r'[ \t\n\r]*')
+
+# Everything up to the next bracket, with strings swallowed whole so brackets
+# inside them don't count
+_FLAT = re.compile(r'[^"{}\[\]]*+(?:"[^"\\]*+(?:\\.[^"\\]*+)*+"[^"{}\[\]]*+)*+', re.S)
+_SCALAR_END = re.compile(r'[^,}\]]*')
+
+
+def _build_trie(paths):
+    trie = {}
+    for path in paths:
+        node = trie
+        for key in path[:-1]:
+            node = node.setdefault(key, {})
+            if node is None:
+                break
+        else:
+            node[path[-1]] = None  # None marks "keep this whole subtree"
+    return trie
+
+
+def _skip_value(s, pos):
+    """Return the index just past the JSON value starting at `pos`, without building it."""
+    char = s[pos]
+    if char == '"':
+        return json.decoder.scanstring(s, pos + 1)[1]
+    if char not in '{[':
+        return _SCALAR_END.match(s, pos).end()
+    depth = 1
+    pos += 1
+    while True:
+        pos = _FLAT.match(s, pos).end()
+        char = s[pos]
+        if char in '{[':
+            depth += 1
+        else:
+            depth -= 1
+            if depth == 0:
+                return pos + 1
+        pos += 1
+
+
+def _project_object(s, pos, node):
+    """Parse the object at `pos`, keeping only the keys in `node`."""
+    result = {}
+    pos = _WS.match(s, pos + 1).end()
+    if s[pos] == '}':
+        return result, pos + 1
+    while True:
+        key, pos = json.decoder.scanstring(s, pos + 1)
+        pos = _WS.match(s, pos).end() + 1  # past ':'
+        pos = _WS.match(s, pos).end()
+
+        if key not in node:
+            pos = _skip_value(s, pos)
+        elif node[key] is None:
+            result[key], pos = _decoder.raw_decode(s, pos)
+        elif s[pos] == '{':
+            result[key], pos = _project_object(s, pos, node[key])
+        else:
+            pos = _skip_value(s, pos)
+
+        pos = _WS.match(s, pos).end()
+        if s[pos] == '}':
+            return result, pos + 1
+        pos = _WS.match(s, pos + 1).end()  # past ','
+
+
+def project(document, paths):
+    """
+    Parse only the subtrees of `document` named by `paths`.
+
+    Everything else is stepped over at the bracket level, so no Python objects
+    are built for it. The result keeps the original nesting, e.g.
+    project(doc, [('props', 'pageProps', 'series')])['props']['pageProps']['series'].
+    """
+    if isinstance(document, (bytes, bytearray)):
+        document = document.decode('utf-8')
+    pos = _WS.match(document).end()
+    if document[pos] != '{':
+        raise ValueError('Projected document must be a JSON object')
+    result, _ = _project_object(document, pos, _build_trie(paths))
+    return result
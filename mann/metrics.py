@@ -0,0 +1,188 @@
+"""
+Counters and latency histograms for the scraper and the loaders.
+
+Metrics are process-wide and keyed by name plus labels (host, table, ...):
+
+    import metrics
+    with metrics.timer('fetch_seconds', host='rib.gg'):
+        ...
+    metrics.inc('db_rows_total', len(rows), table='Matches')
+    metrics.write_prometheus('scrape.prom')      # node_exporter textfile format
+    metrics.write_json('scrape_metrics.json')
+
+Instrumented so far:
+
+  fetch_seconds{host}, fetch_requests_total{host,status}, fetch_bytes_total{host}
+  fetch_throttled_total{host}
+  extract_seconds{kind}, parse_seconds{kind}, extract_bytes_total{kind}
+  csv_update_seconds{table,op}, csv_rows_total{table}
+  db_insert_seconds{table}, db_rows_total{table}, db_commit_seconds
+
+SampledLog replaces a log line per row with one aggregated line per interval.
+Worker processes keep their own metrics; only the process that writes the
+file is exported.
+"""
+import json
+import logging
+import math
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds in seconds, from a cached page to a slow ZenRows render
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, math.inf)
+LOG_INTERVAL = 10.0
+
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+
+
+def _key(name, labels):
+    return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def inc(name, amount=1, **labels):
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def observe(name, value, **labels):
+    key = _key(name, labels)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = {'buckets': [0] * len(LATENCY_BUCKETS), 'sum': 0.0, 'count': 0}
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if value <= bound:
+                histogram['buckets'][i] += 1
+                break
+        histogram['sum'] += value
+        histogram['count'] += 1
+
+
+@contextmanager
+def timer(name, **labels):
+    """Observe the duration of the block in histogram `name`, whether or not it raises."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - started, **labels)
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+
+def snapshot():
+    """Plain dict of every metric; histogram buckets are cumulative, as in Prometheus."""
+    with _lock:
+        counters = [{'name': name, 'labels': dict(labels), 'value': value}
+                    for (name, labels), value in sorted(_counters.items())]
+        histograms = []
+        for (name, labels), histogram in sorted(_histograms.items()):
+            cumulative, buckets = 0, {}
+            for bound, count in zip(LATENCY_BUCKETS, histogram['buckets']):
+                cumulative += count
+                buckets['+Inf' if bound == math.inf else repr(bound)] = cumulative
+            histograms.append({'name': name, 'labels': dict(labels), 'buckets': buckets,
+                               'sum': histogram['sum'], 'count': histogram['count']})
+    return {'time': time.time(), 'counters': counters, 'histograms': histograms}
+
+
+def _labels(labels, extra=None):
+    pairs = list(labels.items()) + ([extra] if extra else [])
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + '}'
+
+
+def to_prometheus():
+    """The current metrics in the Prometheus text exposition format."""
+    data = snapshot()
+    lines, typed = [], set()
+    for counter in data['counters']:
+        if counter['name'] not in typed:
+            lines.append(f"# TYPE {counter['name']} counter")
+            typed.add(counter['name'])
+        lines.append(f"{counter['name']}{_labels(counter['labels'])} {counter['value']}")
+    for histogram in data['histograms']:
+        name = histogram['name']
+        if name not in typed:
+            lines.append(f'# TYPE {name} histogram')
+            typed.add(name)
+        for bound, count in histogram['buckets'].items():
+            lines.append(f"{name}_bucket{_labels(histogram['labels'], ('le', bound))} {count}")
+        lines.append(f"{name}_sum{_labels(histogram['labels'])} {histogram['sum']}")
+        lines.append(f"{name}_count{_labels(histogram['labels'])} {histogram['count']}")
+    return '\n'.join(lines) + '\n'
+
+
+def _write_atomic(path, text):
+    # Scrapers may read the file at any time, so never expose a half-written one
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def write_prometheus(path):
+    _write_atomic(path, to_prometheus())
+
+
+def write_json(path):
+    _write_atomic(path, json.dumps(snapshot(), indent=2))
+
+
+def summary():
+    """One line per histogram: count, total and mean seconds."""
+    lines = []
+    for histogram in snapshot()['histograms']:
+        labels = ','.join(f'{key}={value}' for key, value in histogram['labels'].items())
+        mean = histogram['sum'] / histogram['count'] if histogram['count'] else 0
+        lines.append(f"{histogram['name']}{{{labels}}}: {histogram['count']} x {mean * 1000:.2f} ms "
+                     f"= {histogram['sum']:.2f}s")
+    return '\n'.join(lines)
+
+
+class SampledLog:
+    """
+    Aggregates per-row log lines into one line per `interval` seconds:
+
+        Inserted/skipped 1520 rows in 10.0s (Kill 1200, Round 300, Match 20)
+
+    Call flush() at the end of a run for the remainder.
+    """
+
+    def __init__(self, logger, message, interval=LOG_INTERVAL, level=logging.INFO):
+        self.logger = logger
+        self.message = message
+        self.interval = interval
+        self.level = level
+        self.counts = {}
+        self.started = time.monotonic()
+        self.lock = threading.Lock()
+
+    def add(self, key, count=1):
+        with self.lock:
+            self.counts[key] = self.counts.get(key, 0) + count
+            due = time.monotonic() - self.started >= self.interval
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            counts, self.counts = self.counts, {}
+            elapsed = time.monotonic() - self.started
+            self.started = time.monotonic()
+        if counts:
+            detail = ', '.join(f'{key} {count}' for key, count in sorted(counts.items(), key=lambda item: -item[1]))
+            self.logger.log(self.level, f"{self.message} {sum(counts.values())} rows in {elapsed:.1f}s ({detail})")
@@ -0,0 +1,61 @@
+import json
+
+import metrics
+from json_projection import project
+
+NEXT_DATA_START = b'<script id="__NEXT_DATA__" type="application/json">'
+SCRIPT_END = b'</script>'
+
+
+def find_next_data(chunks):
+    """
+    Return the bytes of the __NEXT_DATA__ script body from an iterable of byte chunks.
+
+    Only a marker-sized tail of the page is kept while looking for the opening
+    tag, and only the script body is buffered after it, so the rest of the
+    page is never decoded or copied.
+    """
+    chunks = iter(chunks)
+    buffer = bytearray()
+
+    for chunk in chunks:
+        buffer += chunk
+        start = buffer.find(NEXT_DATA_START)
+        if start != -1:
+            del buffer[:start + len(NEXT_DATA_START)]
+            break
+        # Keep just enough to match a marker split across two chunks
+        del buffer[:-(len(NEXT_DATA_START) - 1)]
+    else:
+        raise ValueError('No __NEXT_DATA__ script found in page')
+
+    search_from = 0
+    while True:
+        end = buffer.find(SCRIPT_END, search_from)
+        if end != -1:
+            del buffer[end:]
+            return buffer
+        search_from = max(0, len(buffer) - len(SCRIPT_END) + 1)
+        chunk = next(chunks, None)
+        if chunk is None:
+            raise ValueError('Unterminated __NEXT_DATA__ script in page')
+        buffer += chunk
+
+
+def extract_next_data(chunks, paths=None):
+    with metrics.timer('extract_seconds', kind='page'):
+        region = find_next_data(chunks)
+    metrics.inc('extract_bytes_total', len(region), kind='page')
+    with metrics.timer('parse_seconds', kind='page'):
+        if paths is None:
+            return json.loads(region)
+        return project(region, paths)
+
+
+def extract_json_data(response, paths=None, chunk_size=65536):
+    """
+    Parse __NEXT_DATA__ straight from a response's byte stream.
+
+    With `paths`, only those subtrees are built (see json_projection.project).
+    """
+    return extract_next_data(response.iter_content(chunk_size), paths)
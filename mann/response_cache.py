@@ -0,0 +1,146 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+import zlib
+
+# On-disk HTTP response cache.
+#
+#   .http_cache/index/<sha256(url)>.json     validators + freshness for a URL
+#   .http_cache/bodies/<sha256(body)>.z      zlib-compressed body, shared by
+#                                            every URL that returned it
+CACHE_DIR = '.http_cache'
+
+# TTL policy, in seconds. None means the entry never expires.
+LIVE_TTL = 10 * 60          # event pages and series that are still being played
+FINISHED_TTL = None         # finished series pages and their match details
+
+
+class CachedResponse:
+    """The subset of requests.Response the scrapers use, backed by cached bytes."""
+
+    def __init__(self, url, content, headers=None, status_code=200, from_cache=False):
+        self.url = url
+        self.content = content
+        self.headers = headers or {}
+        self.status_code = status_code
+        self.from_cache = from_cache
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8')
+
+    def json(self):
+        return json.loads(self.content)
+
+    def iter_content(self, chunk_size=65536):
+        for start in range(0, len(self.content), chunk_size):
+            yield self.content[start:start + chunk_size]
+
+    def raise_for_status(self):
+        pass
+
+
+def _key(url):
+    return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+
+def _index_path(url):
+    return os.path.join(CACHE_DIR, 'index', f'{_key(url)}.json')
+
+
+def _body_path(digest):
+    return os.path.join(CACHE_DIR, 'bodies', f'{digest}.z')
+
+
+def _write_atomic(path, data):
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory)
+    with os.fdopen(fd, 'wb') as tmp_file:
+        tmp_file.write(data)
+    os.replace(tmp_path, path)
+
+
+def _load_entry(url):
+    try:
+        with open(_index_path(url), 'r') as index_file:
+            return json.load(index_file)
+    except (OSError, ValueError):
+        return None
+
+
+def _save_entry(entry):
+    _write_atomic(_index_path(entry['url']), json.dumps(entry).encode('utf-8'))
+
+
+def _read_body(entry):
+    try:
+        with open(_body_path(entry['body']), 'rb') as body_file:
+            return zlib.decompress(body_file.read())
+    except (OSError, zlib.error):
+        return None
+
+
+def _store(url, response, ttl):
+    content = response.content
+    digest = hashlib.sha256(content).hexdigest()
+    if not os.path.exists(_body_path(digest)):
+        _write_atomic(_body_path(digest), zlib.compress(content, 6))
+    entry = {
+        'url': url,
+        'body': digest,
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified'),
+        'content_type': response.headers.get('Content-Type'),
+        'fetched_at': time.time(),
+        'ttl': ttl,
+    }
+    _save_entry(entry)
+    return CachedResponse(url, content, {'Content-Type': entry['content_type']}, response.status_code)
+
+
+def _is_fresh(entry):
+    return entry['ttl'] is None or time.time() - entry['fetched_at'] < entry['ttl']
+
+
+def get(url, fetch, finished=False, refresh=False):
+    """
+    Return the response for `url`, going to the network only when needed.
+
+    `fetch(headers)` performs the real request and must return a
+    requests.Response (raising on failure). Fresh entries are served without
+    calling it; stale ones are revalidated with If-None-Match /
+    If-Modified-Since, and a 304 reuses the stored body. Pass `finished=True`
+    for pages whose content can no longer change (completed series).
+    """
+    ttl = FINISHED_TTL if finished else LIVE_TTL
+    entry = _load_entry(url)
+    body = _read_body(entry) if entry else None
+
+    if body is not None and not refresh and _is_fresh(entry):
+        return CachedResponse(url, body, {'Content-Type': entry['content_type']}, from_cache=True)
+
+    headers = {}
+    if body is not None:
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+
+    response = fetch(headers)
+    if response.status_code == 304 and body is not None:
+        entry['fetched_at'] = time.time()
+        entry['ttl'] = ttl
+        _save_entry(entry)
+        return CachedResponse(url, body, {'Content-Type': entry['content_type']}, from_cache=True)
+    return _store(url, response, ttl)
+
+
+def pin(url):
+    """Mark the cached copy of `url` as final so it is never refetched."""
+    entry = _load_entry(url)
+    if entry is not None and entry['ttl'] is not FINISHED_TTL:
+        entry['ttl'] = FINISHED_TTL
+        _save_entry(entry)
@@ -5,6 +5,8 @@ import pandas as pd
 import time
 import re
 
+import fetch_client
+
 # Define the URL for the tournament
 # series_url='https://www.rib.gg/series/52003'
 tourney_url = "https://www.rib.gg/events/champions-tour-2023-americas-last-chance-qualifier/matches/2917"
@@ -46,7 +48,7 @@ def SeriesHeader(seriesId):
     print(f"Fetching series header data for series ID: {seriesId}")
     url = f'https://www.rib.gg/series/{seriesId}'
     try:
-        response = requests.get(url)
+        response = fetch_client.get(url)
         response.raise_for_status()
     except requests.RequestException as e:
         print(f'Failed trying to scrape series header: {e}')
@@ -171,7 +173,7 @@ def process_bracket_json(bracketJson, bracket_title):
 def scrapeTourney(tourney_url):
     print(f"Scraping tournament data from URL: {tourney_url}")
     try:
-        response = requests.get(tourney_url)
+        response = fetch_client.get(tourney_url)
         response.raise_for_status()
     except requests.RequestException as e:
         print(f'Failed trying to scrape tournament data: {e}')
@@ -213,7 +215,7 @@ def scrapeTourney(tourney_url):
                 for match_id in match_ids:
                     print(f"Fetching details for match ID: {match_id}")
                     try:
-                        response = requests.get(f'https://be-prod.rib.gg/v1/matches/{match_id}/details')
+                        response = fetch_client.get(f'https://be-prod.rib.gg/v1/matches/{match_id}/details')
                         response.raise_for_status()
                         details = response.json()
                         with open(f'{bracket_folder}/{match_id}_details.json', 'w') as json_file:
@@ -253,7 +255,7 @@ def scrapeSeries(series_url):
         for match_id in match_ids:
             print(f"Fetching details for match ID: {match_id}")
             try:
-                response = requests.get(f'https://be-prod.rib.gg/v1/matches/{match_id}/details')
+                response = fetch_client.get(f'https://be-prod.rib.gg/v1/matches/{match_id}/details')
                 response.raise_for_status()
                 details = response.json()
                 with open(f'{bracket_folder}/{match_id}_details.json', 'w') as json_file:
@@ -270,4 +272,5 @@ def scrapeSeries(series_url):
 
 # Uncomment to run scraping
 scrapeTourney(tourney_url)
+fetch_client.print_pool_stats()
 # scrapeSeries(series_url)
@@ -5,6 +5,8 @@ import pandas as pd
 import time
 import re
 
+import fetch_client
+
 # File to store scraped seriesIds
 scraped_series_ids_file = 'scraped_series_ids.txt'
 
@@ -48,7 +50,7 @@ def SeriesHeader(seriesId):
     print(f"Fetching series header data for series ID: {seriesId}")
     url = f'https://www.rib.gg/series/{seriesId}'
     try:
-        response = requests.get(url)
+        response = fetch_client.get(url)
         response.raise_for_status()
     except requests.RequestException as e:
         print(f'Failed trying to scrape series header: {e}')
@@ -194,7 +196,7 @@ def scrapeSeries(series_url):
         for match_id in match_ids:
             print(f"Fetching details for match ID: {match_id}")
             try:
-                response = requests.get(f'https://be-prod.rib.gg/v1/matches/{match_id}/details')
+                response = fetch_client.get(f'https://be-prod.rib.gg/v1/matches/{match_id}/details')
                 response.raise_for_status()
                 details = response.json()
                 with open(f'{bracket_folder}/{match_id}_details.json', 'w') as json_file:
@@ -215,7 +217,7 @@ def scrapeSeries(series_url):
 def scrapeTourney(tourney_url):
     print(f"Scraping tournament data from URL: {tourney_url}\n")
     try:
-        response = requests.get(tourney_url)
+        response = fetch_client.get(tourney_url)
         response.raise_for_status()
     except requests.RequestException as e:
         print(f'Failed trying to scrape tournament data: {e}\n')
@@ -255,7 +257,7 @@ def scrapeTourney(tourney_url):
                 for match_id in match_ids:
                     print(f"Fetching details for match ID: {match_id}")
                     try:
-                        response = requests.get(f'https://be-prod.rib.gg/v1/matches/{match_id}/details')
+                        response = fetch_client.get(f'https://be-prod.rib.gg/v1/matches/{match_id}/details')
                         response.raise_for_status()
                         details = response.json()
                         with open(f'{bracket_folder}/{match_id}_details.json', 'w') as json_file:
@@ -286,3 +288,4 @@ def scrapeAllTourney(tourney_urls_file):
 # scrapeSeries(series_url)
 # To scrape all tournaments from the tourney_urls.txt file
 scrapeAllTourney(tourney_urls_file)
+fetch_client.print_pool_stats()
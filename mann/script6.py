@@ -1,9 +1,19 @@
 import requests
 import json
 import os
-import pandas as pd
-import time
 import re
+import asyncio
+
+import fetch_client
+import metrics
+import response_cache
+from entity_store import EntityTable
+from event_graph import EventGraph
+from fetch_engine import FetchEngine, RIB_HOST, DETAILS_HOST
+from json_projection import SERIES_PATHS, EVENT_PATHS
+from next_data import extract_json_data
+from series_registry import SeriesRegistry
+from work_queue import WorkQueue, EVENT, SERIES, DETAILS, PRIORITIES, LIVE_BOOST
 
 # API key for ZenRows
 ZENROWS_APIKEY = 'XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX'
@@ -11,22 +21,29 @@ ZENROWS_APIKEY = 'XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX'
 # Files
 scraped_series_ids_file = 'scraped_series_ids.txt'
 tourney_urls_file = 'tourney_urls.txt'
-
-# ZenRows wrapper
-def zenrows_get(url, retries=3, backoff=2):
-    params = {
-        'url': url,
-        'apikey': ZENROWS_APIKEY,
-    }
-    for attempt in range(retries):
-        try:
-            response = requests.get('https://api.zenrows.com/v1/', params=params)
-            response.raise_for_status()
-            return response
-        except requests.RequestException as e:
-            print(f"ZenRows request failed: {e}. Retrying...")
-            time.sleep(backoff * (attempt + 1))
-    raise Exception(f"ZenRows failed after {retries} attempts for URL: {url}")
+metrics_file = 'scrape_metrics.prom'
+
+# Concurrent work-queue workers; the fetch engine still caps calls in flight per host
+queue_workers = 12
+
+# ZenRows wrapper, served from the local response cache when the page is still fresh.
+# One attempt: retries and backoff belong to the fetch engine's per-host controller.
+# Not streamed: the cache stores every body, so the whole page is read into
+# memory either way and extract_json_data only skips building the full tree.
+def zenrows_get(url, finished=False):
+    def fetch(headers):
+        params = {
+            'url': url,
+            'apikey': ZENROWS_APIKEY,
+        }
+        if headers:
+            # Forward If-None-Match / If-Modified-Since to rib.gg
+            params['custom_headers'] = 'true'
+        response = fetch_client.get('https://api.zenrows.com/v1/', params=params, headers=headers)
+        response.raise_for_status()
+        return response
+
+    return response_cache.get(url, fetch, finished=finished)
 
 # Filename sanitization
 def sanitize_filename(filename):
@@ -34,112 +51,57 @@ def sanitize_filename(filename):
     filename = re.sub(r'\s+', '_', filename)
     return filename
 
-def load_scraped_series_ids():
-    if os.path.exists(scraped_series_ids_file):
-        with open(scraped_series_ids_file, 'r') as file:
-            return file.read().splitlines()
-    else:
-        return []
-
-def save_scraped_series_ids(scraped_series_ids):
-    with open(scraped_series_ids_file, 'w') as file:
-        for series_id in scraped_series_ids:
-            file.write(f"{series_id}\n")
-
-scraped_series_ids = load_scraped_series_ids()
-
-def extract_json_data(response_text):
-    start_index = response_text.find('<script id="__NEXT_DATA__" type="application/json">')
-    start_index += len('<script id="__NEXT_DATA__" type="application/json">')
-    end_index = response_text.find('</script>', start_index)
-    json_string = response_text[start_index:end_index].strip()
-    return json.loads(json_string)
+registry = SeriesRegistry(legacy_file=scraped_series_ids_file)
+graph = EventGraph()
+work_queue = WorkQueue()
 
 def SeriesHeader(seriesId):
     print(f"Fetching series header data for series ID: {seriesId}")
     url = f'https://www.rib.gg/series/{seriesId}'
-    try:
-        response = zenrows_get(url)
-    except Exception as e:
-        print(f'Failed trying to scrape series header: {e}')
-        return None, None
-
-    stats_data_raw = extract_json_data(response.text)
-    matches = stats_data_raw['props']['pageProps']['series']['matches']
+    response = zenrows_get(url)
+    stats_data_raw = extract_json_data(response, SERIES_PATHS)
+    series = stats_data_raw['props']['pageProps']['series']
+    if series.get('completed'):
+        response_cache.pin(url)
+    matches = series['matches']
     match_ids = [match['id'] for match in matches]
     return stats_data_raw, match_ids
 
+# Entity CSVs, keyed the same way the old drop_duplicates subsets were
+ign_table = EntityTable('ignfile.csv', ['id', 'name'])
+team_table = EntityTable('teamfile.csv', ['id', 'name', 'shortName'])
+abilities_table = EntityTable('abilities.csv', ['id', 'name', 'type', 'agentId', 'damages'])
+
 def update_ign_and_id(stats_data):
-    print("Updating IGN and ID data")
-    csv_file = 'ignfile.csv'
     matches = stats_data['props']['pageProps']['series']['matches']
-    ids, igns = [], []
-
+    rows = []
     for match in matches:
-        players = match['players']
-        for player_obj in players:
-            ids.append(player_obj['player']['id'])
-            igns.append(player_obj['player']['ign'])
-
-    df = pd.DataFrame({'id': ids, 'name': igns}).drop_duplicates(subset=['id', 'name'])
-    if os.path.exists(csv_file) and os.path.getsize(csv_file) > 0:
-        existing_df = pd.read_csv(csv_file)
-    else:
-        existing_df = pd.DataFrame()
-
-    combined_df = pd.concat([existing_df, df], ignore_index=True).drop_duplicates(subset=['id', 'name'])
-    try:
-        combined_df.to_csv(csv_file, index=False)
-        print(f"IGN and ID data saved to {csv_file}")
-    except Exception as e:
-        print(f"Failed to save IGN and ID data: {e}")
+        for player_obj in match['players']:
+            rows.append({'id': player_obj['player']['id'], 'name': player_obj['player']['ign']})
+    added = ign_table.upsert(rows)
+    print(f"Queued {added} new IGN and ID rows")
 
 def update_team(stats_data):
-    print("Updating team data")
-    csv_file = 'teamfile.csv'
     keys = ['id', 'name', 'shortName']
-    t1 = stats_data['props']['pageProps']['series']['team1']
-    t2 = stats_data['props']['pageProps']['series']['team2']
-    df1 = pd.DataFrame([t1], columns=keys).drop_duplicates(subset=keys)
-    df2 = pd.DataFrame([t2], columns=keys).drop_duplicates(subset=keys)
-
-    if os.path.exists(csv_file) and os.path.getsize(csv_file) > 0:
-        existing_df = pd.read_csv(csv_file)
-    else:
-        existing_df = pd.DataFrame()
-
-    combined_df = pd.concat([existing_df, df1, df2], ignore_index=True).drop_duplicates(subset=keys)
-    try:
-        combined_df.to_csv(csv_file, index=False)
-        print(f"Team data saved to {csv_file}")
-    except Exception as e:
-        print(f"Failed to save team data: {e}")
+    series = stats_data['props']['pageProps']['series']
+    rows = [{key: team.get(key) for key in keys} for team in (series['team1'], series['team2'])]
+    added = team_table.upsert(rows)
+    print(f"Queued {added} new team rows")
 
 def update_abilities(stats_data):
-    print("Updating abilities data")
-    csv_file = 'abilities.csv'
+    keys = ['id', 'name', 'type', 'agentId', 'damages']
     abilities = stats_data['props']['pageProps']['content']['abilities']
-    ids, names, types, agentId, damages = [], [], [], [], []
-
-    for agent in abilities:
-        ids.append(agent['id'])
-        names.append(agent['name'])
-        types.append(agent['type'])
-        agentId.append(agent['agentId'])
-        damages.append(agent['damages'])
-
-    df = pd.DataFrame({'id': ids, 'name': names, 'type': types, 'agentId': agentId, 'damages': damages})
-    if os.path.exists(csv_file) and os.path.getsize(csv_file) > 0:
-        existing_df = pd.read_csv(csv_file)
-    else:
-        existing_df = pd.DataFrame()
+    added = abilities_table.upsert([{key: agent[key] for key in keys} for agent in abilities])
+    print(f"Queued {added} new abilities rows")
 
-    combined_df = pd.concat([existing_df, df], ignore_index=True).drop_duplicates()
-    try:
-        combined_df.to_csv(csv_file, index=False)
-        print(f"Abilities data saved to {csv_file}")
-    except Exception as e:
-        print(f"Failed to save abilities data: {e}")
+def flush_entity_tables():
+    for table in (ign_table, team_table, abilities_table):
+        try:
+            written = table.flush()
+            if written:
+                print(f"Appended {written} rows to {table.csv_file}")
+        except Exception as e:
+            print(f"Failed to save {table.csv_file}: {e}")
 
 def process_bracket_json(bracketJson, bracket_title):
     series_ids = []
@@ -167,17 +129,89 @@ def process_bracket_json(bracketJson, bracket_title):
         print(f"Unhandled bracket type: {bracket_type}")
     return bracket_type, series_ids
 
-def scrapeTourney(tourney_url):
-    print(f"Scraping tournament data from URL: {tourney_url}\n")
+def fetch_match_details(match_id, finished=False):
+    url = f'https://be-prod.rib.gg/v1/matches/{match_id}/details'
+
+    def fetch(headers):
+        response = fetch_client.get(url, headers=headers)
+        response.raise_for_status()
+        return response
+
+    response = response_cache.get(url, fetch, finished=finished)
+    with metrics.timer('parse_seconds', kind='details'):
+        return response.json()
+
+async def scrapeSeriesHeader(engine, series_id, bracket_folder):
+    """
+    Fetch and save the series header; returns (finished, match ids still
+    missing details). The header of a series that was still being played is
+    fetched again, since later maps only show up in a newer one.
+    """
+    extra_file = f'{bracket_folder}/{series_id}_extra.json'
+    finished = False
+    if registry.header_done(series_id) and os.path.exists(extra_file):
+        with open(extra_file, 'r') as json_file:
+            finished = bool(json.load(json_file).get('completed'))
+    if finished:
+        # Interrupted earlier: the final header is on disk, only fetch the missing matches
+        _, done, total = registry.status(series_id)
+        print(f"Resuming series ID {series_id} ({done}/{total} matches done)")
+    else:
+        header_for_extra_data, match_ids = await engine.run(RIB_HOST, SeriesHeader, series_id)
+
+        series = header_for_extra_data['props']['pageProps']['series']
+        with open(extra_file, 'w') as json_file:
+            json.dump(series, json_file)
+
+        update_ign_and_id(header_for_extra_data)
+        update_team(header_for_extra_data)
+        # Details of a finished series can no longer change, so cache them for good
+        finished = bool(series.get('completed'))
+        registry.mark_header(series_id, match_ids, finished)
+    return finished, registry.pending_matches(series_id)
+
+async def scrapeMatchDetails(engine, series_id, match_id, bracket_folder, finished):
+    print(f"Fetching details for match ID: {match_id}")
+    details = await engine.run(DETAILS_HOST, fetch_match_details, match_id, finished)
+    with open(f'{bracket_folder}/{match_id}_details.json', 'w') as json_file:
+        json.dump(details, json_file)
+    registry.mark_match(match_id)
+    # Series with failed matches, or still being played, stay open and are resumed on the next run
+    if finished and not registry.pending_matches(series_id):
+        registry.mark_complete(series_id)
+
+async def scrapeSeries(engine, series_id, bracket_folder):
     try:
-        response = zenrows_get(tourney_url)
+        finished, match_ids = await scrapeSeriesHeader(engine, series_id, bracket_folder)
     except Exception as e:
-        print(f'Failed trying to scrape tournament data: {e}\n')
+        print(f'Failed trying to scrape series header: {e}')
         return
 
-    stats_data_raw = extract_json_data(response.text)
-    child_events = stats_data_raw['props']['pageProps']['event']['childEvents']
+    async def fetch_details(match_id):
+        try:
+            await scrapeMatchDetails(engine, series_id, match_id, bracket_folder, finished)
+        except requests.RequestException as e:
+            print(f'Failed to fetch details for match ID {match_id}: {e}')
+        except json.JSONDecodeError:
+            print(f"Failed to decode JSON for match ID {match_id}")
+
+    await asyncio.gather(*(fetch_details(match_id) for match_id in match_ids))
+    if finished and not registry.pending_matches(series_id):
+        registry.mark_complete(series_id)
+
+async def discoverTourney(engine, tourney_url):
+    """
+    Walk an event page into the event graph. Returns whether the event is
+    live and the (series_id, bracket_folder) of every series still to scrape.
+    """
+    print(f"Scraping tournament data from URL: {tourney_url}\n")
+    response = await engine.run(RIB_HOST, zenrows_get, tourney_url)
 
+    stats_data_raw = extract_json_data(response, EVENT_PATHS)
+    parent_event = stats_data_raw['props']['pageProps']['event']
+    child_events = parent_event['childEvents']
+
+    jobs, children = [], []
     for event in child_events:
         event_title = sanitize_filename(event.get('name', 'unknown_event'))
         event_folder = os.path.abspath(f'./Data/{event_title}')
@@ -186,52 +220,132 @@ def scrapeTourney(tourney_url):
 
         if not bracketJson:
             print(f"\nNo bracketJson found for event: {event_title}\n")
+            children.append((event, event_title, None, []))
             continue
 
         bracket_type, series_ids = process_bracket_json(bracketJson, event_title)
+        children.append((event, event_title, bracket_type, series_ids))
 
         for series_id in series_ids:
-            if series_id in scraped_series_ids:
+            if series_id in registry:
                 print(f"Series ID {series_id} already scraped. Skipping...")
                 continue
 
             bracket_folder = os.path.abspath(f'./Data/{event_title}/{bracket_type}/{series_id}')
             os.makedirs(bracket_folder, exist_ok=True)
+            jobs.append((series_id, bracket_folder))
+
+    new_series = graph.update(tourney_url, parent_event, children)
+    print(f"{len(new_series)} newly scheduled series, {len(jobs)} series to scrape")
+    live = bool(parent_event.get('live')) or any(event.get('live') for event in child_events)
+    return live, jobs
+
+async def crawlTourney(engine, tourney_url):
+    if graph.is_complete(tourney_url):
+        print(f"Event {tourney_url} is complete. Skipping...")
+        return
+    try:
+        _, jobs = await discoverTourney(engine, tourney_url)
+    except Exception as e:
+        print(f'Failed trying to scrape tournament data: {e}\n')
+        return
+
+    # Series run concurrently; the engine's per-host controllers decide how many calls are in flight
+    try:
+        await engine.run_pipeline([(engine, *job) for job in jobs], scrapeSeries)
+    finally:
+        flush_entity_tables()
+    if graph.refresh_completion(tourney_url, registry):
+        print(f"Event {tourney_url} complete; later runs will skip it")
+
+def scrapeTourney(tourney_url):
+    asyncio.run(crawlTourney(FetchEngine(), tourney_url))
+
+# Work-queue handlers. Each raises on failure so the queue can retry or
+# dead-letter that one task; the priority of a task's children is inherited.
+async def eventTask(engine, tourney_url, payload, priority):
+    live, jobs = await discoverTourney(engine, tourney_url)
+    boost = LIVE_BOOST if live else 0
+    # Every series still missing from the registry gets another go, even one
+    # that finished or was dead-lettered on an earlier run with matches missing
+    for series_id, bracket_folder in jobs:
+        work_queue.put(SERIES, series_id, {'folder': bracket_folder}, priority=PRIORITIES[SERIES] + boost,
+                       reset=True)
+
+async def seriesTask(engine, series_id, payload, priority):
+    finished, match_ids = await scrapeSeriesHeader(engine, series_id, payload['folder'])
+    boost = priority - PRIORITIES[SERIES]
+    for match_id in match_ids:
+        work_queue.put(DETAILS, match_id, {'series': series_id, 'folder': payload['folder'], 'finished': finished},
+                       priority=PRIORITIES[DETAILS] + boost, reset=True)
+    if finished and not match_ids:
+        registry.mark_complete(series_id)
+
+async def detailsTask(engine, match_id, payload, priority):
+    await scrapeMatchDetails(engine, payload['series'], match_id, payload['folder'], payload['finished'])
+
+TASK_HANDLERS = {EVENT: eventTask, SERIES: seriesTask, DETAILS: detailsTask}
+
+async def drainQueue(engine, workers=queue_workers):
+    """Run `workers` concurrent workers until no task is pending or running."""
+    async def worker():
+        while True:
+            task = work_queue.claim()
+            if task is None:
+                wait = work_queue.next_ready_in()
+                if wait is None and not work_queue.running():
+                    return
+                # Waiting on a delayed retry, or on running tasks that may queue more work
+                await asyncio.sleep(min(wait or 1.0, 5.0))
+                continue
+            task_id, kind, key, payload, priority = task
+            try:
+                await TASK_HANDLERS[kind](engine, key, payload, priority)
+            except Exception as e:
+                status = work_queue.fail(task_id, e)
+                print(f"{kind} task {key} failed ({'dead-lettered' if status == 'dead' else 'will retry'}): {e}")
+            else:
+                work_queue.complete(task_id)
+
+    await asyncio.gather(*(worker() for _ in range(workers)))
+
+async def crawlAllTourney(tourney_urls):
+    # One engine for the whole crawl so the learned per-host limits carry across tournaments
+    engine = FetchEngine()
+    requeued = work_queue.recover()
+    if requeued:
+        print(f"Requeued {requeued} tasks left running by an interrupted crawl")
+    for tourney_url in tourney_urls:
+        if graph.is_complete(tourney_url):
+            print(f"Event {tourney_url} is complete. Skipping...")
+            continue
+        # Events are re-walked every run; known-live ones go ahead of backfill
+        boost = LIVE_BOOST if graph.is_live(tourney_url) else 0
+        work_queue.put(EVENT, tourney_url, priority=PRIORITIES[EVENT] + boost, reset=True)
 
-            header_for_extra_data, match_ids = SeriesHeader(series_id)
-            if header_for_extra_data is not None:
-                with open(f'{bracket_folder}/{series_id}_extra.json', 'w') as json_file:
-                    json.dump(header_for_extra_data['props']['pageProps']['series'], json_file)
-
-                update_ign_and_id(header_for_extra_data)
-                update_team(header_for_extra_data)
-
-                for match_id in match_ids:
-                    print(f"Fetching details for match ID: {match_id}")
-                    try:
-                        response = requests.get(f'https://be-prod.rib.gg/v1/matches/{match_id}/details')
-                        response.raise_for_status()
-                        details = response.json()
-                        with open(f'{bracket_folder}/{match_id}_details.json', 'w') as json_file:
-                            json.dump(details, json_file)
-                    except requests.RequestException as e:
-                        print(f'Failed to fetch details for match ID {match_id}: {e}')
-                    except json.JSONDecodeError:
-                        print(f"Failed to decode JSON for match ID {match_id}")
-                    time.sleep(2)
-
-                scraped_series_ids.append(series_id)
-                save_scraped_series_ids(scraped_series_ids)
+    try:
+        await drainQueue(engine)
+    finally:
+        flush_entity_tables()
+    for tourney_url in tourney_urls:
+        if graph.refresh_completion(tourney_url, registry):
+            print(f"Event {tourney_url} complete; later runs will skip it")
+    engine.print_report()
+    for kind, key, attempts, error in work_queue.dead_letters():
+        print(f"Dead-lettered {kind} {key} after {attempts} attempts: {error}")
 
 def scrapeAllTourney(tourney_urls_file):
     if os.path.exists(tourney_urls_file):
         with open(tourney_urls_file, 'r') as file:
-            tourney_urls = file.read().splitlines()
-            for tourney_url in tourney_urls:
-                time.sleep(10)
-                scrapeTourney(tourney_url)
+            tourney_urls = [url for url in file.read().splitlines() if url.strip()]
+        asyncio.run(crawlAllTourney(tourney_urls))
     else:
         print(f"No such file: {tourney_urls_file}")
 
-# Uncomment below to run
-scrapeAllTourney(tourney_urls_file)
+# Run the full crawl when executed as a script
+if __name__ == '__main__':
+    scrapeAllTourney(tourney_urls_file)
+    registry.export_ids(scraped_series_ids_file)
+    fetch_client.print_pool_stats()
+    metrics.write_prometheus(metrics_file)
+    print(metrics.summary())
@@ -0,0 +1,164 @@
+import os
+import sqlite3
+import time
+
+REGISTRY_DB = 'scrape_state.db'
+
+
+class SeriesRegistry:
+    """
+    Crash-safe record of which series and match details have been scraped.
+
+    Completed series ids are mirrored in an in-memory set so membership checks
+    are O(1); every state change is a single-row SQLite write instead of a
+    rewrite of scraped_series_ids.txt. Match-level rows let an interrupted
+    series resume at the first missing match. `finished` is the header's own
+    completed flag: a series still being played stays open however many of
+    its listed matches are saved.
+    """
+
+    def __init__(self, db_path=REGISTRY_DB, legacy_file=None):
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS series (
+                series_id TEXT PRIMARY KEY,
+                header_done INTEGER NOT NULL DEFAULT 0,
+                matches_total INTEGER,
+                completed INTEGER NOT NULL DEFAULT 0,
+                updated_at REAL,
+                finished INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS series_matches (
+                match_id TEXT PRIMARY KEY,
+                series_id TEXT NOT NULL,
+                done INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS series_matches_series ON series_matches (series_id);
+        ''')
+        columns = {row[1] for row in self.conn.execute('PRAGMA table_info(series)')}
+        if 'finished' not in columns:
+            # Registries from before the flag: trust the series they already hold as complete
+            with self.conn:
+                self.conn.execute('ALTER TABLE series ADD COLUMN finished INTEGER NOT NULL DEFAULT 0')
+                self.conn.execute('UPDATE series SET finished = completed')
+        self.conn.commit()
+        if legacy_file:
+            self._import_legacy(legacy_file)
+        self.completed = {row[0] for row in self.conn.execute('SELECT series_id FROM series WHERE completed = 1')}
+
+    def _import_legacy(self, legacy_file):
+        """Seed an empty registry from an old scraped_series_ids.txt."""
+        if not os.path.exists(legacy_file):
+            return
+        if self.conn.execute('SELECT 1 FROM series LIMIT 1').fetchone():
+            return
+        with open(legacy_file, 'r') as file:
+            series_ids = [line.strip() for line in file if line.strip()]
+        now = time.time()
+        with self.conn:
+            self.conn.executemany(
+                'INSERT OR IGNORE INTO series (series_id, header_done, completed, finished, updated_at) '
+                'VALUES (?, 1, 1, 1, ?)',
+                [(series_id, now) for series_id in series_ids])
+        print(f"Imported {len(series_ids)} series ids from {legacy_file}")
+
+    def __contains__(self, series_id):
+        return str(series_id) in self.completed
+
+    def __len__(self):
+        return len(self.completed)
+
+    def mark_header(self, series_id, match_ids, finished=False):
+        series_id = str(series_id)
+        with self.conn:
+            self.conn.execute('''
+                INSERT INTO series (series_id, header_done, matches_total, finished, updated_at) VALUES (?, 1, ?, ?, ?)
+                ON CONFLICT (series_id) DO UPDATE SET
+                    header_done = 1, matches_total = excluded.matches_total, finished = excluded.finished,
+                    updated_at = excluded.updated_at
+            ''', (series_id, len(match_ids), int(bool(finished)), time.time()))
+            self.conn.executemany(
+                'INSERT OR IGNORE INTO series_matches (match_id, series_id) VALUES (?, ?)',
+                [(str(match_id), series_id) for match_id in match_ids])
+
+    def mark_match(self, match_id):
+        with self.conn:
+            self.conn.execute('UPDATE series_matches SET done = 1 WHERE match_id = ?', (str(match_id),))
+
+    def mark_complete(self, series_id):
+        series_id = str(series_id)
+        with self.conn:
+            self.conn.execute('''
+                INSERT INTO series (series_id, header_done, completed, updated_at) VALUES (?, 1, 1, ?)
+                ON CONFLICT (series_id) DO UPDATE SET completed = 1, updated_at = excluded.updated_at
+            ''', (series_id, time.time()))
+        self.completed.add(series_id)
+
+    def is_finished(self, series_id):
+        """Whether the series is complete and its last header said it was no longer being played."""
+        row = self.conn.execute(
+            'SELECT completed, finished FROM series WHERE series_id = ?', (str(series_id),)).fetchone()
+        return bool(row and row[0] and row[1])
+
+    def header_done(self, series_id):
+        row = self.conn.execute('SELECT header_done FROM series WHERE series_id = ?', (str(series_id),)).fetchone()
+        return bool(row and row[0])
+
+    def pending_matches(self, series_id):
+        """Match ids of a series whose details have not been saved yet."""
+        rows = self.conn.execute(
+            'SELECT match_id FROM series_matches WHERE series_id = ? AND done = 0', (str(series_id),))
+        return [row[0] for row in rows]
+
+    def status(self, series_id):
+        """(header_done, matches_done, matches_total) for a series."""
+        series_id = str(series_id)
+        row = self.conn.execute(
+            'SELECT header_done, matches_total FROM series WHERE series_id = ?', (series_id,)).fetchone()
+        if row is None:
+            return False, 0, None
+        done = self.conn.execute(
+            'SELECT COUNT(*) FROM series_matches WHERE series_id = ? AND done = 1', (series_id,)).fetchone()[0]
+        return bool(row[0]), done, row[1]
+
+    def merge_from(self, db_path):
+        """
+        Fold another registry file (a distributed worker's) into this one. A
+        series or match done in either stays done. Returns the number of
+        series newly completed.
+        """
+        before = len(self.completed)
+        self.conn.execute('ATTACH DATABASE ? AS other', (db_path,))
+        try:
+            with self.conn:
+                self.conn.execute('''
+                    INSERT INTO series (series_id, header_done, matches_total, completed, finished, updated_at)
+                    SELECT series_id, header_done, matches_total, completed, finished, updated_at FROM other.series
+                    WHERE true
+                    ON CONFLICT (series_id) DO UPDATE SET
+                        header_done = MAX(header_done, excluded.header_done),
+                        matches_total = COALESCE(excluded.matches_total, matches_total),
+                        completed = MAX(completed, excluded.completed),
+                        finished = MAX(finished, excluded.finished),
+                        updated_at = MAX(updated_at, excluded.updated_at)
+                ''')
+                self.conn.execute('''
+                    INSERT INTO series_matches (match_id, series_id, done)
+                    SELECT match_id, series_id, done FROM other.series_matches WHERE true
+                    ON CONFLICT (match_id) DO UPDATE SET done = MAX(done, excluded.done)
+                ''')
+        finally:
+            self.conn.execute('DETACH DATABASE other')
+        self.completed = {row[0] for row in self.conn.execute('SELECT series_id FROM series WHERE completed = 1')}
+        return len(self.completed) - before
+
+    def export_ids(self, path):
+        """Write the completed ids in the old one-id-per-line format."""
+        rows = self.conn.execute('SELECT series_id FROM series WHERE completed = 1 ORDER BY rowid')
+        with open(path, 'w') as file:
+            for (series_id,) in rows:
+                file.write(f"{series_id}\n")
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,136 @@
+import json
+import sqlite3
+import time
+
+from series_registry import REGISTRY_DB
+
+# Task kinds and their base priority. Deeper tasks rank higher so a series
+# that was started gets finished before more of the backlog is opened up.
+EVENT = 'event'
+SERIES = 'series'
+DETAILS = 'details'
+PRIORITIES = {EVENT: 10, SERIES: 20, DETAILS: 30}
+# Added to everything discovered from a live event, so refreshes preempt backfill
+LIVE_BOOST = 100
+
+MAX_ATTEMPTS = 5
+RETRY_BASE = 10.0           # seconds before the first retry, doubled per attempt
+RETRY_MAX = 5 * 60
+
+
+class WorkQueue:
+    """
+    Durable priority queue of fetch tasks, kept in the scrape state SQLite file.
+
+    A task is a (kind, key) pair with a JSON payload. claim() hands out the
+    highest-priority ready task in one write transaction, so any number of
+    workers (tasks or processes) can drain the queue without taking the same
+    task twice. Failed tasks come back after an exponential delay and are
+    dead-lettered after `max_attempts`; tasks left running by a crashed
+    worker are requeued by recover().
+    """
+
+    def __init__(self, db_path=REGISTRY_DB, max_attempts=MAX_ATTEMPTS):
+        self.max_attempts = max_attempts
+        self.conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS tasks (
+                task_id INTEGER PRIMARY KEY,
+                kind TEXT NOT NULL,
+                key TEXT NOT NULL,
+                payload TEXT,
+                priority INTEGER NOT NULL DEFAULT 0,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                not_before REAL NOT NULL DEFAULT 0,
+                last_error TEXT,
+                updated_at REAL,
+                UNIQUE (kind, key)
+            );
+            CREATE INDEX IF NOT EXISTS tasks_ready ON tasks (status, priority DESC, task_id);
+        ''')
+
+    def put(self, kind, key, payload=None, priority=None, reset=False):
+        """
+        Enqueue a task. An existing (kind, key) keeps its state but takes the
+        higher priority; with reset=True a finished or dead task is made
+        pending again with fresh attempts (events, and series or matches that
+        are still missing, are retried on every run).
+        """
+        priority = PRIORITIES.get(kind, 0) if priority is None else priority
+        reset_sql = ", status = 'pending', attempts = 0, not_before = 0" if reset else ''
+        self.conn.execute(f'''
+            INSERT INTO tasks (kind, key, payload, priority, updated_at) VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (kind, key) DO UPDATE SET
+                payload = excluded.payload, priority = MAX(priority, excluded.priority),
+                updated_at = excluded.updated_at{reset_sql}
+            WHERE tasks.status != 'running'
+        ''', (kind, str(key), json.dumps(payload), priority, time.time()))
+
+    def claim(self):
+        """Take the highest-priority ready task, or None. Returns (task_id, kind, key, payload, priority)."""
+        row = self.conn.execute('''
+            UPDATE tasks SET status = 'running', attempts = attempts + 1, updated_at = :now
+            WHERE task_id = (
+                SELECT task_id FROM tasks WHERE status = 'pending' AND not_before <= :now
+                ORDER BY priority DESC, task_id LIMIT 1)
+            RETURNING task_id, kind, key, payload, priority
+        ''', {'now': time.time()}).fetchone()
+        if row is None:
+            return None
+        task_id, kind, key, payload, priority = row
+        return task_id, kind, key, json.loads(payload), priority
+
+    def complete(self, task_id):
+        self.conn.execute("UPDATE tasks SET status = 'done', last_error = NULL, updated_at = ? WHERE task_id = ?",
+                          (time.time(), task_id))
+
+    def fail(self, task_id, error):
+        """Schedule a retry, or dead-letter the task once it has used its attempts. Returns the new status."""
+        now = time.time()
+        attempts = self.conn.execute('SELECT attempts FROM tasks WHERE task_id = ?', (task_id,)).fetchone()[0]
+        if attempts >= self.max_attempts:
+            status, not_before = 'dead', 0
+        else:
+            status, not_before = 'pending', now + min(RETRY_MAX, RETRY_BASE * 2 ** (attempts - 1))
+        self.conn.execute('''
+            UPDATE tasks SET status = ?, not_before = ?, last_error = ?, updated_at = ? WHERE task_id = ?
+        ''', (status, not_before, str(error)[:1000], now, task_id))
+        return status
+
+    def recover(self):
+        """Requeue tasks a crashed worker left running. Only call it when no other worker is live."""
+        return self.conn.execute(
+            "UPDATE tasks SET status = 'pending', updated_at = ? WHERE status = 'running'", (time.time(),)).rowcount
+
+    def next_ready_in(self):
+        """
+        Seconds until a pending task becomes ready (0 if one is ready now),
+        or None when nothing is pending.
+        """
+        row = self.conn.execute("SELECT MIN(not_before) FROM tasks WHERE status = 'pending'").fetchone()
+        return None if row[0] is None else max(0.0, row[0] - time.time())
+
+    def running(self):
+        return self.conn.execute("SELECT COUNT(*) FROM tasks WHERE status = 'running'").fetchone()[0]
+
+    def stats(self):
+        """Task counts per kind and status."""
+        stats = {}
+        for kind, status, count in self.conn.execute('SELECT kind, status, COUNT(*) FROM tasks GROUP BY kind, status'):
+            stats.setdefault(kind, {})[status] = count
+        return stats
+
+    def dead_letters(self):
+        """(kind, key, attempts, last_error) of every dead-lettered task."""
+        return self.conn.execute(
+            "SELECT kind, key, attempts, last_error FROM tasks WHERE status = 'dead' ORDER BY updated_at").fetchall()
+
+    def retry_dead(self):
+        """Give every dead-lettered task a fresh set of attempts."""
+        return self.conn.execute(
+            "UPDATE tasks SET status = 'pending', attempts = 0, not_before = 0 WHERE status = 'dead'").rowcount
+
+    def close(self):
+        self.conn.close()
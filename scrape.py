@@ -2,26 +2,25 @@ import requests
 import json
 import os
 import pandas as pd
+import sys
 # from helium import *
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'mann'))
+import fetch_client
+from next_data import extract_json_data
+
 url = "https://www.rib.gg/series/sentinels-vs-g2-esports-champions-tour-2025-americas-stage-1/89503"
 
 
 def scrape(url):
-    response = requests.get(url)
-
-    if response.status_code == 200:
-        start_index= response.text.find('<script id="__NEXT_DATA__" type="application/json">' )
-        start_index= start_index + len('<script id="__NEXT_DATA__" type="application/json">')
-        end_index= response.text.find('</script>',start_index)
-        json_string = response.text[start_index:end_index].strip()
-
-        stats_data_raw = json.loads(json_string)
-
-        return stats_data_raw
-    else:
-        print('Failed trying to scrape')
-        return None
+    with fetch_client.get(url, stream=True) as response:
+        if response.status_code == 200:
+            stats_data_raw = extract_json_data(response)
+
+            return stats_data_raw
+        else:
+            print('Failed trying to scrape')
+            return None
     # matchesplayed =[]
     # matches = stats_data_raw['props']['pageProps']['series']['matches']
     # for match in matches:
@@ -144,20 +143,14 @@ def update_abilities(stats_data):
     combined_df.to_csv(csv_file, index=False)
 
 def scrapeTourney(tourney_url):
-    response = requests.get(url)
-
-    if response.status_code == 200:
-        start_index= response.text.find('<script id="__NEXT_DATA__" type="application/json">' )
-        start_index= start_index + len('<script id="__NEXT_DATA__" type="application/json">')
-        end_index= response.text.find('</script>',start_index)
-        json_string = response.text[start_index:end_index].strip()
-
-        stats_data_raw = json.loads(json_string)
-
-        # return stats_data_raw
-    else:
-        print('Failed trying to scrape')
-        # return None 
+    with fetch_client.get(url, stream=True) as response:
+        if response.status_code == 200:
+            stats_data_raw = extract_json_data(response)
+
+            # return stats_data_raw
+        else:
+            print('Failed trying to scrape')
+            # return None 
     winners = stats_data_raw['props']['pageProps']['event']['childEvents'][0]['bracketJson']['winners']
 
     extracted_data = []